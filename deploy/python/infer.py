@@ -16,6 +16,9 @@ import argparse
 import codecs
 import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 LOCAL_PATH = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.join(LOCAL_PATH, '..', '..'))
@@ -126,6 +129,26 @@ def parse_args():
         dest='with_argmax',
         help='Perform argmax operation on the predict result.',
         action='store_true')
+    parser.add_argument(
+        '--pipeline',
+        dest='pipeline',
+        help='Preprocess, infer and save the images in a pipeline of threads, which keeps the predictor busy. It can not be used with --benchmark.',
+        action='store_true')
+    parser.add_argument(
+        '--preprocess_threads',
+        default=4,
+        type=int,
+        help='The number of threads to read and preprocess the images in pipeline mode.')
+    parser.add_argument(
+        '--postprocess_threads',
+        default=2,
+        type=int,
+        help='The number of threads to postprocess and save the results in pipeline mode.')
+    parser.add_argument(
+        '--queue_size',
+        default=8,
+        type=int,
+        help='The maximum number of batches waiting between the stages of pipeline mode.')
     parser.add_argument(
         '--print_detail',
         default=True,
@@ -133,7 +156,12 @@ def parse_args():
         choices=[True, False],
         help='Print GLOG information of Paddle Inference.')
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    # The stages overlap in pipeline mode, so the time of every stage recorded
+    # by the benchmark logger is not defined.
+    if args.pipeline and args.benchmark:
+        parser.error('--pipeline can not be used with --benchmark True.')
+    return args
 
 
 def use_auto_tune(args):
@@ -386,6 +414,83 @@ class Predictor:
             self._save_imgs(results, imgs_path[i:i + args.batch_size])
         logger.info("Finish")
 
+    def run_pipeline(self, imgs_path):
+        """
+        Predict the images by a pipeline of three stages: a thread pool reads
+        and preprocesses the batches, the calling thread runs the predictor
+        on them in order, and another thread pool postprocesses and saves the
+        results. At most `queue_size` batches wait before and after the
+        predictor, and the batches are saved in the order of the images.
+        """
+        if not isinstance(imgs_path, (list, tuple)):
+            imgs_path = [imgs_path]
+
+        input_names = self.predictor.get_input_names()
+        input_handle = self.predictor.get_input_handle(input_names[0])
+        output_names = self.predictor.get_output_names()
+        output_handle = self.predictor.get_output_handle(output_names[0])
+        args = self.args
+
+        if not os.path.exists(args.save_dir):
+            os.makedirs(args.save_dir)
+
+        batches = [
+            imgs_path[i:i + args.batch_size]
+            for i in range(0, len(imgs_path), args.batch_size)
+        ]
+        next_batch = iter(batches)
+        preprocessed = deque()
+        saved = deque()
+        infer_cost = 0
+        start = time.time()
+        with ThreadPoolExecutor(args.preprocess_threads) as pre_pool, \
+                ThreadPoolExecutor(args.postprocess_threads) as post_pool:
+
+            def _fill():
+                while len(preprocessed) < args.queue_size:
+                    paths = next(next_batch, None)
+                    if paths is None:
+                        break
+                    preprocessed.append((paths, pre_pool.submit(
+                        self._preprocess_batch, paths)))
+
+            _fill()
+            while preprocessed:
+                paths, future = preprocessed.popleft()
+                data = future.result()
+                _fill()
+
+                infer_start = time.time()
+                input_handle.reshape(data.shape)
+                input_handle.copy_from_cpu(data)
+                self.predictor.run()
+                results = output_handle.copy_to_cpu()
+                infer_cost += time.time() - infer_start
+
+                saved.append(
+                    post_pool.submit(self._postprocess_and_save, results,
+                                     paths))
+                # Wait for the oldest results, so that the saving can not
+                # fall behind by more than queue_size batches.
+                while len(saved) > args.queue_size:
+                    saved.popleft().result()
+            while saved:
+                saved.popleft().result()
+
+        total_cost = time.time() - start
+        logger.info(
+            "Finish {} images in {:.2f}s, {:.2f} images/s, of which the predictor takes {:.2f}s."
+            .format(
+                len(imgs_path), total_cost,
+                len(imgs_path) / total_cost, infer_cost))
+
+    def _preprocess_batch(self, imgs_path):
+        return np.array([self._preprocess(p) for p in imgs_path])
+
+    def _postprocess_and_save(self, results, imgs_path):
+        results = self._postprocess(results)
+        self._save_imgs(results, imgs_path)
+
     def _preprocess(self, img):
         return self.cfg.transforms(img)[0]
 
@@ -413,7 +518,10 @@ def main(args):
 
     # create and run predictor
     predictor = Predictor(args)
-    predictor.run(imgs_list)
+    if args.pipeline:
+        predictor.run_pipeline(imgs_list)
+    else:
+        predictor.run(imgs_list)
 
     if use_auto_tune(args) and \
         os.path.exists(args.auto_tuned_shape_file):
@@ -0,0 +1,620 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A benchmark suite of inference, which sweeps the input resolutions, batch
+sizes, precisions, thread counts and inference paths, and writes the results
+in json. The results can be compared with a former json to gate regressions.
+
+Every case runs in a new process, so that its peak RSS and its threads do not
+depend on the other cases. A case reports the latency percentiles of a batch,
+the throughput, the peak RSS and the time of preprocessing, inference and
+postprocessing.
+
+The inference paths:
+    plain   The model runs once on the input.
+    aug     `aug_inference` of the scales given by --aug_scales.
+    slide   Sliding window inference with --crop_size and --stride.
+    mscale  MscaleOCR with the scales given by --mscale_scales. It needs the
+            dynamic graph model, since the scales are fixed when exported.
+            The other paths run the dynamic graph MscaleOCR at scale 1.0 only.
+
+The exported model (--config deploy.yaml) needs to be exported with
+`--without_argmax` for the aug and slide paths. The dynamic graph model
+(--model_config and --model_path) supports fp32 only.
+
+Usage:
+    python deploy/python/infer_benchmark_suite.py --config output/deploy.yaml \
+        --image_path data/images --resolutions 1024x512 2048x1024 \
+        --batch_sizes 1 4 --precisions fp32 int8 --threads 1 4 \
+        --enable_mkldnn True --output benchmark.json
+
+    # Fail if p50 latency, throughput or peak RSS is 10% worse than baseline.
+    python deploy/python/infer_benchmark_suite.py --config output/deploy.yaml \
+        --baseline baseline.json --threshold 0.1
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import sys
+import time
+import traceback
+
+LOCAL_PATH = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(LOCAL_PATH, '..', '..'))
+
+import cv2
+import numpy as np
+import paddle
+
+from paddleseg.utils import logger, get_image_list
+from paddleseg.utils.model_scales import MULTI_SCALE_MODELS
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PATHS = ['plain', 'aug', 'slide', 'mscale']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Inference benchmark suite')
+    parser.add_argument(
+        "--config",
+        dest="cfg",
+        help="The deploy config file of the exported model.",
+        default=None,
+        type=str)
+    parser.add_argument(
+        '--model_config',
+        help='The config file of the dynamic graph model, used instead of --config.',
+        default=None,
+        type=str)
+    parser.add_argument(
+        '--model_path',
+        help='The weights of the dynamic graph model.',
+        default=None,
+        type=str)
+    parser.add_argument(
+        '--image_path',
+        dest='image_path',
+        help='The directory or path or file list of the images. Random images are used if it is not set.',
+        type=str,
+        default=None)
+    parser.add_argument(
+        '--device',
+        choices=['cpu', 'gpu'],
+        default="cpu",
+        help="Select which device to inference, defaults to cpu.")
+
+    # The axes to sweep.
+    parser.add_argument(
+        '--resolutions',
+        nargs='+',
+        default=['1024x512'],
+        type=str,
+        help='The input resolutions in WxH. The images are resized to them before the transforms.'
+    )
+    parser.add_argument(
+        '--batch_sizes',
+        nargs='+',
+        default=[1],
+        type=int,
+        help='The batch sizes.')
+    parser.add_argument(
+        '--precisions',
+        nargs='+',
+        default=['fp32'],
+        choices=['fp32', 'fp16', 'int8'],
+        type=str,
+        help='The precisions. int8 on cpu uses mkldnn, fp16 and int8 on gpu use tensorrt.'
+    )
+    parser.add_argument(
+        '--threads',
+        nargs='+',
+        default=[10],
+        type=int,
+        help='The numbers of cpu threads.')
+    parser.add_argument(
+        '--paths',
+        nargs='+',
+        default=['plain'],
+        choices=PATHS,
+        type=str,
+        help='The inference paths.')
+
+    # The settings of the inference paths.
+    parser.add_argument(
+        '--aug_scales',
+        nargs='+',
+        default=[0.75, 1.0, 1.25],
+        type=float,
+        help='The scales of the aug path.')
+    parser.add_argument(
+        '--flip_horizontal',
+        help='Whether to flip horizontally in the aug path.',
+        action='store_true')
+    parser.add_argument(
+        '--crop_size',
+        nargs=2,
+        default=[512, 512],
+        type=int,
+        help='The window size (w, h) of the slide path.')
+    parser.add_argument(
+        '--stride',
+        nargs=2,
+        default=[384, 384],
+        type=int,
+        help='The window stride (w, h) of the slide path.')
+    parser.add_argument(
+        '--slide_batch_size',
+        default=1,
+        type=int,
+        help='The number of windows inferred together in the slide path.')
+    parser.add_argument(
+        '--mscale_scales',
+        nargs='+',
+        default=[0.5, 1.0, 2.0],
+        type=float,
+        help='The eval scales of MscaleOCR in the mscale path.')
+
+    parser.add_argument(
+        '--enable_mkldnn',
+        default=False,
+        type=eval,
+        choices=[True, False],
+        help='Enable to use mkldnn to speed up when using cpu. It is always enabled for int8 on cpu.'
+    )
+    parser.add_argument(
+        '--min_subgraph_size',
+        default=3,
+        type=int,
+        help='The min subgraph size in tensorrt prediction.')
+    parser.add_argument(
+        '--warmup',
+        default=5,
+        type=int,
+        help='The number of batches run before the measurement of every case.')
+    parser.add_argument(
+        '--repeats',
+        default=20,
+        type=int,
+        help='The number of batches measured in every case.')
+
+    parser.add_argument(
+        '--output',
+        default='benchmark.json',
+        type=str,
+        help='The json file to write the results to.')
+    parser.add_argument(
+        '--baseline',
+        default=None,
+        type=str,
+        help='The json file of a former run to compare with.')
+    parser.add_argument(
+        '--threshold',
+        default=0.1,
+        type=float,
+        help='The relative degradation regarded as a regression, e.g. 0.1 for 10%%.'
+    )
+
+    args = parser.parse_args()
+    if (args.cfg is None) == (args.model_config is None):
+        parser.error('Set one of --config and --model_config.')
+    if args.model_config is not None and args.model_path is None:
+        parser.error('--model_path is required with --model_config.')
+    return args
+
+
+def parse_resolution(resolution):
+    try:
+        w, h = [int(x) for x in resolution.lower().split('x')]
+    except ValueError:
+        raise ValueError(
+            'The resolution should be like 1024x512, but got {}.'.format(
+                resolution))
+    return w, h
+
+
+def case_name(case):
+    return '{}_{}x{}_bs{}_{}_t{}'.format(case['path'], *case['resolution'],
+                                         case['batch_size'], case['precision'],
+                                         case['threads'])
+
+
+class ExportedModel(object):
+    """
+    Wrap the predictor of an exported model as a callable of the dynamic
+    graph model, so that it can run the paths of `paddleseg.core.infer`.
+    """
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self.input_handle = predictor.get_input_handle(
+            predictor.get_input_names()[0])
+        self.output_handle = predictor.get_output_handle(
+            predictor.get_output_names()[0])
+
+    def __call__(self, x):
+        x = x.numpy() if isinstance(x, paddle.Tensor) else x
+        self.input_handle.reshape(x.shape)
+        self.input_handle.copy_from_cpu(x)
+        self.predictor.run()
+        return [paddle.to_tensor(self.output_handle.copy_to_cpu())]
+
+
+def build_exported(args, case):
+    from infer import Predictor
+
+    class BenchPredictor(Predictor):
+        def _init_cpu_config(self):
+            super()._init_cpu_config()
+            if self.args.precision == 'int8':
+                self.pred_cfg.enable_mkldnn_int8()
+
+    precision = case['precision']
+    pred_args = argparse.Namespace(
+        cfg=args.cfg,
+        device=args.device,
+        use_trt=args.device == 'gpu' and precision != 'fp32',
+        precision=precision,
+        min_subgraph_size=args.min_subgraph_size,
+        cpu_threads=case['threads'],
+        enable_mkldnn=args.enable_mkldnn or precision == 'int8',
+        enable_auto_tune=False,
+        print_detail=False,
+        benchmark=False,
+        batch_size=case['batch_size'])
+    if args.device == 'cpu' and precision == 'fp16':
+        raise ValueError('fp16 is not supported on cpu.')
+    predictor = BenchPredictor(pred_args)
+    return ExportedModel(predictor.predictor), predictor.cfg.transforms
+
+
+def build_dynamic(args, case):
+    from paddleseg.cvlibs import Config
+    from paddleseg.transforms import Compose
+    from paddleseg.utils import load_entire_model
+
+    if case['precision'] != 'fp32':
+        raise ValueError('The dynamic graph model supports fp32 only.')
+    paddle.set_device(args.device)
+    cfg = Config(args.model_config)
+    model_type = cfg.dic['model'].get('type')
+    if model_type in MULTI_SCALE_MODELS:
+        # The other paths run the model at a single scale, so that they do
+        # not measure the scales of the config on top of their own.
+        cfg.dic['model']['eval_scales'] = args.mscale_scales if case[
+            'path'] == 'mscale' else [1.0]
+    elif case['path'] == 'mscale':
+        raise ValueError('The mscale path needs one of {}, but the model is '
+                         '{}.'.format(MULTI_SCALE_MODELS, model_type))
+    model = cfg.model
+    load_entire_model(model, args.model_path)
+    model.eval()
+    return model, Compose(cfg.val_transforms)
+
+
+def run_path(args, path, model, x):
+    """Run an inference path, and return the logit or the prediction."""
+    from paddleseg.core import infer
+
+    if path == 'aug':
+        pred, _ = infer.aug_inference(
+            model,
+            x,
+            ori_shape=x.shape[-2:],
+            transforms=[],
+            scales=args.aug_scales,
+            flip_horizontal=args.flip_horizontal)
+        return pred
+    return infer.inference(
+        model,
+        x,
+        is_slide=path == 'slide',
+        crop_size=args.crop_size,
+        stride=args.stride,
+        slide_batch_size=args.slide_batch_size)
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    return rss / 2**20 if sys.platform == 'darwin' else rss / 2**10
+
+
+def _summary(values):
+    values = np.array(values) * 1000
+    return {
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p90': float(np.percentile(values, 90)),
+        'p99': float(np.percentile(values, 99))
+    }
+
+
+def benchmark_case(args, case, images):
+    """
+    Run a case and measure it.
+
+    Args:
+        args (argparse.Namespace): The arguments of the suite.
+        case (dict): The path, resolution, batch size, precision and threads of the case.
+        images (list): The image paths, or None to use random images.
+
+    Returns:
+        dict: The measurements of the case.
+    """
+    path = case['path']
+    if args.cfg is not None:
+        if path == 'mscale':
+            raise ValueError(
+                'The scales of MscaleOCR are fixed when exported, use '
+                '--model_config and --model_path for the mscale path.')
+        model, transforms = build_exported(args, case)
+    else:
+        model, transforms = build_dynamic(args, case)
+
+    w, h = case['resolution']
+    batch_size = case['batch_size']
+    rng = np.random.RandomState(0)
+    random_images = [
+        rng.randint(
+            0, 256, (h, w, 3), dtype='uint8') for _ in range(batch_size)
+    ]
+    sync = args.device == 'gpu' and args.model_config is not None
+
+    def preprocess(step):
+        batch = []
+        for i in range(batch_size):
+            if images:
+                im = cv2.imread(images[(step * batch_size + i) % len(images)])
+                im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+            else:
+                im = random_images[i]
+            batch.append(transforms(im)[0])
+        return np.stack(batch).astype('float32', copy=False)
+
+    def postprocess(out):
+        if out.ndim == 4:
+            if out.shape[1] > 1:
+                out = paddle.argmax(out, axis=1)
+            else:
+                out = paddle.squeeze(out, axis=1)
+        return out.numpy().astype('uint8')
+
+    if args.cfg is not None and path in ('aug', 'slide'):
+        # The aug and slide paths blend the logits.
+        if model(preprocess(0))[0].ndim != 4:
+            raise ValueError('The {} path needs the logits, please export the '
+                             'model with --without_argmax.'.format(path))
+
+    pre_times, infer_times, post_times = [], [], []
+    input_shape = None
+    with paddle.no_grad():
+        for step in range(args.warmup + args.repeats):
+            start = time.time()
+            data = preprocess(step)
+            pre_end = time.time()
+            x = paddle.to_tensor(data)
+            out = run_path(args, path, model, x)
+            if sync:
+                paddle.device.cuda.synchronize()
+            infer_end = time.time()
+            postprocess(out)
+            end = time.time()
+            if step >= args.warmup:
+                pre_times.append(pre_end - start)
+                infer_times.append(infer_end - pre_end)
+                post_times.append(end - infer_end)
+            input_shape = list(data.shape)
+
+    latencies = np.array(pre_times) + np.array(infer_times) + np.array(
+        post_times)
+    return {
+        'input_shape': input_shape,
+        # The scales run inside the model, which are fixed if it is exported.
+        'model_scales': getattr(model, 'eval_scales', None),
+        'latency_ms': _summary(latencies),
+        'throughput': batch_size * len(latencies) / float(latencies.sum()),
+        'preprocess_ms': float(np.mean(pre_times) * 1000),
+        'inference_ms': float(np.mean(infer_times) * 1000),
+        'postprocess_ms': float(np.mean(post_times) * 1000),
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def _case_worker(args, case, images, result_queue):
+    try:
+        result_queue.put(('result', benchmark_case(args, case, images)))
+    except Exception:
+        result_queue.put(('error', traceback.format_exc()))
+
+
+def run_case(args, case, images):
+    """Run a case in a new process with the threads of the case."""
+    ctx = multiprocessing.get_context('spawn')
+    result_queue = ctx.Queue()
+    # The math libraries read the threads from the environment when loaded,
+    # and the spawned process inherits the environment.
+    env = {
+        key: os.environ.get(key)
+        for key in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS')
+    }
+    for key in env:
+        os.environ[key] = str(case['threads'])
+    try:
+        process = ctx.Process(
+            target=_case_worker, args=(args, case, images, result_queue))
+        process.start()
+    finally:
+        for key, value in env.items():
+            if value is None:
+                os.environ.pop(key)
+            else:
+                os.environ[key] = value
+
+    while True:
+        try:
+            kind, value = result_queue.get(timeout=10)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                kind, value = 'error', 'The process exited with code {}.'.format(
+                    process.exitcode)
+                break
+    process.join()
+    if kind == 'error':
+        return {'error': value}
+    value['error'] = None
+    return value
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare the results with the baseline.
+
+    A case regresses if its p50 latency or its peak RSS grows by more than
+    threshold, if its throughput drops by more than threshold, or if it fails
+    while it succeeded in the baseline.
+
+    Args:
+        results (list): The results of this run.
+        baseline (list): The results of the baseline.
+        threshold (float): The relative degradation regarded as a regression.
+
+    Returns:
+        list: The regressions of (case name, metric, baseline value, value, relative change).
+            The metric is 'error' for a failed case, whose values are None.
+    """
+    base = {r['name']: r for r in baseline if not r.get('error')}
+    regressions = []
+    for result in results:
+        name = result['name']
+        if name in base and result.get('error'):
+            base.pop(name)
+            regressions.append((name, 'error', None, None, None))
+            logger.info('{}: failed  REGRESSION'.format(name))
+            continue
+        if name not in base:
+            logger.info('{}: not in the baseline'.format(name))
+            continue
+        b = base.pop(name)
+        metrics = [('latency_p50_ms', b['latency_ms']['p50'],
+                    result['latency_ms']['p50'], 1),
+                   ('throughput', b['throughput'], result['throughput'], -1)]
+        if b.get('peak_rss_mb') and result.get('peak_rss_mb'):
+            metrics.append(('peak_rss_mb', b['peak_rss_mb'],
+                            result['peak_rss_mb'], 1))
+        for metric, old, new, sign in metrics:
+            change = (new - old) / old
+            flag = ''
+            if sign * change > threshold:
+                regressions.append((name, metric, old, new, change))
+                flag = '  REGRESSION'
+            logger.info('{}: {} {:.2f} -> {:.2f} ({:+.1%}){}'.format(
+                name, metric, old, new, change, flag))
+    for name in base:
+        logger.warning('{}: in the baseline but not run'.format(name))
+    return regressions
+
+
+def main(args):
+    images = None
+    if args.image_path is not None:
+        images, _ = get_image_list(args.image_path)
+        if not images:
+            raise RuntimeError('No image is found in {}.'.format(
+                args.image_path))
+    resolutions = [parse_resolution(r) for r in args.resolutions]
+
+    results = []
+    for path, resolution, batch_size, precision, threads in itertools.product(
+            args.paths, resolutions, args.batch_sizes, args.precisions,
+            args.threads):
+        case = {
+            'path': path,
+            'resolution': list(resolution),
+            'batch_size': batch_size,
+            'precision': precision,
+            'threads': threads
+        }
+        name = case_name(case)
+        logger.info('Run {}'.format(name))
+        result = dict(name=name, **case)
+        result.update(run_case(args, case, images))
+        results.append(result)
+        if result['error']:
+            logger.error('{} failed:\n{}'.format(name, result['error']))
+            continue
+        latency = result['latency_ms']
+        peak_rss = result['peak_rss_mb']
+        logger.info(
+            '{}: latency p50 {:.1f}ms p90 {:.1f}ms p99 {:.1f}ms, {:.2f} images/s, '
+            'preprocess {:.1f}ms, inference {:.1f}ms, postprocess {:.1f}ms, '
+            'peak rss {}'.format(name, latency['p50'], latency['p90'],
+                                   latency['p99'], result['throughput'],
+                                   result['preprocess_ms'],
+                                   result['inference_ms'],
+                                   result['postprocess_ms'], 'n/a'
+                                   if peak_rss is None else
+                                   '{:.0f}MB'.format(peak_rss)))
+
+    report = {
+        'meta': {
+            'model': args.cfg or args.model_config,
+            'device': args.device,
+            'paddle_version': paddle.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'images': args.image_path,
+            'warmup': args.warmup,
+            'repeats': args.repeats,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S')
+        },
+        'results': results
+    }
+    output_dir = os.path.dirname(args.output)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info('The results are saved to {}'.format(args.output))
+
+    failed = [r['name'] for r in results if r['error']]
+    if failed:
+        logger.error('{} cases failed: {}'.format(len(failed), failed))
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            logger.error('{} regressions beyond {:.0%} against {}'.format(
+                len(regressions), args.threshold, args.baseline))
+            sys.exit(1)
+        logger.info('No regression beyond {:.0%} against {}'.format(
+            args.threshold, args.baseline))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
@@ -139,7 +139,7 @@ def parse_args():
 
 def get_dataset(args):
     comp = manager.DATASETS
-    if args.dataset_type not in comp.components_dict:
+    if args.dataset_type not in comp:
         raise RuntimeError("The dataset is not supported.")
 
     cfg = DeployConfig(args.cfg)
@@ -232,9 +232,7 @@ class DatasetPredictor(Predictor):
         output_names = self.predictor.get_output_names()
         output_handle = self.predictor.get_output_handle(output_names[0])
 
-        intersect_area_all = 0
-        pred_area_all = 0
-        label_area_all = 0
+        conf_mat_all = 0
         total_time = 0
         progbar_val = progbar.Progbar(target=len(dataset), verbose=1)
 
@@ -257,18 +255,17 @@ class DatasetPredictor(Predictor):
                 label = F.interpolate(label, pred.shape[-2:])
                 label = paddle.squeeze(label, 0)
 
-            intersect_area, pred_area, label_area = metrics.calculate_area(
+            conf_mat = metrics.confusion_matrix(
                 pred,
                 label,
                 dataset.num_classes,
                 ignore_index=dataset.ignore_index)
-
-            intersect_area_all = intersect_area_all + intersect_area
-            pred_area_all = pred_area_all + pred_area
-            label_area_all = label_area_all + label_area
+            conf_mat_all = conf_mat_all + conf_mat
 
             progbar_val.update(idx + 1)
 
+        intersect_area_all, pred_area_all, label_area_all = \
+            metrics.confusion_matrix_to_area(conf_mat_all)
         class_iou, miou = metrics.mean_iou(intersect_area_all, pred_area_all,
                                            label_area_all)
         class_acc, acc = metrics.accuracy(intersect_area_all, pred_area_all)
@@ -0,0 +1,407 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A local HTTP inference server of an exported model, which batches the
+concurrent requests of images with the same shape.
+
+Endpoints:
+    POST /predict?format=png|raw  The body is an encoded image, e.g. jpg or png.
+        format=png (default) returns the mask as a grayscale png image.
+        format=raw returns the mask as uint8 bytes in row-major order. The
+        shape of the mask is in the X-Mask-Shape header, e.g. '512,1024'.
+    GET /metrics  The latency percentiles, queue depth and batch sizes in json.
+    GET /health   Returns 'ok'.
+
+Usage:
+    python deploy/python/infer_server.py --config output/deploy.yaml \
+        --device cpu --enable_mkldnn True --max_batch_size 4 --max_delay_ms 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+LOCAL_PATH = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(LOCAL_PATH, '..', '..'))
+
+import cv2
+import numpy as np
+
+from paddleseg.utils import logger
+
+from infer import Predictor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Inference server')
+    parser.add_argument(
+        "--config",
+        dest="cfg",
+        help="The config file.",
+        default=None,
+        type=str,
+        required=True)
+    parser.add_argument(
+        '--host', default='127.0.0.1', type=str, help='The host to listen on.')
+    parser.add_argument(
+        '--port', default=8866, type=int, help='The port to listen on.')
+    parser.add_argument(
+        '--max_batch_size',
+        default=4,
+        type=int,
+        help='The maximum number of images inferred together.')
+    parser.add_argument(
+        '--max_delay_ms',
+        default=10,
+        type=float,
+        help='The maximum time a request waits for other requests to be batched with.'
+    )
+    parser.add_argument(
+        '--metrics_window',
+        default=10000,
+        type=int,
+        help='The number of latest requests the latency percentiles are computed on.'
+    )
+    parser.add_argument(
+        '--device',
+        choices=['cpu', 'gpu'],
+        default="cpu",
+        help="Select which device to inference, defaults to cpu.")
+    parser.add_argument(
+        '--use_trt',
+        default=False,
+        type=eval,
+        choices=[True, False],
+        help='Whether to use Nvidia TensorRT to accelerate prediction.')
+    parser.add_argument(
+        "--precision",
+        default="fp32",
+        type=str,
+        choices=["fp32", "fp16", "int8"],
+        help='The tensorrt precision.')
+    parser.add_argument(
+        '--min_subgraph_size',
+        default=3,
+        type=int,
+        help='The min subgraph size in tensorrt prediction.')
+    parser.add_argument(
+        '--cpu_threads',
+        default=10,
+        type=int,
+        help='Number of threads to predict when using cpu.')
+    parser.add_argument(
+        '--enable_mkldnn',
+        default=False,
+        type=eval,
+        choices=[True, False],
+        help='Enable to use mkldnn to speed up when using cpu.')
+    parser.add_argument(
+        '--print_detail',
+        default=False,
+        type=eval,
+        choices=[True, False],
+        help='Print GLOG information of Paddle Inference.')
+
+    args = parser.parse_args()
+    # The options of Predictor which the server does not use.
+    args.enable_auto_tune = False
+    args.benchmark = False
+    args.batch_size = args.max_batch_size
+    return args
+
+
+class ServerMetrics(object):
+    """
+    Collect the latencies of the latest requests and the batch sizes.
+
+    Args:
+        window (int): The number of latest requests the percentiles are computed on.
+    """
+
+    def __init__(self, window=10000):
+        self._lock = threading.Lock()
+        self._latency = deque(maxlen=window)
+        self._queue_wait = deque(maxlen=window)
+        self._inference = deque(maxlen=window)
+        self._batch_sizes = {}
+        self._num_requests = 0
+        self._num_errors = 0
+        self._start = time.time()
+
+    def add_request(self, latency, queue_wait):
+        with self._lock:
+            self._num_requests += 1
+            self._latency.append(latency)
+            self._queue_wait.append(queue_wait)
+
+    def add_error(self):
+        with self._lock:
+            self._num_errors += 1
+
+    def add_batch(self, batch_size, inference_time):
+        with self._lock:
+            self._batch_sizes[batch_size] = self._batch_sizes.get(batch_size,
+                                                                  0) + 1
+            self._inference.append(inference_time)
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return {}
+        values = np.array(values) * 1000
+        summary = {'mean': float(values.mean())}
+        for p in (50, 90, 95, 99):
+            summary['p{}'.format(p)] = float(np.percentile(values, p))
+        summary['max'] = float(values.max())
+        return summary
+
+    def report(self, queue_depth):
+        with self._lock:
+            num_batches = sum(self._batch_sizes.values())
+            num_images = sum(k * v for k, v in self._batch_sizes.items())
+            return {
+                'uptime_s': time.time() - self._start,
+                'requests': self._num_requests,
+                'errors': self._num_errors,
+                'queue_depth': queue_depth,
+                'latency_ms': self._summary(self._latency),
+                'queue_wait_ms': self._summary(self._queue_wait),
+                'inference_ms': self._summary(self._inference),
+                'batch_size': {
+                    'mean': num_images / num_batches if num_batches else 0,
+                    'count': {
+                        str(k): v
+                        for k, v in sorted(self._batch_sizes.items())
+                    }
+                }
+            }
+
+
+class MicroBatcher(object):
+    """
+    Batch the requests of images with the same shape and run them on the
+    predictor in a single thread.
+
+    A shape bucket is inferred once it has max_batch_size images, or once its
+    oldest image has waited max_delay seconds. The buckets which are due are
+    served in the order they are created.
+
+    Args:
+        predictor (Predictor): The predictor of the exported model.
+        metrics (ServerMetrics): The metrics to record the batches in.
+        max_batch_size (int, optional): The maximum number of images inferred together. Default: 4.
+        max_delay (float, optional): The maximum seconds an image waits for the batching. Default: 0.01.
+    """
+
+    def __init__(self, predictor, metrics, max_batch_size=4, max_delay=0.01):
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size should be positive, but it is {}.'.
+                             format(max_batch_size))
+        self.predictor = predictor
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._buckets = OrderedDict()
+        self._depth = 0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        """The number of images waiting to be inferred."""
+        return self._depth
+
+    def submit(self, data):
+        """
+        Queue a preprocessed image of shape (C, H, W).
+
+        Returns:
+            Future: The future of the mask of shape (H, W) and the seconds it waited in the queue.
+        """
+        future = Future()
+        with self._cond:
+            key = data.shape
+            if key not in self._buckets:
+                self._buckets[key] = []
+            self._buckets[key].append((data, future, time.time()))
+            self._depth += 1
+            self._cond.notify()
+        return future
+
+    def _next_batch(self):
+        """Wait for a due bucket and take a batch from it."""
+        with self._cond:
+            while True:
+                now = time.time()
+                due = None
+                wait = None
+                for key, requests in self._buckets.items():
+                    deadline = requests[0][2] + self.max_delay
+                    if len(requests) >= self.max_batch_size or deadline <= now:
+                        due = key
+                        break
+                    wait = deadline - now if wait is None else min(
+                        wait, deadline - now)
+                if due is not None:
+                    requests = self._buckets[due]
+                    batch = requests[:self.max_batch_size]
+                    if len(requests) > self.max_batch_size:
+                        self._buckets[due] = requests[self.max_batch_size:]
+                    else:
+                        del self._buckets[due]
+                    self._depth -= len(batch)
+                    return batch
+                self._cond.wait(wait)
+
+    def _run(self):
+        input_names = self.predictor.predictor.get_input_names()
+        input_handle = self.predictor.predictor.get_input_handle(input_names[
+            0])
+        output_names = self.predictor.predictor.get_output_names()
+        output_handle = self.predictor.predictor.get_output_handle(
+            output_names[0])
+        while True:
+            batch = self._next_batch()
+            start = time.time()
+            try:
+                data = np.stack([item[0] for item in batch])
+                input_handle.reshape(data.shape)
+                input_handle.copy_from_cpu(data)
+                self.predictor.predictor.run()
+                results = output_handle.copy_to_cpu()
+                if results.ndim == 4:
+                    results = np.argmax(results, axis=1)
+                results = results.astype('uint8')
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self.metrics.add_batch(len(batch), time.time() - start)
+            for i, (_, future, queued) in enumerate(batch):
+                future.set_result((results[i], start - queued))
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    # Set by `main`.
+    batcher = None
+    metrics = None
+    transforms = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send(self, code, body, content_type, headers=None):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, code, obj):
+        self._send(code, json.dumps(obj).encode('utf-8'), 'application/json')
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/metrics':
+            self._send_json(200,
+                            self.metrics.report(self.batcher.queue_depth))
+        elif path == '/health':
+            self._send(200, b'ok', 'text/plain')
+        else:
+            self._send_json(404, {'error': 'Not found: {}'.format(path)})
+
+    def do_POST(self):
+        start = time.time()
+        url = urlparse(self.path)
+        if url.path != '/predict':
+            self._send_json(404, {'error': 'Not found: {}'.format(url.path)})
+            return
+        fmt = parse_qs(url.query).get('format', ['png'])[0]
+        if fmt not in ('png', 'raw'):
+            self._send_json(400, {
+                'error': "format should be 'png' or 'raw', but got {}.".format(
+                    fmt)
+            })
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            im = cv2.imdecode(
+                np.frombuffer(
+                    self.rfile.read(length), dtype='uint8'),
+                cv2.IMREAD_COLOR)
+            if im is None:
+                raise ValueError('The body is not an image.')
+            data = self.transforms(im)[0].astype('float32', copy=False)
+        except Exception as e:
+            self.metrics.add_error()
+            self._send_json(400, {'error': str(e)})
+            return
+
+        try:
+            mask, queue_wait = self.batcher.submit(data).result()
+        except Exception as e:
+            self.metrics.add_error()
+            self._send_json(500, {'error': str(e)})
+            return
+
+        if fmt == 'png':
+            body = cv2.imencode('.png', mask)[1].tobytes()
+            content_type = 'image/png'
+        else:
+            body = mask.tobytes()
+            content_type = 'application/octet-stream'
+        self.metrics.add_request(time.time() - start, queue_wait)
+        self._send(
+            200,
+            body,
+            content_type,
+            headers={'X-Mask-Shape': '{},{}'.format(*mask.shape)})
+
+
+def main(args):
+    predictor = Predictor(args)
+    metrics = ServerMetrics(args.metrics_window)
+    InferenceHandler.metrics = metrics
+    InferenceHandler.transforms = predictor.cfg.transforms
+    InferenceHandler.batcher = MicroBatcher(
+        predictor,
+        metrics,
+        max_batch_size=args.max_batch_size,
+        max_delay=args.max_delay_ms / 1000.)
+
+    server = ThreadingHTTPServer((args.host, args.port), InferenceHandler)
+    server.daemon_threads = True
+    logger.info('Serving {} on http://{}:{}'.format(args.cfg, args.host,
+                                                     args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
@@ -0,0 +1,141 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A load generator of infer_server.py. It sends the images from a number of
+concurrent clients, and reports the throughput, the client side latency
+percentiles and the metrics of the server.
+
+Usage:
+    python deploy/python/infer_server_load.py --image_path data/images \
+        --concurrency 8 --num_requests 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+LOCAL_PATH = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(LOCAL_PATH, '..', '..'))
+
+import numpy as np
+
+from paddleseg.utils import get_image_list
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Inference server load test')
+    parser.add_argument(
+        '--url',
+        default='http://127.0.0.1:8866',
+        type=str,
+        help='The url of the server.')
+    parser.add_argument(
+        '--image_path',
+        dest='image_path',
+        help='The directory or path or file list of the images to be sent.',
+        type=str,
+        default=None,
+        required=True)
+    parser.add_argument(
+        '--concurrency',
+        default=8,
+        type=int,
+        help='The number of clients sending requests at the same time.')
+    parser.add_argument(
+        '--num_requests',
+        default=200,
+        type=int,
+        help='The total number of requests.')
+    parser.add_argument(
+        '--format',
+        default='png',
+        choices=['png', 'raw'],
+        type=str,
+        help='The format of the masks to request.')
+    return parser.parse_args()
+
+
+def client(args, images, counter, latencies, errors, lock):
+    while True:
+        with lock:
+            index = counter[0]
+            if index >= args.num_requests:
+                return
+            counter[0] += 1
+        body = images[index % len(images)]
+        request = urllib.request.Request(
+            args.url + '/predict?format=' + args.format,
+            data=body,
+            headers={'Content-Type': 'application/octet-stream'})
+        start = time.time()
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            continue
+        with lock:
+            latencies.append(time.time() - start)
+
+
+def main(args):
+    images_list, _ = get_image_list(args.image_path)
+    if not images_list:
+        raise RuntimeError('No image is found in {}.'.format(args.image_path))
+    images = []
+    for path in images_list:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+
+    counter = [0]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=client,
+            args=(args, images, counter, latencies, errors, lock))
+        for _ in range(args.concurrency)
+    ]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.time() - start
+
+    print('requests: {}, errors: {}, concurrency: {}'.format(
+        args.num_requests, len(errors), args.concurrency))
+    print('throughput: {:.2f} images/s'.format(len(latencies) / total))
+    if latencies:
+        latencies = np.array(latencies) * 1000
+        print('latency(ms): mean {:.1f}, p50 {:.1f}, p90 {:.1f}, p99 {:.1f}'.
+              format(latencies.mean(),
+                     np.percentile(latencies, 50),
+                     np.percentile(latencies, 90), np.percentile(latencies, 99)))
+    if errors:
+        print('first error: {}'.format(errors[0]))
+    with urllib.request.urlopen(args.url + '/metrics') as response:
+        metrics = json.loads(response.read())
+    print('server metrics: {}'.format(json.dumps(metrics, indent=2)))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
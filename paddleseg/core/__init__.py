@@ -14,7 +14,8 @@
 
 from .train import train
 from .val import evaluate
+from .async_eval import AsyncEvaluator
 from .predict import predict
 from . import infer
 
-__all__ = ['train', 'evaluate', 'predict']
+__all__ = ['train', 'evaluate', 'predict', 'AsyncEvaluator']
@@ -0,0 +1,200 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+import os
+import queue
+import traceback
+
+import paddle
+
+from paddleseg.utils import logger
+from paddleseg.utils.checkpoint import snapshot_state_dict
+
+
+def _eval_worker(config_path, config_dic, device, save_dir, eval_kwargs,
+                 task_queue, result_queue):
+    # The worker evaluates alone, even if it is started by a rank of a
+    # distributed training.
+    os.environ['PADDLE_TRAINERS_NUM'] = '1'
+    os.environ['PADDLE_TRAINER_ID'] = '0'
+    try:
+        from paddleseg.cvlibs import Config
+        from paddleseg.core.val import evaluate
+        from paddleseg.utils.checkpoint import AsyncCheckpointWriter
+
+        paddle.set_device(device)
+        cfg = Config(config_path)
+        if config_dic is not None:
+            cfg.dic = config_dic
+        model = cfg.model
+        val_dataset = cfg.val_dataset
+        writer = AsyncCheckpointWriter(save_dir)
+        best_mean_iou = -1.0
+    except Exception:
+        result_queue.put(('error', traceback.format_exc()))
+        return
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        iter, state_dict = task
+        try:
+            model.set_state_dict(state_dict)
+            mean_iou, acc, _, _, _ = evaluate(model, val_dataset,
+                                              **eval_kwargs)
+            is_best = mean_iou > best_mean_iou
+            if is_best:
+                best_mean_iou = mean_iou
+                writer.save('best_model', state_dict, rotate=False)
+                writer.wait()
+            result_queue.put(('result', (iter, mean_iou, acc, is_best)))
+        except Exception:
+            result_queue.put(('error', traceback.format_exc()))
+            break
+    writer.close()
+
+
+class AsyncEvaluator(object):
+    """
+    Evaluate the snapshots of the training in a separate process, so that the
+    training goes on during evaluation.
+
+    The process builds the model and the validation dataset of the config
+    once, and evaluates the weights handed over by `submit` in order. It
+    saves the weights with the best mIoU to `save_dir/best_model`. The results
+    are collected by `poll`, which never waits.
+
+    Args:
+        config_path (str): The config file of the training.
+        save_dir (str): The directory to save the best model.
+        device (str, optional): The device of evaluation, e.g. 'cpu', 'gpu:1'. Default: 'cpu'.
+        config_dic (dict, optional): The config content used instead of the file, e.g. after the
+            command line updates. Default: None.
+        max_pending (int, optional): Maximum number of snapshots which are evaluated or waiting.
+            The further snapshots are skipped until one is done. Default: 1.
+        **eval_kwargs: The keyword arguments of `paddleseg.core.evaluate`, e.g. the test config.
+    """
+
+    def __init__(self,
+                 config_path,
+                 save_dir,
+                 device='cpu',
+                 config_dic=None,
+                 max_pending=1,
+                 **eval_kwargs):
+        if max_pending < 1:
+            raise ValueError('max_pending should be positive, but it is {}.'.
+                             format(max_pending))
+        self.max_pending = max_pending
+        self._num_pending = 0
+        self._best_mean_iou = -1.0
+        self._best_iter = -1
+        # CUDA can not be used in a forked process.
+        ctx = multiprocessing.get_context('spawn')
+        self._task_queue = ctx.Queue()
+        self._result_queue = ctx.Queue()
+        self._process = ctx.Process(
+            target=_eval_worker,
+            args=(config_path, config_dic, device, save_dir, eval_kwargs,
+                  self._task_queue, self._result_queue),
+            daemon=True)
+        self._process.start()
+
+    @property
+    def best(self):
+        """The best mIoU and its iter among the results collected so far."""
+        return self._best_mean_iou, self._best_iter
+
+    def submit(self, iter, model, block=False):
+        """
+        Snapshot the weights and queue them to be evaluated.
+
+        Args:
+            iter (int): The iter of the weights.
+            model (nn.Layer|dict): The model or its state dict.
+            block (bool, optional): Whether to wait for a pending evaluation to finish if
+                `max_pending` is reached, instead of skipping the weights. Default: False.
+
+        Returns:
+            list: The results collected while waiting, see `poll`.
+            bool: Whether the weights are queued.
+        """
+        results = self.poll()
+        if self._num_pending >= self.max_pending:
+            if not block:
+                logger.warning(
+                    '[EVAL] Skip the evaluation of iter {}, since the former '
+                    'evaluation is not done.'.format(iter))
+                return results, False
+            while self._num_pending >= self.max_pending:
+                results += self._get(block=True)
+        state_dict = model if isinstance(model, dict) else model.state_dict()
+        self._task_queue.put((iter, snapshot_state_dict(state_dict)))
+        self._num_pending += 1
+        return results, True
+
+    def poll(self):
+        """
+        Collect the results which are ready, without waiting.
+
+        Returns:
+            list: The results of (iter, mean_iou, acc, is_best), where is_best tells whether the
+                weights are the best so far and saved as the best model.
+        """
+        results = []
+        while self._num_pending > 0:
+            result = self._get(block=False)
+            if not result:
+                break
+            results += result
+        return results
+
+    def close(self):
+        """
+        Wait for the pending evaluations and stop the process.
+
+        Returns:
+            list: The remaining results, see `poll`.
+        """
+        results = []
+        while self._num_pending > 0:
+            results += self._get(block=True)
+        self._task_queue.put(None)
+        self._process.join()
+        return results
+
+    def _get(self, block):
+        try:
+            # Check the process now and then, so that a crash does not
+            # block forever.
+            kind, value = self._result_queue.get(
+                block=block, timeout=10 if block else None)
+        except queue.Empty:
+            if not self._process.is_alive():
+                raise RuntimeError(
+                    'The evaluation process exited with code {}.'.format(
+                        self._process.exitcode))
+            return []
+        if kind == 'error':
+            raise RuntimeError('The evaluation process failed:\n' + value)
+        self._num_pending -= 1
+        iter, mean_iou, _, _ = value
+        # Compare with the best of all results, so the bookkeeping does not
+        # depend on the order of the results.
+        if mean_iou > self._best_mean_iou:
+            self._best_mean_iou = mean_iou
+            self._best_iter = iter
+        return [value]
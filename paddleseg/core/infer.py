@@ -150,31 +150,28 @@ def tensor_flip(x, flip):
     return x
 
 
-def slide_inference(model, im, crop_size, stride):
+def slide_windows(im_size, crop_size, stride):
     """
-    Infer by sliding window.
+    Get the windows of sliding window inference.
 
     Args:
-        model (paddle.nn.Layer): model to get logits of image.
-        im (Tensor): the input image.
+        im_size (tuple|list): The size of image, (h, w).
         crop_size (tuple|list). The size of sliding window, (w, h).
         stride (tuple|list). The size of stride, (w, h).
 
-    Return:
-        Tensor: The logit of input image.
+    Returns:
+        list: List of tuple (h1, h2, w1, w2). All windows have the same size.
     """
-    h_im, w_im = im.shape[-2:]
+    h_im, w_im = im_size
     w_crop, h_crop = crop_size
     w_stride, h_stride = stride
     # calculate the crop nums
-    rows = np.int(np.ceil(1.0 * (h_im - h_crop) / h_stride)) + 1
-    cols = np.int(np.ceil(1.0 * (w_im - w_crop) / w_stride)) + 1
+    rows = int(np.ceil(1.0 * (h_im - h_crop) / h_stride)) + 1
+    cols = int(np.ceil(1.0 * (w_im - w_crop) / w_stride)) + 1
     # prevent negative sliding rounds when imgs after scaling << crop_size
     rows = 1 if h_im <= h_crop else rows
     cols = 1 if w_im <= w_crop else cols
-    # TODO 'Tensor' object does not support item assignment. If support, use tensor to calculation.
-    final_logit = None
-    count = np.zeros([1, 1, h_im, w_im])
+    windows = []
     for r in range(rows):
         for c in range(cols):
             h1 = r * h_stride
@@ -183,23 +180,158 @@ def slide_inference(model, im, crop_size, stride):
             w2 = min(w1 + w_crop, w_im)
             h1 = max(h2 - h_crop, 0)
             w1 = max(w2 - w_crop, 0)
-            im_crop = im[:, :, h1:h2, w1:w2]
-            logits = model(im_crop)
-            if not isinstance(logits, collections.abc.Sequence):
-                raise TypeError(
-                    "The type of logits must be one of collections.abc.Sequence, e.g. list, tuple. But received {}"
-                    .format(type(logits)))
-            logit = logits[0].numpy()
-            if final_logit is None:
-                final_logit = np.zeros([1, logit.shape[1], h_im, w_im])
-            final_logit[:, :, h1:h2, w1:w2] += logit[:, :, :h2 - h1, :w2 - w1]
-            count[:, :, h1:h2, w1:w2] += 1
+            windows.append((h1, h2, w1, w2))
+    return windows
+
+
+def slide_window_weight(h, w, blend='uniform'):
+    """
+    Get the blending weight of a window.
+
+    Args:
+        h (int): The height of window.
+        w (int): The width of window.
+        blend (str, optional): The blending mode, one of ('uniform', 'gaussian', 'linear').
+            'uniform' averages the overlapping windows. 'gaussian' and 'linear' weight
+            the pixels of a window by a gaussian or a linear ramp from its center, which
+            reduces the seams of windows. Default: 'uniform'.
+
+    Returns:
+        np.ndarray: The weight with shape (h, w).
+    """
+    if blend == 'uniform':
+        return np.ones([h, w], dtype='float32')
+    elif blend == 'gaussian':
+        # sigma is 1/8 of the window size, as it is common for tiled inference.
+        def _weight_1d(n):
+            x = np.arange(n, dtype='float64') - (n - 1) / 2.
+            return np.exp(-0.5 * (x / (n / 8.))**2)
+    elif blend == 'linear':
+
+        def _weight_1d(n):
+            x = np.arange(n, dtype='float64')
+            return np.minimum(x + 1, n - x) / np.ceil(n / 2.)
+    else:
+        raise ValueError(
+            "`blend` should be one of ('uniform', 'gaussian', 'linear'), "
+            "but got {}.".format(blend))
+    weight = np.outer(_weight_1d(h), _weight_1d(w))
+    weight = weight / weight.max()
+    # Keep the border weight positive, so pixels covered by one window are still predicted.
+    weight = np.maximum(weight, 1e-3)
+    return weight.astype('float32')
+
+
+_slide_cache = collections.OrderedDict()
+_SLIDE_CACHE_SIZE = 8
+
+
+def _get_slide_setting(im_size, crop_size, stride, blend, use_numpy):
+    """
+    Get the windows, the window weight and the normalization map for sliding
+    window inference. They are cached by the image size, the window setting
+    and the device, since the images to infer usually share a few sizes.
+    """
+    key = (tuple(im_size), tuple(crop_size), tuple(stride), blend,
+           paddle.get_device())
+    if key in _slide_cache:
+        _slide_cache.move_to_end(key)
+        return _slide_cache[key]
+
+    h_im, w_im = im_size
+    windows = slide_windows(im_size, crop_size, stride)
+    h1, h2, w1, w2 = windows[0]
+    weight = slide_window_weight(h2 - h1, w2 - w1, blend)
+    count = np.zeros([h_im, w_im], dtype='float32')
+    for h1, h2, w1, w2 in windows:
+        count[h1:h2, w1:w2] += weight
     if np.sum(count == 0) != 0:
         raise RuntimeError(
             'There are pixel not predicted. It is possible that stride is greater than crop_size'
         )
+    weight = weight[np.newaxis, np.newaxis]
+    count = count[np.newaxis, np.newaxis]
+    if not use_numpy:
+        weight = paddle.to_tensor(weight)
+        count = paddle.to_tensor(count)
+    setting = (windows, weight, count)
+
+    _slide_cache[key] = setting
+    if len(_slide_cache) > _SLIDE_CACHE_SIZE:
+        _slide_cache.popitem(last=False)
+    return setting
+
+
+def slide_inference(model,
+                    im,
+                    crop_size,
+                    stride,
+                    batch_size=1,
+                    blend='uniform'):
+    """
+    Infer by sliding window.
+
+    The logits are accumulated on the device, and `batch_size` windows are
+    inferred by one forward of the model.
+
+    Args:
+        model (paddle.nn.Layer): model to get logits of image.
+        im (Tensor): the input image.
+        crop_size (tuple|list). The size of sliding window, (w, h).
+        stride (tuple|list). The size of stride, (w, h).
+        batch_size (int, optional): The number of windows inferred together. Default: 1.
+        blend (str, optional): The blending mode of the overlapping windows, one of
+            ('uniform', 'gaussian', 'linear'). Default: 'uniform'.
+
+    Return:
+        Tensor: The logit of input image.
+    """
+    if batch_size < 1:
+        raise ValueError('`batch_size` should be greater than 0, but got {}.'.
+                         format(batch_size))
+    # On CPU the host memory is the device memory, and NumPy accumulates the
+    # windows much faster than the slice assignment of tensors.
+    use_numpy = paddle.get_device() == 'cpu'
+    n_im = im.shape[0]
+    h_im, w_im = im.shape[-2:]
+    windows, weight, count = _get_slide_setting((h_im, w_im), crop_size,
+                                                stride, blend, use_numpy)
+    final_logit = None
+    for i in range(0, len(windows), batch_size):
+        batch_windows = windows[i:i + batch_size]
+        im_crop = [im[:, :, h1:h2, w1:w2] for h1, h2, w1, w2 in batch_windows]
+        im_crop = im_crop[0] if len(im_crop) == 1 else paddle.concat(
+            im_crop, axis=0)
+        logits = model(im_crop)
+        if not isinstance(logits, collections.abc.Sequence):
+            raise TypeError(
+                "The type of logits must be one of collections.abc.Sequence, e.g. list, tuple. But received {}"
+                .format(type(logits)))
+        logit = logits[0]
+        if logit.dtype != paddle.float32:
+            logit = logit.astype('float32')
+        if use_numpy:
+            logit = logit.numpy()
+        if final_logit is None:
+            shape = [n_im, logit.shape[1], h_im, w_im]
+            if use_numpy:
+                final_logit = np.zeros(shape, dtype='float32')
+            else:
+                final_logit = paddle.zeros(shape)
+                # Expand the maps over the channels once, it is faster than
+                # broadcasting them for every window.
+                count = count.expand(shape)
+                if blend != 'uniform':
+                    weight = weight.expand(shape[:2] + weight.shape[2:])
+        for j, (h1, h2, w1, w2) in enumerate(batch_windows):
+            window_logit = logit[j * n_im:(j + 1) * n_im, :, :h2 - h1, :w2 -
+                                 w1]
+            if blend != 'uniform':
+                window_logit = window_logit * weight
+            final_logit[:, :, h1:h2, w1:w2] += window_logit
     final_logit = final_logit / count
-    final_logit = paddle.to_tensor(final_logit)
+    if use_numpy:
+        final_logit = paddle.to_tensor(final_logit)
     return final_logit
 
 
@@ -209,7 +341,9 @@ def inference(model,
               transforms=None,
               is_slide=False,
               stride=None,
-              crop_size=None):
+              crop_size=None,
+              slide_batch_size=1,
+              slide_blend='uniform'):
     """
     Inference for image.
 
@@ -221,6 +355,9 @@ def inference(model,
         is_slide (bool): Whether to infer by sliding window. Default: False.
         crop_size (tuple|list). The size of sliding window, (w, h). It should be probided if is_slide is True.
         stride (tuple|list). The size of stride, (w, h). It should be probided if is_slide is True.
+        slide_batch_size (int, optional): The number of windows inferred together when is_slide is True. Default: 1.
+        slide_blend (str, optional): The blending mode of windows when is_slide is True, one of
+            ('uniform', 'gaussian', 'linear'). Default: 'uniform'.
 
     Returns:
         Tensor: If ori_shape is not None, a prediction with shape (1, 1, h, w) is returned.
@@ -236,7 +373,13 @@ def inference(model,
                 .format(type(logits)))
         logit = logits[0]
     else:
-        logit = slide_inference(model, im, crop_size=crop_size, stride=stride)
+        logit = slide_inference(
+            model,
+            im,
+            crop_size=crop_size,
+            stride=stride,
+            batch_size=slide_batch_size,
+            blend=slide_blend)
     if hasattr(model, 'data_format') and model.data_format == 'NHWC':
         logit = logit.transpose((0, 3, 1, 2))
     if ori_shape is not None:
@@ -256,7 +399,9 @@ def aug_inference(model,
                   flip_vertical=False,
                   is_slide=False,
                   stride=None,
-                  crop_size=None):
+                  crop_size=None,
+                  slide_batch_size=1,
+                  slide_blend='uniform'):
     """
     Infer with augmentation.
 
@@ -271,6 +416,9 @@ def aug_inference(model,
         is_slide (bool): Whether to infer by sliding wimdow. Default: False.
         crop_size (tuple|list). The size of sliding window, (w, h). It should be probided if is_slide is True.
         stride (tuple|list). The size of stride, (w, h). It should be probided if is_slide is True.
+        slide_batch_size (int, optional): The number of windows inferred together when is_slide is True. Default: 1.
+        slide_blend (str, optional): The blending mode of windows when is_slide is True, one of
+            ('uniform', 'gaussian', 'linear'). Default: 'uniform'.
 
     Returns:
         Tensor: Prediction of image with shape (1, 1, h, w) is returned.
@@ -295,7 +443,9 @@ def aug_inference(model,
                 im_flip,
                 is_slide=is_slide,
                 crop_size=crop_size,
-                stride=stride)
+                stride=stride,
+                slide_batch_size=slide_batch_size,
+                slide_blend=slide_blend)
             logit = tensor_flip(logit, flip)
             logit = F.interpolate(logit, (h_input, w_input), mode='bilinear')
 
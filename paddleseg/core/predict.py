@@ -14,6 +14,8 @@
 
 import os
 import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy as np
@@ -26,8 +28,48 @@ from paddleseg.utils import logger, progbar, visualize
 
 def mkdir(path):
     sub_dir = os.path.dirname(path)
-    if not os.path.exists(sub_dir):
-        os.makedirs(sub_dir)
+    os.makedirs(sub_dir, exist_ok=True)
+
+
+def save_prediction(im,
+                    pred,
+                    im_file,
+                    save_dir,
+                    color_map,
+                    save_mode='all'):
+    """
+    Encode and save the prediction of an image.
+
+    Args:
+        im (np.ndarray): The origin image in BGR.
+        pred (np.ndarray): The predicted label map of the image.
+        im_file (str): The path of the image relative to save_dir.
+        save_dir (str): The directory to save the results.
+        color_map (list): The color map of the pseudo color results.
+        save_mode (str, optional): What to save. 'all' saves the pseudo color result and the image
+            added with it, 'pseudo_color' saves the pseudo color result only, and 'label' saves the
+            label map as a grayscale png only. Default: 'all'.
+    """
+    png_file = os.path.splitext(im_file)[0] + ".png"
+    if save_mode == 'label':
+        label_path = os.path.join(save_dir, 'label_prediction', png_file)
+        mkdir(label_path)
+        cv2.imwrite(label_path, pred)
+        return
+
+    if save_mode == 'all':
+        added_image = utils.visualize.visualize(
+            im, pred, color_map, weight=0.6)
+        added_image_path = os.path.join(save_dir, 'added_prediction',
+                                        im_file)
+        mkdir(added_image_path)
+        cv2.imwrite(added_image_path, added_image)
+
+    pred_mask = utils.visualize.get_pseudo_color_map(pred, color_map)
+    pred_saved_path = os.path.join(save_dir, 'pseudo_color_prediction',
+                                   png_file)
+    mkdir(pred_saved_path)
+    pred_mask.save(pred_saved_path)
 
 
 def partition_list(arr, m):
@@ -49,7 +91,11 @@ def predict(model,
             is_slide=False,
             stride=None,
             crop_size=None,
-            custom_color=None):
+            slide_batch_size=1,
+            slide_blend='uniform',
+            custom_color=None,
+            save_mode='all',
+            num_writers=4):
     """
     predict and visualize the image_list.
 
@@ -69,9 +115,20 @@ def predict(model,
             It should be provided when `is_slide` is True.
         crop_size (tuple|list, optional):  The crop size of sliding window, the first is width and the second is height.
             It should be provided when `is_slide` is True.
+        slide_batch_size (int, optional): The number of windows inferred together when `is_slide` is True. Default: 1.
+        slide_blend (str, optional): The blending mode of windows when `is_slide` is True, one of
+            ('uniform', 'gaussian', 'linear'). Default: 'uniform'.
         custom_color (list, optional): Save images with a custom color map. Default: None, use paddleseg's default color map.
+        save_mode (str, optional): What to save, one of ('all', 'pseudo_color', 'label'). 'all' saves the pseudo
+            color results and the images added with them, 'pseudo_color' skips the added images, and 'label'
+            saves the label maps as grayscale png only. Default: 'all'.
+        num_writers (int, optional): The number of threads to encode and save the results. Default: 4.
 
     """
+    if save_mode not in ('all', 'pseudo_color', 'label'):
+        raise ValueError(
+            "`save_mode` should be one of ('all', 'pseudo_color', 'label'), "
+            "but got {}.".format(save_mode))
     utils.utils.load_entire_model(model, model_path)
     model.eval()
     nranks = paddle.distributed.get_world_size()
@@ -81,17 +138,20 @@ def predict(model,
     else:
         img_lists = [image_list]
 
-    added_saved_dir = os.path.join(save_dir, 'added_prediction')
-    pred_saved_dir = os.path.join(save_dir, 'pseudo_color_prediction')
-
     logger.info("Start to predict...")
     progbar_pred = progbar.Progbar(target=len(img_lists[0]), verbose=1)
     color_map = visualize.get_color_map_list(256, custom_color=custom_color)
-    with paddle.no_grad():
+    model_scales_count = {}
+    # The results are encoded and saved by a thread pool while the next
+    # images are predicted. At most 2 * num_writers results are pending.
+    pending = deque()
+    with paddle.no_grad(), ThreadPoolExecutor(num_writers) as writer:
         for i, im_path in enumerate(img_lists[local_rank]):
-            im = cv2.imread(im_path)
-            ori_shape = im.shape[:2]
-            im, _ = transforms(im)
+            # The image is decoded once, for the prediction and the added
+            # image.
+            ori_im = cv2.imread(im_path)
+            ori_shape = ori_im.shape[:2]
+            im, _ = transforms(ori_im)
             im = im[np.newaxis, ...]
             im = paddle.to_tensor(im)
 
@@ -106,7 +166,9 @@ def predict(model,
                     flip_vertical=flip_vertical,
                     is_slide=is_slide,
                     stride=stride,
-                    crop_size=crop_size)
+                    crop_size=crop_size,
+                    slide_batch_size=slide_batch_size,
+                    slide_blend=slide_blend)
             else:
                 pred, _ = infer.inference(
                     model,
@@ -115,10 +177,20 @@ def predict(model,
                     transforms=transforms.transforms,
                     is_slide=is_slide,
                     stride=stride,
-                    crop_size=crop_size)
+                    crop_size=crop_size,
+                    slide_batch_size=slide_batch_size,
+                    slide_blend=slide_blend)
             pred = paddle.squeeze(pred)
             pred = pred.numpy().astype('uint8')
 
+            # The scales run inside the model, e.g. MscaleOCR.
+            model_scales = getattr(model, 'last_scales', None)
+            if model_scales is not None:
+                key = str(model_scales)
+                model_scales_count[key] = model_scales_count.get(key, 0) + 1
+                logger.debug("{} ran the model scales {}".format(
+                    im_path, model_scales))
+
             # get the saved name
             if image_dir is not None:
                 im_file = im_path.replace(image_dir, '')
@@ -127,23 +199,19 @@ def predict(model,
             if im_file[0] == '/' or im_file[0] == '\\':
                 im_file = im_file[1:]
 
-            # save added image
-            added_image = utils.visualize.visualize(
-                im_path, pred, color_map, weight=0.6)
-            added_image_path = os.path.join(added_saved_dir, im_file)
-            mkdir(added_image_path)
-            cv2.imwrite(added_image_path, added_image)
-
-            # save pseudo color prediction
-            pred_mask = utils.visualize.get_pseudo_color_map(pred, color_map)
-            pred_saved_path = os.path.join(
-                pred_saved_dir, os.path.splitext(im_file)[0] + ".png")
-            mkdir(pred_saved_path)
-            pred_mask.save(pred_saved_path)
-
-            # pred_im = utils.visualize(im_path, pred, weight=0.0)
-            # pred_saved_path = os.path.join(pred_saved_dir, im_file)
-            # mkdir(pred_saved_path)
-            # cv2.imwrite(pred_saved_path, pred_im)
+            pending.append(
+                writer.submit(save_prediction, ori_im, pred, im_file,
+                              save_dir, color_map, save_mode))
+            while len(pending) > 2 * num_writers:
+                pending.popleft().result()
 
             progbar_pred.update(i + 1)
+    # The writer is shut down by the with statement, which waits for the
+    # pending results.
+    while pending:
+        pending.popleft().result()
+
+    if model_scales_count:
+        logger.info("Model scales run: " + ", ".join(
+            "{}: {} images".format(k, v)
+            for k, v in model_scales_count.items()))
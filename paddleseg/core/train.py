@@ -14,14 +14,14 @@
 
 import os
 import time
-from collections import deque
-import shutil
 
 import paddle
 import paddle.nn.functional as F
 
-from paddleseg.utils import (TimeAverager, calculate_eta, resume, logger,
-                             worker_init_fn, train_profiler, op_flops_funs)
+from paddleseg.utils import (TimeAverager, calculate_eta, resume, resume_ema,
+                             logger, worker_init_fn, train_profiler,
+                             op_flops_funs, AsyncCheckpointWriter, EMA)
+from paddleseg.utils.checkpoint import snapshot_state_dict
 from paddleseg.core.val import evaluate
 
 
@@ -37,6 +37,9 @@ def check_logits_losses(logits_list, losses):
 def loss_computation(logits_list, labels, losses, edges=None):
     check_logits_losses(logits_list, losses)
     loss_list = []
+    # The losses of the same type and label settings, e.g. the stacked RMILoss
+    # of MscaleOCR, share the label tensors computed once by `prepare_labels`.
+    label_caches = {}
     for i in range(len(logits_list)):
         logits = logits_list[i]
         loss_i = losses['types'][i]
@@ -49,11 +52,28 @@ def loss_computation(logits_list, labels, losses, edges=None):
         elif loss_i.__class__.__name__ in ("KLLoss", ):
             loss_list.append(coef_i *
                              loss_i(logits_list[0], logits_list[1].detach()))
+        elif hasattr(loss_i, 'prepare_labels'):
+            key = (loss_i.__class__.__name__, ) + tuple(loss_i.label_key())
+            if key not in label_caches:
+                label_caches[key] = loss_i.prepare_labels(labels)
+            loss_list.append(coef_i * loss_i(
+                logits, labels, label_cache=label_caches[key]))
         else:
             loss_list.append(coef_i * loss_i(logits, labels))
     return loss_list
 
 
+def _report_async_eval(results, evaluator, log_writer=None):
+    best_mean_iou, best_model_iter = evaluator.best
+    for iter, mean_iou, acc, _ in results:
+        logger.info(
+            '[EVAL] iter: {}, mIoU: {:.4f}, Acc: {:.4f}. The model with the best validation mIoU ({:.4f}) was saved at iter {}.'
+            .format(iter, mean_iou, acc, best_mean_iou, best_model_iter))
+        if log_writer is not None:
+            log_writer.add_scalar('Evaluate/mIoU', mean_iou, iter)
+            log_writer.add_scalar('Evaluate/Acc', acc, iter)
+
+
 def train(model,
           train_dataset,
           val_dataset=None,
@@ -72,7 +92,12 @@ def train(model,
           precision='fp32',
           amp_level='O1',
           profiler_options=None,
-          to_static_training=False):
+          to_static_training=False,
+          batch_transforms=None,
+          sync_free_logging=False,
+          ema_decay=None,
+          ema_update_interval=1,
+          evaluator=None):
     """
     Launch training.
 
@@ -99,6 +124,18 @@ def train(model,
             parameters and input data will be casted to fp16, except operators in black_list, don’t support fp16 kernel and batchnorm. Default is O1(amp)
         profiler_options (str, optional): The option of train profiler.
         to_static_training (bool, optional): Whether to use @to_static for training.
+        batch_transforms (paddleseg.transforms.BatchCompose, optional): The augmentations applied to every
+            mini-batch on the device, after the transforms of train_dataset. Default: None.
+        sync_free_logging (bool, optional): Whether to accumulate the losses on the device and read them back
+            only every log_iters, instead of waiting for the device at every iter. The batch_cost is then
+            averaged over the logging window. Default: False.
+        ema_decay (float, optional): Keep an exponential moving average of the weights with this decay on the
+            device, which is used to evaluate the model and saved as the best model. The EMA weights are saved
+            with every checkpoint as model.pdema, and resumed with resume_model. EMA is not used if it is
+            None. Default: None.
+        ema_update_interval (int, optional): How many iters to update the moving average once. Default: 1.
+        evaluator (paddleseg.core.AsyncEvaluator, optional): Evaluate the snapshots in a separate process
+            instead of val_dataset, while the training goes on. It also saves the best model. Default: None.
     """
     model.train()
     nranks = paddle.distributed.ParallelEnv().nranks
@@ -148,6 +185,12 @@ def train(model,
         model = paddle.jit.to_static(model)
         logger.info("Successfully to apply @to_static")
 
+    ema = None
+    if ema_decay is not None:
+        ema = EMA(model, decay=ema_decay, update_interval=ema_update_interval)
+        if resume_model is not None:
+            resume_ema(ema, resume_model, start_iter)
+
     avg_loss = 0.0
     avg_loss_list = []
     iters_per_epoch = len(batch_sampler)
@@ -155,36 +198,65 @@ def train(model,
     best_model_iter = -1
     reader_cost_averager = TimeAverager()
     batch_cost_averager = TimeAverager()
-    save_models = deque()
+    if local_rank == 0:
+        # One pending checkpoint and the best model sharing its weights.
+        ckpt_writer = AsyncCheckpointWriter(
+            save_dir, keep_checkpoint_max=keep_checkpoint_max, max_pending=2)
     batch_start = time.time()
-
-    iter = start_iter
-    while iter < iters:
-        for data in loader:
-            iter += 1
-            if iter > iters:
-                version = paddle.__version__
-                if version == '2.1.2':
-                    continue
+    # The start of the logging window of sync_free_logging.
+    window_start = batch_start
+    window_iter = start_iter
+
+    try:
+        iter = start_iter
+        while iter < iters:
+            for data in loader:
+                iter += 1
+                if iter > iters:
+                    version = paddle.__version__
+                    if version == '2.1.2':
+                        continue
+                    else:
+                        break
+                reader_cost_averager.record(time.time() - batch_start)
+                images = data[0]
+                labels = data[1].astype('int64')
+                edges = None
+                if len(data) == 3:
+                    edges = data[2].astype('int64')
+                if batch_transforms is not None:
+                    images, labels, edges = batch_transforms(
+                        images, labels, edges)
+                if hasattr(model,
+                           'data_format') and model.data_format == 'NHWC':
+                    images = images.transpose((0, 2, 3, 1))
+
+                if precision == 'fp16':
+                    with paddle.amp.auto_cast(
+                            level=amp_level,
+                            enable=True,
+                            custom_white_list={
+                                "elementwise_add", "batch_norm",
+                                "sync_batch_norm"
+                            },
+                            custom_black_list={'bilinear_interp_v2'}):
+                        logits_list = ddp_model(
+                            images) if nranks > 1 else model(images)
+                        loss_list = loss_computation(
+                            logits_list=logits_list,
+                            labels=labels,
+                            losses=losses,
+                            edges=edges)
+                        loss = sum(loss_list)
+
+                    scaled = scaler.scale(loss)  # scale the loss
+                    scaled.backward()  # do backward
+                    if isinstance(optimizer, paddle.distributed.fleet.Fleet):
+                        scaler.minimize(optimizer.user_defined_optimizer,
+                                        scaled)
+                    else:
+                        scaler.minimize(optimizer, scaled)  # update parameters
                 else:
-                    break
-            reader_cost_averager.record(time.time() - batch_start)
-            images = data[0]
-            labels = data[1].astype('int64')
-            edges = None
-            if len(data) == 3:
-                edges = data[2].astype('int64')
-            if hasattr(model, 'data_format') and model.data_format == 'NHWC':
-                images = images.transpose((0, 2, 3, 1))
-
-            if precision == 'fp16':
-                with paddle.amp.auto_cast(
-                        level=amp_level,
-                        enable=True,
-                        custom_white_list={
-                            "elementwise_add", "batch_norm", "sync_batch_norm"
-                        },
-                        custom_black_list={'bilinear_interp_v2'}):
                     logits_list = ddp_model(images) if nranks > 1 else model(
                         images)
                     loss_list = loss_computation(
@@ -193,131 +265,183 @@ def train(model,
                         losses=losses,
                         edges=edges)
                     loss = sum(loss_list)
+                    loss.backward()
+                    # if the optimizer is ReduceOnPlateau, the loss is the one which has been pass into step.
+                    if isinstance(optimizer,
+                                  paddle.optimizer.lr.ReduceOnPlateau):
+                        optimizer.step(loss)
+                    else:
+                        optimizer.step()
+
+                lr = optimizer.get_lr()
 
-                scaled = scaler.scale(loss)  # scale the loss
-                scaled.backward()  # do backward
+                # update lr
                 if isinstance(optimizer, paddle.distributed.fleet.Fleet):
-                    scaler.minimize(optimizer.user_defined_optimizer, scaled)
+                    lr_sche = optimizer.user_defined_optimizer._learning_rate
                 else:
-                    scaler.minimize(optimizer, scaled)  # update parameters
-            else:
-                logits_list = ddp_model(images) if nranks > 1 else model(images)
-                loss_list = loss_computation(
-                    logits_list=logits_list,
-                    labels=labels,
-                    losses=losses,
-                    edges=edges)
-                loss = sum(loss_list)
-                loss.backward()
-                # if the optimizer is ReduceOnPlateau, the loss is the one which has been pass into step.
-                if isinstance(optimizer, paddle.optimizer.lr.ReduceOnPlateau):
-                    optimizer.step(loss)
+                    lr_sche = optimizer._learning_rate
+                if isinstance(lr_sche, paddle.optimizer.lr.LRScheduler):
+                    lr_sche.step()
+
+                if ema is not None:
+                    ema.step()
+
+                train_profiler.add_profiler_step(profiler_options)
+
+                model.clear_gradients()
+                if sync_free_logging:
+                    # Sum the losses on the device without waiting for them.
+                    step_losses = paddle.concat([
+                        l.detach().astype('float32').reshape([1])
+                        for l in loss_list
+                    ])
+                    if isinstance(avg_loss_list, list):
+                        avg_loss_list = step_losses
+                    else:
+                        avg_loss_list = avg_loss_list + step_losses
                 else:
-                    optimizer.step()
-
-            lr = optimizer.get_lr()
-
-            # update lr
-            if isinstance(optimizer, paddle.distributed.fleet.Fleet):
-                lr_sche = optimizer.user_defined_optimizer._learning_rate
-            else:
-                lr_sche = optimizer._learning_rate
-            if isinstance(lr_sche, paddle.optimizer.lr.LRScheduler):
-                lr_sche.step()
-
-            train_profiler.add_profiler_step(profiler_options)
-
-            model.clear_gradients()
-            avg_loss += loss.numpy()[0]
-            if not avg_loss_list:
-                avg_loss_list = [l.numpy() for l in loss_list]
-            else:
-                for i in range(len(loss_list)):
-                    avg_loss_list[i] += loss_list[i].numpy()
-            batch_cost_averager.record(
-                time.time() - batch_start, num_samples=batch_size)
-
-            if (iter) % log_iters == 0 and local_rank == 0:
-                avg_loss /= log_iters
-                avg_loss_list = [l[0] / log_iters for l in avg_loss_list]
-                remain_iters = iters - iter
-                avg_train_batch_cost = batch_cost_averager.get_average()
-                avg_train_reader_cost = reader_cost_averager.get_average()
-                eta = calculate_eta(remain_iters, avg_train_batch_cost)
-                logger.info(
-                    "[TRAIN] epoch: {}, iter: {}/{}, loss: {:.4f}, lr: {:.6f}, batch_cost: {:.4f}, reader_cost: {:.5f}, ips: {:.4f} samples/sec | ETA {}"
-                    .format((iter - 1
-                             ) // iters_per_epoch + 1, iter, iters, avg_loss,
-                            lr, avg_train_batch_cost, avg_train_reader_cost,
-                            batch_cost_averager.get_ips_average(), eta))
-                if use_vdl:
-                    log_writer.add_scalar('Train/loss', avg_loss, iter)
-                    # Record all losses if there are more than 2 losses.
-                    if len(avg_loss_list) > 1:
-                        avg_loss_dict = {}
-                        for i, value in enumerate(avg_loss_list):
-                            avg_loss_dict['loss_' + str(i)] = value
-                        for key, value in avg_loss_dict.items():
-                            log_tag = 'Train/' + key
-                            log_writer.add_scalar(log_tag, value, iter)
-
-                    log_writer.add_scalar('Train/lr', lr, iter)
-                    log_writer.add_scalar('Train/batch_cost',
-                                          avg_train_batch_cost, iter)
-                    log_writer.add_scalar('Train/reader_cost',
-                                          avg_train_reader_cost, iter)
-                avg_loss = 0.0
-                avg_loss_list = []
-                reader_cost_averager.reset()
-                batch_cost_averager.reset()
-
-            if (iter % save_interval == 0 or
-                    iter == iters) and (val_dataset is not None):
-                num_workers = 1 if num_workers > 0 else 0
-
-                if test_config is None:
-                    test_config = {}
-
-                mean_iou, acc, _, _, _ = evaluate(
-                    model,
-                    val_dataset,
-                    num_workers=num_workers,
-                    precision=precision,
-                    amp_level=amp_level,
-                    **test_config)
-
-                model.train()
-
-            if (iter % save_interval == 0 or iter == iters) and local_rank == 0:
-                current_save_dir = os.path.join(save_dir,
-                                                "iter_{}".format(iter))
-                if not os.path.isdir(current_save_dir):
-                    os.makedirs(current_save_dir)
-                paddle.save(model.state_dict(),
-                            os.path.join(current_save_dir, 'model.pdparams'))
-                paddle.save(optimizer.state_dict(),
-                            os.path.join(current_save_dir, 'model.pdopt'))
-                save_models.append(current_save_dir)
-                if len(save_models) > keep_checkpoint_max > 0:
-                    model_to_remove = save_models.popleft()
-                    shutil.rmtree(model_to_remove)
-
-                if val_dataset is not None:
-                    if mean_iou > best_mean_iou:
-                        best_mean_iou = mean_iou
-                        best_model_iter = iter
-                        best_model_dir = os.path.join(save_dir, "best_model")
-                        paddle.save(
-                            model.state_dict(),
-                            os.path.join(best_model_dir, 'model.pdparams'))
+                    avg_loss += float(loss)
+                    if not avg_loss_list:
+                        avg_loss_list = [float(l) for l in loss_list]
+                    else:
+                        for i in range(len(loss_list)):
+                            avg_loss_list[i] += float(loss_list[i])
+                    batch_cost_averager.record(
+                        time.time() - batch_start, num_samples=batch_size)
+
+                if (iter) % log_iters == 0 and local_rank == 0:
+                    if sync_free_logging:
+                        # Reading the losses waits for the device, so the time
+                        # since the window start covers all the queued iters.
+                        avg_loss_list = avg_loss_list.numpy().tolist()
+                        avg_loss = sum(avg_loss_list)
+                        batch_cost_averager.record(
+                            time.time() - window_start,
+                            num_samples=batch_size * (iter - window_iter),
+                            num_steps=iter - window_iter)
+                    avg_loss /= log_iters
+                    avg_loss_list = [l / log_iters for l in avg_loss_list]
+                    remain_iters = iters - iter
+                    avg_train_batch_cost = batch_cost_averager.get_average()
+                    avg_train_reader_cost = reader_cost_averager.get_average()
+                    eta = calculate_eta(remain_iters, avg_train_batch_cost)
                     logger.info(
-                        '[EVAL] The model with the best validation mIoU ({:.4f}) was saved at iter {}.'
-                        .format(best_mean_iou, best_model_iter))
-
+                        "[TRAIN] epoch: {}, iter: {}/{}, loss: {:.4f}, lr: {:.6f}, batch_cost: {:.4f}, reader_cost: {:.5f}, ips: {:.4f} samples/sec | ETA {}"
+                        .format((iter - 1) // iters_per_epoch + 1, iter, iters,
+                                avg_loss, lr, avg_train_batch_cost,
+                                avg_train_reader_cost,
+                                batch_cost_averager.get_ips_average(), eta))
                     if use_vdl:
-                        log_writer.add_scalar('Evaluate/mIoU', mean_iou, iter)
-                        log_writer.add_scalar('Evaluate/Acc', acc, iter)
-            batch_start = time.time()
+                        log_writer.add_scalar('Train/loss', avg_loss, iter)
+                        # Record all losses if there are more than 2 losses.
+                        if len(avg_loss_list) > 1:
+                            avg_loss_dict = {}
+                            for i, value in enumerate(avg_loss_list):
+                                avg_loss_dict['loss_' + str(i)] = value
+                            for key, value in avg_loss_dict.items():
+                                log_tag = 'Train/' + key
+                                log_writer.add_scalar(log_tag, value, iter)
+
+                        log_writer.add_scalar('Train/lr', lr, iter)
+                        log_writer.add_scalar('Train/batch_cost',
+                                              avg_train_batch_cost, iter)
+                        log_writer.add_scalar('Train/reader_cost',
+                                              avg_train_reader_cost, iter)
+                    avg_loss = 0.0
+                    avg_loss_list = []
+                    reader_cost_averager.reset()
+                    batch_cost_averager.reset()
+
+                if evaluator is not None and local_rank == 0:
+                    results = evaluator.poll()
+                    if iter % save_interval == 0 or iter == iters:
+                        # Wait for the last evaluation only at the end.
+                        submitted, _ = evaluator.submit(
+                            iter,
+                            model if ema is None else ema.state_dict(),
+                            block=iter == iters)
+                        results += submitted
+                    _report_async_eval(results, evaluator,
+                                       log_writer if use_vdl else None)
+
+                if (iter % save_interval == 0 or iter == iters) and (
+                        val_dataset is not None) and evaluator is None:
+                    num_workers = 1 if num_workers > 0 else 0
+
+                    if test_config is None:
+                        test_config = {}
+
+                    if ema is not None:
+                        ema.apply()
+                    mean_iou, acc, _, _, _ = evaluate(
+                        model,
+                        val_dataset,
+                        num_workers=num_workers,
+                        precision=precision,
+                        amp_level=amp_level,
+                        **test_config)
+                    if ema is not None:
+                        ema.restore()
+
+                    model.train()
+
+                if (iter % save_interval == 0
+                        or iter == iters) and local_rank == 0:
+                    # The checkpoints are written on a background thread.
+                    # The EMA weights are saved to resume the EMA too.
+                    ema_state = None
+                    if ema is not None:
+                        ema_state = snapshot_state_dict(ema.state_dict())
+                    model_state = ckpt_writer.save(
+                        "iter_{}".format(iter),
+                        model,
+                        optimizer,
+                        ema_state=ema_state)
+
+                    if val_dataset is not None and evaluator is None:
+                        if mean_iou > best_mean_iou:
+                            best_mean_iou = mean_iou
+                            best_model_iter = iter
+                            best_state = model_state
+                            if ema is not None:
+                                best_state = ema_state
+                            ckpt_writer.save(
+                                "best_model", best_state, rotate=False)
+                        logger.info(
+                            '[EVAL] The model with the best validation mIoU ({:.4f}) was saved at iter {}.'
+                            .format(best_mean_iou, best_model_iter))
+
+                        if use_vdl:
+                            log_writer.add_scalar('Evaluate/mIoU', mean_iou,
+                                                  iter)
+                            log_writer.add_scalar('Evaluate/Acc', acc, iter)
+                batch_start = time.time()
+                if iter % log_iters == 0:
+                    window_start = batch_start
+                    window_iter = iter
+    except BaseException:
+        # Close the writer and the evaluator on errors too, so that the
+        # queued checkpoints are written completely. Their own failures are
+        # logged only, to raise the error of the training.
+        if local_rank == 0:
+            try:
+                ckpt_writer.close()
+            except Exception as e:
+                logger.error(
+                    'Failed to close the checkpoint writer: {}'.format(e))
+            if evaluator is not None:
+                try:
+                    _report_async_eval(evaluator.close(), evaluator,
+                                       log_writer if use_vdl else None)
+                except Exception as e:
+                    logger.error('Failed to close the evaluator: {}'.format(e))
+        raise
+
+    if local_rank == 0:
+        ckpt_writer.close()
+        if evaluator is not None:
+            _report_async_eval(evaluator.close(), evaluator,
+                               log_writer if use_vdl else None)
 
     # Calculate flops.
     if local_rank == 0 and not (precision == 'fp16' and amp_level == 'O2'):
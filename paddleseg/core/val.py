@@ -18,6 +18,7 @@ import numpy as np
 import time
 import paddle
 import paddle.nn.functional as F
+from PIL import Image
 
 from paddleseg.utils import metrics, TimeAverager, calculate_eta, logger, progbar
 from paddleseg.core import infer
@@ -25,8 +26,36 @@ from paddleseg.core import infer
 np.set_printoptions(suppress=True)
 
 
+def _shape_batches(eval_dataset, indices, batch_size):
+    """
+    Split the samples into batches of the images with the same size, so that
+    the images and the labels of a batch can be stacked and inferred by one
+    forward. The sizes are read from the image headers, and a sample whose
+    size can not be read makes a batch of its own.
+    """
+    if batch_size == 1:
+        return [[i] for i in indices]
+    file_list = getattr(eval_dataset, 'file_list', None)
+    buckets = {}
+    for i in indices:
+        key = ('sample', i)
+        if file_list is not None:
+            try:
+                with Image.open(file_list[i][0]) as im:
+                    key = im.size
+            except (OSError, AttributeError):
+                pass
+        buckets.setdefault(key, []).append(i)
+    batches = []
+    for bucket in buckets.values():
+        for j in range(0, len(bucket), batch_size):
+            batches.append(bucket[j:j + batch_size])
+    return batches
+
+
 def evaluate(model,
              eval_dataset,
+             batch_size=1,
              aug_eval=False,
              scales=1.0,
              flip_horizontal=False,
@@ -34,17 +63,23 @@ def evaluate(model,
              is_slide=False,
              stride=None,
              crop_size=None,
+             slide_batch_size=1,
+             slide_blend='uniform',
              precision='fp32',
              amp_level='O1',
              num_workers=0,
              print_detail=True,
-             auc_roc=False):
+             auc_roc=False,
+             auc_roc_bins=1000):
     """
     Launch evalution.
 
     Args:
         model（nn.Layer): A sementic segmentation model.
         eval_dataset (paddle.io.Dataset): Used to read and process validation datasets.
+        batch_size (int, optional): The maximum number of images inferred together. Only the images
+            with the same size are batched, so the results are the same as the ones of batch_size=1,
+            except for the models deciding on the whole batch, e.g. MscaleOCR with adaptive_eval. Default: 1.
         aug_eval (bool, optional): Whether to use mulit-scales and flip augment for evaluation. Default: False.
         scales (list|float, optional): Scales for augment. It is valid when `aug_eval` is True. Default: 1.0.
         flip_horizontal (bool, optional): Whether to use flip horizontally augment. It is valid when `aug_eval` is True. Default: True.
@@ -54,16 +89,23 @@ def evaluate(model,
             It should be provided when `is_slide` is True.
         crop_size (tuple|list, optional):  The crop size of sliding window, the first is width and the second is height.
             It should be provided when `is_slide` is True.
+        slide_batch_size (int, optional): The number of windows inferred together when `is_slide` is True. Default: 1.
+        slide_blend (str, optional): The blending mode of windows when `is_slide` is True, one of
+            ('uniform', 'gaussian', 'linear'). Default: 'uniform'.
         precision (str, optional): Use AMP if precision='fp16'. If precision='fp32', the evaluation is normal.
         amp_level (str, optional): Auto mixed precision level. Accepted values are “O1” and “O2”: O1 represent mixed precision, the input data type of each operator will be casted by white_list and black_list; O2 represent Pure fp16, all operators parameters and input data will be casted to fp16, except operators in black_list, don’t support fp16 kernel and batchnorm. Default is O1(amp)
         num_workers (int, optional): Num workers for data loader. Default: 0.
         print_detail (bool, optional): Whether to print detailed information about the evaluation process. Default: True.
         auc_roc(bool, optional): whether add auc_roc metric
+        auc_roc_bins (int, optional): The number of score bins to compute auc_roc in a streaming way. Default: 1000.
 
     Returns:
         float: The mIoU of validation datasets.
         float: The accuracy of validation datasets.
     """
+    if batch_size < 1:
+        raise ValueError('`batch_size` should be greater than 0, but got {}.'.
+                         format(batch_size))
     model.eval()
     nranks = paddle.distributed.ParallelEnv().nranks
     local_rank = paddle.distributed.ParallelEnv().local_rank
@@ -72,20 +114,24 @@ def evaluate(model,
         if not paddle.distributed.parallel.parallel_helper._is_parallel_ctx_initialized(
         ):
             paddle.distributed.init_parallel_env()
-    batch_sampler = paddle.io.DistributedBatchSampler(
-        eval_dataset, batch_size=1, shuffle=False, drop_last=False)
+    # Every rank evaluates its own samples, without the duplicated samples
+    # that DistributedBatchSampler pads, and the metrics are reduced once
+    # after the loop.
+    sample_indices = list(range(local_rank, len(eval_dataset), nranks))
+    batches = _shape_batches(eval_dataset, sample_indices, batch_size)
     loader = paddle.io.DataLoader(
         eval_dataset,
-        batch_sampler=batch_sampler,
+        batch_sampler=batches,
         num_workers=num_workers,
         return_list=True, )
 
     total_iters = len(loader)
-    intersect_area_all = paddle.zeros([1], dtype='int64')
-    pred_area_all = paddle.zeros([1], dtype='int64')
-    label_area_all = paddle.zeros([1], dtype='int64')
-    logits_all = None
-    label_all = None
+    conf_mat_all = paddle.zeros(
+        [eval_dataset.num_classes, eval_dataset.num_classes], dtype='int64')
+    num_samples = 0
+    auc_hist = paddle.zeros(
+        [2, eval_dataset.num_classes, auc_roc_bins], dtype='int64')
+    model_scales_count = {}
 
     if print_detail:
         logger.info("Start evaluating (total_samples: {}, total_iters: {})...".
@@ -122,7 +168,9 @@ def evaluate(model,
                             flip_vertical=flip_vertical,
                             is_slide=is_slide,
                             stride=stride,
-                            crop_size=crop_size)
+                            crop_size=crop_size,
+                            slide_batch_size=slide_batch_size,
+                            slide_blend=slide_blend)
                 else:
                     pred, logits = infer.aug_inference(
                         model,
@@ -134,7 +182,9 @@ def evaluate(model,
                         flip_vertical=flip_vertical,
                         is_slide=is_slide,
                         stride=stride,
-                        crop_size=crop_size)
+                        crop_size=crop_size,
+                        slide_batch_size=slide_batch_size,
+                        slide_blend=slide_blend)
             else:
                 if precision == 'fp16':
                     with paddle.amp.auto_cast(
@@ -152,7 +202,9 @@ def evaluate(model,
                             transforms=eval_dataset.transforms.transforms,
                             is_slide=is_slide,
                             stride=stride,
-                            crop_size=crop_size)
+                            crop_size=crop_size,
+                            slide_batch_size=slide_batch_size,
+                            slide_blend=slide_blend)
                 else:
                     pred, logits = infer.inference(
                         model,
@@ -161,50 +213,37 @@ def evaluate(model,
                         transforms=eval_dataset.transforms.transforms,
                         is_slide=is_slide,
                         stride=stride,
-                        crop_size=crop_size)
+                        crop_size=crop_size,
+                        slide_batch_size=slide_batch_size,
+                        slide_blend=slide_blend)
+
+            # The scales run inside the model, e.g. MscaleOCR.
+            model_scales = getattr(model, 'last_scales', None)
+            if model_scales is not None:
+                key = str(model_scales)
+                model_scales_count[key] = model_scales_count.get(
+                    key, 0) + len(label)
+                logger.debug("[EVAL] Images {} ran the model scales {}".format(
+                    batches[iter], model_scales))
 
-            intersect_area, pred_area, label_area = metrics.calculate_area(
+            conf_mat = metrics.confusion_matrix(
                 pred,
                 label,
                 eval_dataset.num_classes,
                 ignore_index=eval_dataset.ignore_index)
 
-            # Gather from all ranks
-            if nranks > 1:
-                intersect_area_list = []
-                pred_area_list = []
-                label_area_list = []
-                paddle.distributed.all_gather(intersect_area_list,
-                                              intersect_area)
-                paddle.distributed.all_gather(pred_area_list, pred_area)
-                paddle.distributed.all_gather(label_area_list, label_area)
-
-                # Some image has been evaluated and should be eliminated in last iter
-                if (iter + 1) * nranks > len(eval_dataset):
-                    valid = len(eval_dataset) - iter * nranks
-                    intersect_area_list = intersect_area_list[:valid]
-                    pred_area_list = pred_area_list[:valid]
-                    label_area_list = label_area_list[:valid]
-
-                for i in range(len(intersect_area_list)):
-                    intersect_area_all = intersect_area_all + intersect_area_list[
-                        i]
-                    pred_area_all = pred_area_all + pred_area_list[i]
-                    label_area_all = label_area_all + label_area_list[i]
-            else:
-                intersect_area_all = intersect_area_all + intersect_area
-                pred_area_all = pred_area_all + pred_area
-                label_area_all = label_area_all + label_area
-
-                if auc_roc:
-                    logits = F.softmax(logits, axis=1)
-                    if logits_all is None:
-                        logits_all = logits.numpy()
-                        label_all = label.numpy()
-                    else:
-                        logits_all = np.concatenate(
-                            [logits_all, logits.numpy()])  # (KN, C, H, W)
-                        label_all = np.concatenate([label_all, label.numpy()])
+            conf_mat_all = conf_mat_all + conf_mat
+            num_samples += len(label)
+
+            if auc_roc:
+                hist = metrics.auc_roc_histogram(
+                    F.softmax(
+                        logits, axis=1),
+                    label,
+                    eval_dataset.num_classes,
+                    num_bins=auc_roc_bins,
+                    ignore_index=eval_dataset.ignore_index)
+                auc_hist = auc_hist + hist
 
             batch_cost_averager.record(
                 time.time() - batch_start, num_samples=len(label))
@@ -218,7 +257,29 @@ def evaluate(model,
             batch_cost_averager.reset()
             batch_start = time.time()
 
-    metrics_input = (intersect_area_all, pred_area_all, label_area_all)
+    # Reduce the metrics and the number of samples of all ranks at once.
+    if nranks > 1:
+        num_classes = eval_dataset.num_classes
+        stats = [
+            conf_mat_all.flatten(), paddle.to_tensor(
+                [num_samples], dtype='int64')
+        ]
+        if auc_roc:
+            stats.append(auc_hist.flatten())
+        stats = paddle.concat(stats)
+        paddle.distributed.all_reduce(stats)
+        conf_mat_all = stats[:num_classes * num_classes].reshape(
+            [num_classes, num_classes])
+        num_samples = int(stats[num_classes * num_classes])
+        if auc_roc:
+            auc_hist = stats[num_classes * num_classes + 1:].reshape(
+                auc_hist.shape)
+    if num_samples != len(eval_dataset):
+        raise RuntimeError(
+            'The number of evaluated samples should be {}, but got {}.'.format(
+                len(eval_dataset), num_samples))
+
+    metrics_input = metrics.confusion_matrix_to_area(conf_mat_all)
     class_iou, miou = metrics.mean_iou(*metrics_input)
     acc, class_precision, class_recall = metrics.class_measurement(
         *metrics_input)
@@ -226,8 +287,7 @@ def evaluate(model,
     class_dice, mdice = metrics.dice(*metrics_input)
 
     if auc_roc:
-        auc_roc = metrics.auc_roc(
-            logits_all, label_all, num_classes=eval_dataset.num_classes)
+        auc_roc = metrics.auc_roc_from_histogram(auc_hist)
         auc_infor = ' Auc_roc: {:.4f}'.format(auc_roc)
 
     if print_detail:
@@ -239,4 +299,8 @@ def evaluate(model,
         logger.info("[EVAL] Class Precision: \n" + str(
             np.round(class_precision, 4)))
         logger.info("[EVAL] Class Recall: \n" + str(np.round(class_recall, 4)))
+        if model_scales_count:
+            logger.info("[EVAL] Model scales run: " + ", ".join(
+                "{}: {} images".format(k, v)
+                for k, v in model_scales_count.items()))
     return miou, acc, class_iou, class_precision, kappa
@@ -377,7 +377,7 @@ class Config(object):
         ]
 
         for com in com_list:
-            if com_name in com.components_dict:
+            if com_name in com:
                 return com[com_name]
         else:
             raise RuntimeError(
@@ -404,6 +404,17 @@ class Config(object):
 
         return component(**params)
 
+    @property
+    def batch_transforms(self) -> Any:
+        """Get the batched on-device augmentations of training, None if not set."""
+        _transforms = self.dic.get('batch_transforms', [])
+        if not _transforms:
+            return None
+        return self._load_object({
+            'type': 'BatchCompose',
+            'transforms': _transforms
+        })
+
     @property
     def test_config(self) -> Dict:
         return self.dic.get('test_config', {})
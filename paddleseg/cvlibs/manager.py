@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import importlib
+import importlib.util
 import inspect
 from collections.abc import Sequence
 
@@ -61,20 +63,41 @@ class ComponentManager:
 
         print(model_manager.components_dict)
         # {'AlexNet': <class '__main__.AlexNet'>, 'ResNet': <class '__main__.ResNet'>}
+
+    Examples 3:
+
+        # Declare the components of a module by name, and the module is imported on the first lookup.
+        from paddleseg.cvlibs.manager import ComponentManager
+
+        model_manager = ComponentManager()
+        model_manager.add_lazy_component(['ResNet18_vd', 'ResNet50_vd'], 'paddleseg.models.backbones.resnet_vd')
+
+        print('ResNet50_vd' in model_manager)
+        # True, and the module is not imported yet.
+        print(model_manager['ResNet50_vd'])
+        # <function ResNet50_vd at ...>, which is registered when the module is imported.
     """
 
     def __init__(self, name=None):
         self._components_dict = dict()
+        self._lazy_components = dict()
         self._name = name
 
     def __len__(self):
-        return len(self._components_dict)
+        return len(self._components_dict) + len(self._lazy_components)
 
     def __repr__(self):
         name_str = self._name if self._name else self.__class__.__name__
-        return "{}:{}".format(name_str, list(self._components_dict.keys()))
+        return "{}:{}".format(name_str,
+                              list(self._components_dict.keys()) +
+                              list(self._lazy_components.keys()))
+
+    def __contains__(self, item):
+        return item in self._components_dict or item in self._lazy_components
 
     def __getitem__(self, item):
+        if item not in self._components_dict and item in self._lazy_components:
+            self._import_lazy_component(item)
         if item not in self._components_dict.keys():
             raise KeyError("{} does not exist in availabel {}".format(item,
                                                                       self))
@@ -82,6 +105,11 @@ class ComponentManager:
 
     @property
     def components_dict(self):
+        # The dict is complete only when all the lazy components are imported.
+        # Use `in` to check a component without importing it.
+        for name in list(self._lazy_components):
+            if name in self._lazy_components:
+                self._import_lazy_component(name)
         return self._components_dict
 
     @property
@@ -117,6 +145,29 @@ class ComponentManager:
         else:
             # Take the internal name of the component as its key
             self._components_dict[component_name] = component
+        self._lazy_components.pop(component_name, None)
+
+    def _import_lazy_component(self, name):
+        module = self._lazy_components[name]
+        importlib.import_module(module)
+        if name not in self._components_dict:
+            raise KeyError("{} is not added to {} by the module {}".format(
+                name, self, module))
+
+    def add_lazy_component(self, names, module):
+        """
+        Declare component(s) which are added by a module, without importing it. The module is
+        imported when one of them is looked up, and adds them by `add_component` as usual.
+
+        Args:
+            names (str|list|tuple): The name(s) of the component(s).
+            module (str): The absolute name of the module, e.g. 'paddleseg.models.psa'.
+        """
+        if isinstance(names, str):
+            names = [names]
+        for name in names:
+            if name not in self._components_dict:
+                self._lazy_components[name] = module
 
     def add_component(self, components):
         """
@@ -145,3 +196,41 @@ BACKBONES = ComponentManager("backbones")
 DATASETS = ComponentManager("datasets")
 TRANSFORMS = ComponentManager("transforms")
 LOSSES = ComponentManager("losses")
+
+
+def lazy_getattr(package, lazy_components):
+    """
+    Make the module `__getattr__` of a package whose modules are declared by `add_lazy_component`,
+    so that the names are imported on the first access, e.g. `paddleseg.models.MscaleOCR`.
+
+    Args:
+        package (str): The name of the package.
+        lazy_components (dict): The components of the modules, {module name relative to the package: names}.
+            The other public names of these modules are found too, by importing them in order.
+
+    Returns:
+        function: The `__getattr__` of the package.
+    """
+    modules = {
+        name: module
+        for module, names in lazy_components.items() for name in names
+    }
+
+    def __getattr__(name):
+        if name.startswith('__'):
+            raise AttributeError("module {!r} has no attribute {!r}".format(
+                package, name))
+        if name in modules:
+            return getattr(
+                importlib.import_module(package + '.' + modules[name]), name)
+        # A submodule, e.g. `from paddleseg.models import layers`.
+        if importlib.util.find_spec(package + '.' + name) is not None:
+            return importlib.import_module(package + '.' + name)
+        for module in lazy_components:
+            module = importlib.import_module(package + '.' + module)
+            if hasattr(module, name):
+                return getattr(module, name)
+        raise AttributeError("module {!r} has no attribute {!r}".format(
+            package, name))
+
+    return __getattr__
@@ -0,0 +1,225 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from paddleseg.utils import logger
+
+INDEX_FILE = 'index.json'
+CACHE_VERSION = 1
+
+
+def _file_stat(path):
+    """The size and the modification time identifying the content of a file."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _is_valid(entry, image_path, label_path):
+    """Whether a cached sample is still the decoding of the source files."""
+    if label_path is not None and entry.get('label') is None:
+        return False
+    try:
+        if _file_stat(image_path) != entry['image']['stat']:
+            return False
+        if label_path is not None and _file_stat(label_path) != entry[
+                'label']['stat']:
+            return False
+    except OSError:
+        return False
+    return True
+
+
+def _load_index(cache_dir):
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    if index.get('version') != CACHE_VERSION:
+        return None
+    return index
+
+
+class DatasetCache(object):
+    """
+    Serve the decoded images and labels from the memory-mapped shards written
+    by `build_dataset_cache`.
+
+    The arrays are copy-on-write views of the shards, so reading a sample
+    neither decodes nor copies it. A sample whose source files changed since
+    the cache was built, by size or modification time, is not served and the
+    dataset decodes it from the source files.
+
+    Args:
+        cache_dir (str): The directory of the cache.
+        file_list (list): The [image_path, label_path] of the dataset samples.
+    """
+
+    def __init__(self, cache_dir, file_list):
+        self.cache_dir = cache_dir
+        self.samples = dict()
+        self._shards = dict()
+
+        index = _load_index(cache_dir)
+        if index is None:
+            logger.warning(
+                'No valid dataset cache is found in {}, please build it by '
+                'tools/build_dataset_cache.py.'.format(cache_dir))
+            return
+        self.shard_files = index['shards']
+
+        num_stale = 0
+        for image_path, label_path in file_list:
+            entry = index['samples'].get(os.path.abspath(image_path))
+            if entry is None:
+                num_stale += 1
+            elif not _is_valid(entry, image_path, label_path):
+                num_stale += 1
+            else:
+                self.samples[image_path] = entry
+        if num_stale > 0:
+            logger.warning(
+                '{} of {} samples are missing or changed in the dataset cache '
+                '{}, they are decoded from the source files. Rebuild the cache '
+                'to speed up them.'.format(num_stale, len(file_list), cache_dir))
+
+    def _read(self, item):
+        # The shards are mapped lazily, so that every DataLoader worker maps
+        # them in its own process.
+        shard = item['shard']
+        if shard not in self._shards:
+            self._shards[shard] = np.memmap(
+                os.path.join(self.cache_dir, self.shard_files[shard]),
+                dtype='uint8',
+                mode='c')
+        nbytes = int(np.prod(item['shape'])) * np.dtype(item['dtype']).itemsize
+        data = self._shards[shard][item['offset']:item['offset'] + nbytes]
+        return np.asarray(data).view(item['dtype']).reshape(item['shape'])
+
+    def get(self, image_path, label_path=None):
+        """
+        Get a cached sample.
+
+        Args:
+            image_path (str): The image path of the sample.
+            label_path (str, optional): The label path of the sample. Default: None.
+
+        Returns:
+            (tuple). The image in BGR order as `cv2.imread` and the label as
+                `np.asarray(Image.open(label_path))`, or None if the sample is not cached.
+        """
+        entry = self.samples.get(image_path)
+        if entry is None:
+            return None
+        im = self._read(entry['image'])
+        label = self._read(entry['label']) if label_path is not None else None
+        return im, label
+
+
+class _ShardWriter(object):
+    def __init__(self, cache_dir, shards, shard_size):
+        self.cache_dir = cache_dir
+        self.shards = shards
+        self.shard_size = shard_size
+        self.file = None
+        self.offset = 0
+
+    def _open(self):
+        name = 'shard_{:05d}.bin'.format(len(self.shards))
+        self.shards.append(name)
+        self.file = open(os.path.join(self.cache_dir, name), 'wb')
+        self.offset = 0
+
+    def write(self, path, array):
+        array = np.ascontiguousarray(array)
+        if self.file is None or (self.offset > 0 and
+                                 self.offset + array.nbytes > self.shard_size):
+            self.close()
+            self._open()
+        self.file.write(array.tobytes())
+        item = {
+            'stat': _file_stat(path),
+            'shard': len(self.shards) - 1,
+            'offset': self.offset,
+            'shape': list(array.shape),
+            'dtype': array.dtype.str
+        }
+        self.offset += array.nbytes
+        return item
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def build_dataset_cache(file_list, cache_dir, shard_size=2**31, rebuild=False):
+    """
+    Decode the images and labels of a dataset into memory-mapped shards.
+
+    The samples already in the cache are kept if their source files are not
+    changed, so the cache of several datasets, e.g. the train and val set, can
+    be built into the same directory.
+
+    Args:
+        file_list (list): The [image_path, label_path] of the dataset samples, label_path can be None.
+        cache_dir (str): The directory to write the cache.
+        shard_size (int, optional): The max bytes of a shard file. Default: 2**31.
+        rebuild (bool, optional): Whether to drop the existing cache. Default: False.
+
+    Returns:
+        int: The number of the decoded samples.
+    """
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    index = None if rebuild else _load_index(cache_dir)
+    if index is None:
+        for name in os.listdir(cache_dir):
+            if name.startswith('shard_') and name.endswith('.bin'):
+                os.remove(os.path.join(cache_dir, name))
+        index = {'version': CACHE_VERSION, 'shards': [], 'samples': {}}
+
+    writer = _ShardWriter(cache_dir, index['shards'], shard_size)
+    num_decoded = 0
+    try:
+        for image_path, label_path in file_list:
+            key = os.path.abspath(image_path)
+            entry = index['samples'].get(key)
+            if entry is not None and _is_valid(entry, image_path, label_path):
+                continue
+            im = cv2.imread(image_path)
+            if im is None:
+                raise ValueError('Can\'t read The image file {}!'.format(
+                    image_path))
+            entry = {'image': writer.write(image_path, im), 'label': None}
+            if label_path is not None:
+                label = np.asarray(Image.open(label_path))
+                entry['label'] = writer.write(label_path, label)
+            index['samples'][key] = entry
+            num_decoded += 1
+    finally:
+        writer.close()
+        # The index is written last, so an interrupted build never exposes
+        # incomplete shards.
+        tmp_path = os.path.join(cache_dir, INDEX_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(cache_dir, INDEX_FILE))
+    return num_decoded
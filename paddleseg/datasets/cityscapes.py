@@ -17,6 +17,7 @@ import glob
 
 from paddleseg.datasets import Dataset
 from paddleseg.cvlibs import manager
+from paddleseg.datasets.cache import DatasetCache
 from paddleseg.transforms import Compose
 
 
@@ -45,18 +46,33 @@ class Cityscapes(Dataset):
         dataset_root (str): Cityscapes dataset directory.
         mode (str, optional): Which part of dataset to use. it is one of ('train', 'val', 'test'). Default: 'train'.
         edge (bool, optional): Whether to compute edge while training. Default: False
+        cache_dir (str, optional): The directory of the decoded dataset cache built by tools/build_dataset_cache.py.
+            The samples are read from the cache instead of decoding the image files if it is set. Default: None.
+        keep_uint8 (bool, optional): Whether to run the transforms on uint8 images and fuse the final
+            Normalize with the transposing, see `paddleseg.transforms.Compose`. Default: False.
+        edge_dir (str, optional): The directory of the edge masks built by tools/build_edge_masks.py. The edge
+            masks are loaded and transformed with the labels instead of computed after the transforms if it is
+            set and `edge` is True. Default: None.
     """
     NUM_CLASSES = 19
 
-    def __init__(self, transforms, dataset_root, mode='train', edge=False):
+    def __init__(self,
+                 transforms,
+                 dataset_root,
+                 mode='train',
+                 edge=False,
+                 cache_dir=None,
+                 keep_uint8=False,
+                 edge_dir=None):
         self.dataset_root = dataset_root
-        self.transforms = Compose(transforms)
+        self.transforms = Compose(transforms, keep_uint8=keep_uint8)
         self.file_list = list()
         mode = mode.lower()
         self.mode = mode
         self.num_classes = self.NUM_CLASSES
         self.ignore_index = 255
         self.edge = edge
+        self.edge_dir = edge_dir
 
         if mode not in ['train', 'val', 'test']:
             raise ValueError(
@@ -86,3 +102,6 @@ class Cityscapes(Dataset):
             [img_path, label_path]
             for img_path, label_path in zip(img_files, label_files)
         ]
+
+        if cache_dir is not None:
+            self.cache = DatasetCache(cache_dir, self.file_list)
@@ -19,6 +19,7 @@ import numpy as np
 from PIL import Image
 
 from paddleseg.cvlibs import manager
+from paddleseg.datasets.cache import DatasetCache
 from paddleseg.transforms import Compose
 import paddleseg.transforms.functional as F
 
@@ -43,6 +44,13 @@ class Dataset(paddle.io.Dataset):
             The annotation file is not necessary in test_path file.
         separator (str, optional): The separator of dataset list. Default: ' '.
         edge (bool, optional): Whether to compute edge while training. Default: False
+        cache_dir (str, optional): The directory of the decoded dataset cache built by tools/build_dataset_cache.py.
+            The samples are read from the cache instead of decoding the image files if it is set. Default: None.
+        keep_uint8 (bool, optional): Whether to run the transforms on uint8 images and fuse the final
+            Normalize with the transposing, see `paddleseg.transforms.Compose`. Default: False.
+        edge_dir (str, optional): The directory of the edge masks built by tools/build_edge_masks.py. The edge
+            masks are loaded and transformed with the labels instead of computed after the transforms if it is
+            set and `edge` is True. Default: None.
 
         Examples:
 
@@ -61,6 +69,12 @@ class Dataset(paddle.io.Dataset):
 
     """
 
+    # The decoded dataset cache, which is None if not used. These are class
+    # attributes, so that the subclasses not calling `__init__` have them.
+    cache = None
+    # The directory of the precomputed edge masks, which is None if not used.
+    edge_dir = None
+
     def __init__(self,
                  transforms,
                  dataset_root,
@@ -71,14 +85,18 @@ class Dataset(paddle.io.Dataset):
                  test_path=None,
                  separator=' ',
                  ignore_index=255,
-                 edge=False):
+                 edge=False,
+                 cache_dir=None,
+                 keep_uint8=False,
+                 edge_dir=None):
         self.dataset_root = dataset_root
-        self.transforms = Compose(transforms)
+        self.transforms = Compose(transforms, keep_uint8=keep_uint8)
         self.file_list = list()
         self.mode = mode.lower()
         self.num_classes = num_classes
         self.ignore_index = ignore_index
         self.edge = edge
+        self.edge_dir = edge_dir
 
         if self.mode not in ['train', 'val', 'test']:
             raise ValueError(
@@ -138,19 +156,46 @@ class Dataset(paddle.io.Dataset):
                     label_path = os.path.join(self.dataset_root, items[1])
                 self.file_list.append([image_path, label_path])
 
+        if cache_dir is not None:
+            self.cache = DatasetCache(cache_dir, self.file_list)
+
+    def read_sample(self, image_path, label_path=None):
+        """
+        Get the decoded image and label from the dataset cache, or their paths
+        to be decoded by the transforms if the sample is not cached.
+
+        The cached image is memory-mapped, but it is copied by the conversion
+        to float32 unless `keep_uint8` is set, so the read is zero-copy only
+        with `keep_uint8`.
+        """
+        if self.cache is not None:
+            sample = self.cache.get(image_path, label_path)
+            if sample is not None:
+                im, label = sample
+                if not self.transforms.keep_uint8:
+                    im = im.astype('float32')
+                return im, label
+        return image_path, label_path
+
     def __getitem__(self, idx):
         image_path, label_path = self.file_list[idx]
         if self.mode == 'test':
-            im, _ = self.transforms(im=image_path)
+            im, _ = self.read_sample(image_path)
+            im, _ = self.transforms(im=im)
             im = im[np.newaxis, ...]
             return im, image_path
         elif self.mode == 'val':
-            im, _ = self.transforms(im=image_path)
-            label = np.asarray(Image.open(label_path))
+            im, label = self.read_sample(image_path, label_path)
+            im, _ = self.transforms(im=im)
+            if isinstance(label, str):
+                label = np.asarray(Image.open(label))
             label = label[np.newaxis, :, :]
             return im, label
         else:
-            im, label = self.transforms(im=image_path, label=label_path)
+            im, label = self.read_sample(image_path, label_path)
+            if self.edge and self.edge_dir is not None:
+                return self.transform_with_edge(im, label, label_path)
+            im, label = self.transforms(im=im, label=label)
             if self.edge:
                 edge_mask = F.mask_to_binary_edge(
                     label, radius=2, num_classes=self.num_classes)
@@ -158,5 +203,29 @@ class Dataset(paddle.io.Dataset):
             else:
                 return im, label
 
+    def edge_path(self, label_path):
+        """The path of the precomputed edge mask of a label."""
+        return os.path.join(self.edge_dir,
+                            os.path.relpath(label_path, self.dataset_root))
+
+    def transform_with_edge(self, im, label, label_path):
+        """
+        Transform the image together with the label and its precomputed edge
+        mask, which are packed into one uint16 label by the transforms.
+        """
+        if isinstance(label, str):
+            label = np.asarray(Image.open(label))
+        edge_mask = np.asarray(Image.open(self.edge_path(label_path)))
+        label = label.astype(np.uint16) | (edge_mask.astype(np.uint16) << 8)
+        im, label = self.transforms(im=im, label=label)
+        if label.dtype != np.uint16:
+            raise ValueError(
+                'The transforms should keep the dtype of label to transform '
+                'the precomputed edge masks, but it is changed to {}.'.format(
+                    label.dtype))
+        edge_mask = (label >> 8).astype(np.uint8)[np.newaxis, :, :]
+        label = (label & 0xff).astype(np.uint8)
+        return im, label, edge_mask
+
     def __len__(self):
         return len(self.file_list)
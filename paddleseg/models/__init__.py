@@ -12,51 +12,79 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .backbones import *
-from .losses import *
+from paddleseg.cvlibs import manager
 
-from .ann import *
-from .bisenet import *
-from .danet import *
-from .deeplab import *
-from .fast_scnn import *
-from .fcn import *
-from .gcnet import *
-from .ocrnet import *
-from .pspnet import *
-from .gscnn import GSCNN
-from .unet import UNet
-from .hardnet import HarDNet
-from .u2net import U2Net, U2Netp
-from .attention_unet import AttentionUNet
-from .unet_plusplus import UNetPlusPlus
-from .unet_3plus import UNet3Plus
-from .decoupled_segnet import DecoupledSegNet
-from .emanet import *
-from .isanet import *
-from .dnlnet import *
-from .setr import *
-from .sfnet import *
-from .pphumanseg_lite import *
-from .mla_transformer import MLATransformer
-from .portraitnet import PortraitNet
-from .stdcseg import STDCSeg
-from .segformer import SegFormer
-from .pointrend import PointRend
-from .ginet import GINet
-from .segmenter import *
-from .segnet import SegNet
-from .encnet import ENCNet
-from .hrnet_contrast import HRNetW48Contrast
-from .espnet import ESPNetV2
-from .pp_liteseg import PPLiteSeg
-from .dmnet import DMNet
-from .espnetv1 import ESPNetV1
-from .enet import ENet
-from .bisenetv1 import BiseNetV1
-from .fastfcn import FastFCN
-from .pfpnnet import PFPNNet
-from .glore import GloRe
-from .ddrnet import DDRNet_23
-from .ccnet import CCNet
-from .psa import MscaleOCR
+from . import backbones, losses
+
+# The modules are imported on the first lookup of their components, which
+# keeps `import paddleseg` fast.
+_LAZY_COMPONENTS = {
+    'ann': ['ANN'],
+    'bisenet': ['BiSeNetV2'],
+    'danet': ['DANet'],
+    'deeplab': ['DeepLabV3P', 'DeepLabV3'],
+    'fast_scnn': ['FastSCNN'],
+    'fcn': ['FCN'],
+    'gcnet': ['GCNet'],
+    'ocrnet': ['OCRNet'],
+    'pspnet': ['PSPNet'],
+    'gscnn': ['GSCNN'],
+    'unet': ['UNet'],
+    'hardnet': ['HarDNet'],
+    'u2net': ['U2Net', 'U2Netp'],
+    'attention_unet': ['AttentionUNet'],
+    'unet_plusplus': ['UNetPlusPlus'],
+    'unet_3plus': ['UNet3Plus'],
+    'decoupled_segnet': ['DecoupledSegNet'],
+    'emanet': ['EMANet'],
+    'isanet': ['ISANet'],
+    'dnlnet': ['DNLNet'],
+    'setr': ['SegmentationTransformer'],
+    'sfnet': ['SFNet'],
+    'pphumanseg_lite': ['PPHumanSegLite'],
+    'mla_transformer': ['MLATransformer'],
+    'portraitnet': ['PortraitNet'],
+    'stdcseg': ['STDCSeg'],
+    'segformer': [
+        'SegFormer',
+        'SegFormer_B0',
+        'SegFormer_B1',
+        'SegFormer_B2',
+        'SegFormer_B3',
+        'SegFormer_B4',
+        'SegFormer_B5'
+    ],
+    'pointrend': ['PointRend'],
+    'ginet': ['GINet'],
+    'segmenter': ['LinearSegmenter', 'MaskSegmenter'],
+    'segnet': ['SegNet'],
+    'encnet': ['ENCNet'],
+    'hrnet_contrast': ['HRNetW48Contrast'],
+    'espnet': ['ESPNetV2'],
+    'pp_liteseg': ['PPLiteSeg'],
+    'dmnet': ['DMNet'],
+    'espnetv1': ['ESPNetV1'],
+    'enet': ['ENet'],
+    'bisenetv1': ['BiseNetV1'],
+    'fastfcn': ['FastFCN'],
+    'pfpnnet': ['PFPNNet'],
+    'glore': ['GloRe'],
+    'ddrnet': ['DDRNet_23'],
+    'ccnet': ['CCNet'],
+    'psa': ['MscaleOCR']
+}
+
+for _module, _names in _LAZY_COMPONENTS.items():
+    manager.MODELS.add_lazy_component(_names, __name__ + '.' + _module)
+
+# The backbones and the losses are exported and searched too, as they were
+# imported to this package. `from ... import *` imports all the modules to
+# export the components.
+__all__ = [name for names in _LAZY_COMPONENTS.values() for name in names
+           ] + backbones.__all__ + losses.__all__
+__getattr__ = manager.lazy_getattr(
+    __name__, dict(_LAZY_COMPONENTS, backbones=[], losses=[]))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -12,13 +12,71 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .hrnet import *
-from .resnet_vd import *
-from .xception_deeplab import *
-from .mobilenetv3 import *
-from .vision_transformer import *
-from .swin_transformer import *
-from .mobilenetv2 import *
-from .mix_transformer import *
-from .stdcnet import *
-from .hrnetv2psa import *
+from paddleseg.cvlibs import manager
+
+# The modules are imported on the first lookup of their components, which
+# keeps `import paddleseg` fast.
+_LAZY_COMPONENTS = {
+    'hrnet': [
+        'HRNet_W18_Small_V1',
+        'HRNet_W18_Small_V2',
+        'HRNet_W18',
+        'HRNet_W30',
+        'HRNet_W32',
+        'HRNet_W40',
+        'HRNet_W44',
+        'HRNet_W48',
+        'HRNet_W60',
+        'HRNet_W64'
+    ],
+    'resnet_vd': ['ResNet18_vd', 'ResNet50_vd', 'ResNet101_vd'],
+    'xception_deeplab': [
+        'Xception41_deeplab',
+        'Xception65_deeplab',
+        'Xception71_deeplab'
+    ],
+    'mobilenetv3': ['MobileNetV3_small_x1_0', 'MobileNetV3_large_x1_0'],
+    'vision_transformer': [
+        'VisionTransformer',
+        'ViT_small_patch16_224',
+        'ViT_base_patch16_224',
+        'ViT_base_patch16_384',
+        'ViT_base_patch32_384',
+        'ViT_large_patch16_224',
+        'ViT_large_patch16_384',
+        'ViT_large_patch32_384',
+        'ViT_huge_patch16_224',
+        'ViT_huge_patch32_384'
+    ],
+    'swin_transformer': [
+        'SwinTransformer',
+        'SwinTransformer_tiny_patch4_window7_224',
+        'SwinTransformer_small_patch4_window7_224',
+        'SwinTransformer_base_patch4_window7_224',
+        'SwinTransformer_base_patch4_window12_384',
+        'SwinTransformer_large_patch4_window7_224',
+        'SwinTransformer_large_patch4_window12_384'
+    ],
+    'mobilenetv2': ['MobileNetV2'],
+    'mix_transformer': [
+        'MixVisionTransformer_B0',
+        'MixVisionTransformer_B1',
+        'MixVisionTransformer_B2',
+        'MixVisionTransformer_B3',
+        'MixVisionTransformer_B4',
+        'MixVisionTransformer_B5'
+    ],
+    'stdcnet': ['STDC2', 'STDC1'],
+    'hrnetv2psa': ['HRNETV2PSA']
+}
+
+for _module, _names in _LAZY_COMPONENTS.items():
+    manager.BACKBONES.add_lazy_component(_names, __name__ + '.' + _module)
+
+# `from ... import *` imports all the modules to export the components.
+__all__ = [name for names in _LAZY_COMPONENTS.values() for name in names]
+__getattr__ = manager.lazy_getattr(__name__, _LAZY_COMPONENTS)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
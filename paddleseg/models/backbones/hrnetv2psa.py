@@ -17,6 +17,7 @@ import numpy as np
 import paddle
 import paddle.nn as nn
 import paddle.nn.functional as F
+from paddle.distributed.fleet.utils import recompute
 
 from paddleseg.cvlibs import manager
 from paddleseg.cvlibs import param_init
@@ -73,6 +74,7 @@ class PSA_s(nn.Layer):
             padding=0,
             bias_attr=False)
         self.softmax_left = nn.Softmax(axis=2)
+        self.fused = False
         self.reset_parameters()
 
     def reset_parameters(self):
@@ -98,11 +100,12 @@ class PSA_s(nn.Layer):
         self.conv_v_left.inited = True
 
     def spatial_pool(self, x):
+        # The shapes are kept symbolic (0 copies the input dim, -1 is inferred)
+        # so that no device-to-host copy is needed and to_static can export it.
         input_x = self.conv_v_right(x)
-        batch, channel, height, width = paddle.shape(input_x).numpy()
-        input_x = input_x.reshape((batch, channel, height * width))
+        input_x = input_x.reshape((0, 0, -1))
         context_mask = self.conv_q_right(x)
-        context_mask = context_mask.reshape((batch, 1, height * width))
+        context_mask = context_mask.reshape((0, 1, -1))
         context_mask = self.softmax_right(context_mask)
         context = paddle.matmul(input_x, context_mask.transpose((0, 2, 1)))
         context = context.unsqueeze(-1)
@@ -112,28 +115,116 @@ class PSA_s(nn.Layer):
         return out
 
     def channel_pool(self, x):
+        x_shape = paddle.shape(x)
         g_x = self.conv_q_left(x)
-        batch, channel, height, width = paddle.shape(g_x).numpy()
         avg_x = self.avg_pool(g_x)
-        batch, channel, avg_x_h, avg_x_w = paddle.shape(avg_x).numpy()
-        avg_x = avg_x.reshape((batch, channel, avg_x_h * avg_x_w))
-        avg_x = paddle.reshape(avg_x, [batch, avg_x_h * avg_x_w, channel])
-        theta_x = self.conv_v_left(x).reshape(
-            (batch, self.inter_planes, height * width))
+        avg_x = paddle.reshape(avg_x, [0, 1, self.inter_planes])
+        theta_x = self.conv_v_left(x).reshape((0, self.inter_planes, -1))
         context = paddle.matmul(avg_x, theta_x)
         context = self.softmax_left(context)
-        context = context.reshape((batch, 1, height, width))
+        context = context.reshape((0, 1, x_shape[2], x_shape[3]))
         mask_sp = self.sigmoid(context)
         out = x * mask_sp
         return out
 
+    def fuse(self):
+        """
+        Convert the block into the fused inference layout in place.
+
+        The three projections computed at full resolution (conv_q_right,
+        conv_v_right and conv_v_left) are merged into the single 1x1 conv
+        `conv_qv`. conv_q_left is linear and bias free, so it commutes with the
+        global average pooling and is applied to the pooled input instead.
+        """
+        if self.fused:
+            return
+        if self.stride != 1:
+            raise ValueError(
+                'The fused PSA_s only supports stride 1, but got {}.'.format(
+                    self.stride))
+        weight = paddle.concat(
+            [
+                self.conv_q_right.weight, self.conv_v_right.weight,
+                self.conv_v_left.weight
+            ],
+            axis=0)
+        self.conv_qv = nn.Conv2D(
+            self.inplanes,
+            weight.shape[0],
+            kernel_size=1,
+            stride=1,
+            padding=0,
+            bias_attr=False)
+        self.conv_qv.weight.set_value(weight)
+        del self.conv_q_right
+        del self.conv_v_right
+        del self.conv_v_left
+        self.fused = True
+
+    def fused_forward(self, x):
+        x_shape = paddle.shape(x)
+        # [N, 1 + 2 * inter_planes, HW], holding q_right, v_right and v_left.
+        # The branches read their part of it through the matmuls below,
+        # so the projections are never sliced into separate tensors.
+        qv = self.conv_qv(x).reshape((0, 0, -1))
+
+        # channel-only branch
+        q_right = self.softmax_right(qv[:, :1])
+        context = paddle.matmul(qv, q_right, transpose_y=True)
+        context = context[:, 1:1 + self.inter_planes].unsqueeze(-1)
+        mask_ch = self.sigmoid(self.conv_up(context))
+
+        # spatial-only branch, the zero padding selects v_left from qv
+        avg_x = self.conv_q_left(self.avg_pool(x))
+        avg_x = avg_x.reshape((0, 1, self.inter_planes))
+        avg_x = F.pad(
+            avg_x, [1 + self.inter_planes, 0], mode='constant', data_format='NCL')
+        context = self.softmax_left(paddle.matmul(avg_x, qv))
+        mask_sp = self.sigmoid(context.reshape((0, 1, x_shape[2], x_shape[3])))
+
+        # x * mask_ch + x * mask_sp with a single multiply over x
+        out = x * (mask_ch + mask_sp)
+        return out
+
     def forward(self, x):
+        if self.fused:
+            return self.fused_forward(x)
         context_channel = self.spatial_pool(x)
         context_spatial = self.channel_pool(x)
         out = context_spatial + context_channel
         return out
 
 
+def fuse_psa_state_dict(state_dict):
+    """
+    Convert the PSA_s weights of a state dict into the fused layout used by
+    `PSA_s.fuse()`. Other weights are kept as they are.
+
+    Args:
+        state_dict (dict): The state dict of a model with unfused PSA_s blocks,
+            whose values are paddle.Tensor or numpy.ndarray.
+
+    Returns:
+        dict: The converted state dict.
+    """
+    suffix = 'conv_q_right.weight'
+    fused_dict = dict(state_dict)
+    for key in state_dict:
+        if not key.endswith(suffix):
+            continue
+        prefix = key[:-len(suffix)]
+        names = [
+            prefix + name
+            for name in [
+                'conv_q_right.weight', 'conv_v_right.weight',
+                'conv_v_left.weight'
+            ]
+        ]
+        weights = [np.array(fused_dict.pop(name)) for name in names]
+        fused_dict[prefix + 'conv_qv.weight'] = np.concatenate(weights, axis=0)
+    return fused_dict
+
+
 class BasicBlock(nn.Layer):
     expansion = 1
 
@@ -212,12 +303,14 @@ class HighResolutionModule(nn.Layer):
                  num_inchannels,
                  num_channels,
                  fuse_method,
-                 multi_scale_output=True):
+                 multi_scale_output=True,
+                 recompute=False):
         super().__init__()
         self.num_inchannels = num_inchannels
         self.fuse_method = fuse_method
         self.num_branches = num_branches
         self.multi_scale_output = multi_scale_output
+        self.recompute = recompute
         self.branches = self._make_branches(num_branches, blocks, num_blocks,
                                             num_channels)
         self.fuse_layers = self._make_fuse_layers()
@@ -325,13 +418,18 @@ class HighResolutionModule(nn.Layer):
     def get_num_inchannels(self):
         return self.num_inchannels
 
+    def _forward_branch(self, i, x):
+        # The activations of a recomputed branch are dropped after the forward
+        # pass and rebuilt during backward, trading compute for memory.
+        if self.recompute and self.training:
+            return recompute(self.branches[i], x)
+        return self.branches[i](x)
+
     def forward(self, x):
         if self.num_branches == 1:
-            return [self.branches[0](x[0])]
-            #return [recompute(self.branches[0],x[0])]
+            return [self._forward_branch(0, x[0])]
         for i in range(self.num_branches):
-            x[i] = self.branches[i](x[i])
-            #x[i] = recompute(self.branches[i],x[i])
+            x[i] = self._forward_branch(i, x[i])
         x_fuse = []
         for i in range(len(self.fuse_layers)):
             y = x[0] if i == 0 else self.fuse_layers[i][0](x[0])
@@ -356,9 +454,10 @@ blocks_dict = {'BASIC': BasicBlock, 'BOTTLENECK': Bottleneck}
 
 
 class HighResolutionNet(nn.Layer):
-    def __init__(self, cfg_dic):
+    def __init__(self, cfg_dic, fused_attention=False):
         super().__init__()
         self.cfg_dic = cfg_dic
+        self.fused_attention = fused_attention
         self.conv1 = nn.Conv2D(
             3, 64, kernel_size=3, stride=2, padding=1, bias_attr=False)
         self.bn1 = nn.BatchNorm2D(64, momentum=BN_MOMENTUM)
@@ -411,6 +510,15 @@ class HighResolutionNet(nn.Layer):
             self.stage4_cfg, num_channels, multi_scale_output=True)
         self.feat_channels = [np.int(np.sum(pre_stage_channels))]
         self.init_weight()
+        if self.fused_attention:
+            self.fuse_attention()
+
+    def fuse_attention(self):
+        """Convert all PSA_s blocks into the fused inference layout."""
+        for layer in self.sublayers():
+            if isinstance(layer, PSA_s):
+                layer.fuse()
+        self.fused_attention = True
 
     def _make_transition_layer(self, num_channels_pre_layer,
                                num_channels_cur_layer):
@@ -487,6 +595,7 @@ class HighResolutionNet(nn.Layer):
         num_channels = layer_config['NUM_CHANNELS']
         block = blocks_dict[layer_config['BLOCK']]
         fuse_method = layer_config['FUSE_METHOD']
+        use_recompute = layer_config.get('RECOMPUTE', False)
 
         modules = []
         for i in range(num_modules):
@@ -497,7 +606,7 @@ class HighResolutionNet(nn.Layer):
             modules.append(
                 HighResolutionModule(num_branches, block, num_blocks,
                                      num_inchannels, num_channels, fuse_method,
-                                     reset_multi_scale_output))
+                                     reset_multi_scale_output, use_recompute))
             num_inchannels = modules[-1].get_num_inchannels()
 
         return nn.Sequential(*modules), num_inchannels
@@ -509,7 +618,10 @@ class HighResolutionNet(nn.Layer):
         x = self.conv2(x)
         x = self.bn2(x)
         x = self.relu(x)
-        x = self.layer1(x)
+        if self.stage1_cfg.get('RECOMPUTE', False) and self.training:
+            x = recompute(self.layer1, x)
+        else:
+            x = self.layer1(x)
         x_list = []
         for i in range(self.stage2_cfg['NUM_BRANCHES']):
             if self.transition1[i] is not None:
@@ -539,20 +651,20 @@ class HighResolutionNet(nn.Layer):
             else:
                 x_list.append(y_list[i])
         x = self.stage4(x_list)
-        x0_h, x0_w = paddle.shape(x[0]).numpy()[2:4]
+        x0_size = paddle.shape(x[0])[2:4]
         x1 = F.interpolate(
             x[1],
-            size=(x0_h, x0_w),
+            size=x0_size,
             mode='bilinear',
             align_corners=align_corners)
         x2 = F.interpolate(
             x[2],
-            size=(x0_h, x0_w),
+            size=x0_size,
             mode='bilinear',
             align_corners=align_corners)
         x3 = F.interpolate(
             x[3],
-            size=(x0_h, x0_w),
+            size=x0_size,
             mode='bilinear',
             align_corners=align_corners)
 
@@ -577,6 +689,8 @@ class HighResolutionNet(nn.Layer):
                 k.replace('last_layer', 'aux_head').replace('model.', ''): v
                 for k, v in pretrained_dict.items()
             }
+            if self.fused_attention:
+                pretrained_dict = fuse_psa_state_dict(pretrained_dict)
             pretrained_dict = {
                 k: v
                 for k, v in pretrained_dict.items() if k in model_dict.keys()
@@ -586,8 +700,21 @@ class HighResolutionNet(nn.Layer):
 
 
 @manager.BACKBONES.add_component
-def HRNETV2PSA():
-    model = HighResolutionNet(cfg_dic={
+def HRNETV2PSA(pretrained=None, fused_attention=False, recompute_stages=None):
+    """
+    HRNet-W48 with polarized self-attention.
+
+    Args:
+        pretrained (str, optional): The path of the pretrained backbone weights.
+            Default: None.
+        fused_attention (bool, optional): Whether to use the fused PSA_s layout,
+            which is faster at inference. Checkpoints trained without it can be
+            converted by tools/fuse_psa_weights.py. Default: False.
+        recompute_stages (list, optional): The stages, in [1, 4], whose
+            activations are recomputed in the backward pass instead of being
+            kept in memory during training. E.g. [3, 4]. Default: None.
+    """
+    cfg_dic = {
         'FINAL_CONV_KERNEL': 1,
         'STAGE1': {
             'NUM_MODULES': 1,
@@ -621,5 +748,16 @@ def HRNETV2PSA():
             'NUM_CHANNELS': [48, 96, 192, 384],
             'FUSE_METHOD': 'SUM'
         }
-    })
+    }
+    for stage in recompute_stages or []:
+        key = 'STAGE{}'.format(stage)
+        if key not in cfg_dic:
+            raise ValueError(
+                '`recompute_stages` should be in [1, 4], but got {}.'.format(
+                    stage))
+        cfg_dic[key]['RECOMPUTE'] = True
+    model = HighResolutionNet(
+        cfg_dic=cfg_dic, fused_attention=fused_attention)
+    if pretrained is not None:
+        model.init_weight(pretrained)
     return model
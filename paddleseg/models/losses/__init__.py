@@ -12,25 +12,41 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .mixed_loss import MixedLoss
-from .cross_entropy_loss import CrossEntropyLoss
-from .cross_entropy_loss import DistillCrossEntropyLoss
-from .binary_cross_entropy_loss import BCELoss
-from .lovasz_loss import LovaszSoftmaxLoss, LovaszHingeLoss
-from .gscnn_dual_task_loss import DualTaskLoss
-from .edge_attention_loss import EdgeAttentionLoss
-from .bootstrapped_cross_entropy import BootstrappedCrossEntropyLoss
-from .dice_loss import DiceLoss
-from .ohem_cross_entropy_loss import OhemCrossEntropyLoss
-from .decoupledsegnet_relax_boundary_loss import RelaxBoundaryLoss
-from .ohem_edge_attention_loss import OhemEdgeAttentionLoss
-from .l1_loss import L1Loss
-from .mean_square_error_loss import MSELoss
-from .focal_loss import FocalLoss
-from .kl_loss import KLLoss
-from .rmi_loss import RMILoss
-from .detail_aggregate_loss import DetailAggregateLoss
-from .point_cross_entropy_loss import PointCrossEntropyLoss
-from .pixel_contrast_cross_entropy_loss import PixelContrastCrossEntropyLoss
-from .semantic_encode_cross_entropy_loss import SECrossEntropyLoss
-from .semantic_connectivity_loss import SemanticConnectivityLoss
+from paddleseg.cvlibs import manager
+
+# The modules are imported on the first lookup of their components, which
+# keeps `import paddleseg` fast.
+_LAZY_COMPONENTS = {
+    'mixed_loss': ['MixedLoss'],
+    'cross_entropy_loss': ['CrossEntropyLoss', 'DistillCrossEntropyLoss'],
+    'binary_cross_entropy_loss': ['BCELoss'],
+    'lovasz_loss': ['LovaszSoftmaxLoss', 'LovaszHingeLoss'],
+    'gscnn_dual_task_loss': ['DualTaskLoss'],
+    'edge_attention_loss': ['EdgeAttentionLoss'],
+    'bootstrapped_cross_entropy': ['BootstrappedCrossEntropyLoss'],
+    'dice_loss': ['DiceLoss'],
+    'ohem_cross_entropy_loss': ['OhemCrossEntropyLoss'],
+    'decoupledsegnet_relax_boundary_loss': ['RelaxBoundaryLoss'],
+    'ohem_edge_attention_loss': ['OhemEdgeAttentionLoss'],
+    'l1_loss': ['L1Loss'],
+    'mean_square_error_loss': ['MSELoss'],
+    'focal_loss': ['FocalLoss', 'MultiClassFocalLoss'],
+    'kl_loss': ['KLLoss'],
+    'rmi_loss': ['RMILoss'],
+    'detail_aggregate_loss': ['DetailAggregateLoss'],
+    'point_cross_entropy_loss': ['PointCrossEntropyLoss'],
+    'pixel_contrast_cross_entropy_loss': ['PixelContrastCrossEntropyLoss'],
+    'semantic_encode_cross_entropy_loss': ['SECrossEntropyLoss'],
+    'semantic_connectivity_loss': ['SemanticConnectivityLoss']
+}
+
+for _module, _names in _LAZY_COMPONENTS.items():
+    manager.LOSSES.add_lazy_component(_names, __name__ + '.' + _module)
+
+# `from ... import *` imports all the modules to export the components.
+__all__ = [name for names in _LAZY_COMPONENTS.values() for name in names]
+__getattr__ = manager.lazy_getattr(__name__, _LAZY_COMPONENTS)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
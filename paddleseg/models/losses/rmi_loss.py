@@ -69,27 +69,40 @@ class RMILoss(nn.Layer):
         self.kernel_padding = self.rmi_pool_size // 2
         self.ignore_index = ignore_index
 
-    def forward(self, logits_4D, labels_4D, do_rmi=True):
+    def forward(self, logits_4D, labels_4D, do_rmi=True, label_cache=None):
         """
         Forward computation.
         Args:
             logits (Tensor): Shape is [N, C, H, W], logits at each prediction (between -\infty and +\infty).
             labels (Tensor): Shape is [N, H, W], ground truth labels (between 0 and C - 1).
+            label_cache (tuple, optional): The label tensors from `prepare_labels`, which can be
+                shared by the RMILoss with the same `label_key()`. Default: None.
         """
         logits_4D = paddle.cast(logits_4D, dtype='float32')
         labels_4D = paddle.cast(labels_4D, dtype='float32')
 
-        loss = self.forward_sigmoid(logits_4D, labels_4D, do_rmi=do_rmi)
+        loss = self.forward_sigmoid(
+            logits_4D, labels_4D, do_rmi=do_rmi, label_cache=label_cache)
         return loss
 
-    def forward_sigmoid(self, logits_4D, labels_4D, do_rmi=False):
+    def label_key(self):
         """
-        Using the sigmiod operation both.
+        The settings on which `prepare_labels` depends. The RMILoss with the same
+        key can share the label tensors of a step.
+        """
+        return (self.num_classes, self.rmi_radius, self.rmi_pool_way,
+                self.rmi_pool_size, self.rmi_pool_stride, self.ignore_index)
+
+    def prepare_labels(self, labels_4D):
+        """
+        Compute the tensors depending only on the labels.
         Args:
-                logits_4D   :   [N, C, H, W], dtype=float32
-                labels_4D   :   [N, H, W], dtype=long
-                do_rmi          :       bool
+                labels_4D   :   [N, H, W]
+        Return:
+                tuple of the ignore mask [N, H, W], the centered label vectors
+                [N, C, half_d, M] and the label covariance [N, C, half_d, half_d]
         """
+        labels_4D = paddle.cast(labels_4D, dtype='float32')
         label_mask_3D = labels_4D != self.ignore_index
         valid_onehot_labels_4D = paddle.cast(
             F.one_hot(
@@ -104,86 +117,116 @@ class RMILoss(nn.Layer):
         valid_onehot_labels_4D = valid_onehot_labels_4D * paddle.unsqueeze(
             label_mask_3D, axis=3)
         valid_onehot_labels_4D.stop_gradient = True
-        probs_4D = F.sigmoid(logits_4D) * paddle.unsqueeze(
-            label_mask_3D, axis=1) + _CLIP_MIN
 
         valid_onehot_labels_4D = paddle.transpose(valid_onehot_labels_4D,
                                                   [0, 3, 1, 2])
         valid_onehot_labels_4D.stop_gradient = True
-        rmi_loss = self.rmi_lower_bound(valid_onehot_labels_4D, probs_4D)
+        la_vectors, la_cov = self.label_vectors(valid_onehot_labels_4D)
+        return label_mask_3D, la_vectors, la_cov
+
+    def forward_sigmoid(self,
+                        logits_4D,
+                        labels_4D,
+                        do_rmi=False,
+                        label_cache=None):
+        """
+        Using the sigmiod operation both.
+        Args:
+                logits_4D   :   [N, C, H, W], dtype=float32
+                labels_4D   :   [N, H, W], dtype=long
+                do_rmi          :       bool
+                label_cache :   the output of `prepare_labels`, computed from labels_4D if None
+        """
+        if label_cache is None:
+            label_cache = self.prepare_labels(labels_4D)
+        label_mask_3D, la_vectors, la_cov = label_cache
+
+        probs_4D = F.sigmoid(logits_4D) * paddle.unsqueeze(
+            label_mask_3D, axis=1) + _CLIP_MIN
+        rmi_loss = self.rmi_lower_bound(
+            None, probs_4D, label_vectors=(la_vectors, la_cov))
 
         return rmi_loss
 
     def inverse(self, x):
         return paddle.inverse(x)
 
-    def rmi_lower_bound(self, labels_4D, probs_4D):
+    def pool(self, x_4D, is_label):
         """
-        calculate the lower bound of the region mutual information.
+        Downsample the labels or the probabilities by the pool way of RMI.
         Args:
-                labels_4D   :   [N, C, H, W], dtype=float32
-                probs_4D    :   [N, C, H, W], dtype=float32
+                x_4D        :   [N, C, H, W], dtype=float32
+                is_label    :   bool, labels use the nearest interpolation in pool way 2
         """
-        assert labels_4D.shape == probs_4D.shape, print(
-            'shapes', labels_4D.shape, probs_4D.shape)
-
         p, s = self.rmi_pool_size, self.rmi_pool_stride
         if self.rmi_pool_stride > 1:
             if self.rmi_pool_way == 0:
-                labels_4D = F.max_pool2d(
-                    labels_4D,
-                    kernel_size=p,
-                    stride=s,
-                    padding=self.kernel_padding)
-                probs_4D = F.max_pool2d(
-                    probs_4D,
-                    kernel_size=p,
-                    stride=s,
-                    padding=self.kernel_padding)
+                x_4D = F.max_pool2d(
+                    x_4D, kernel_size=p, stride=s, padding=self.kernel_padding)
             elif self.rmi_pool_way == 1:
-                labels_4D = F.avg_pool2d(
-                    labels_4D,
-                    kernel_size=p,
-                    stride=s,
-                    padding=self.kernel_padding)
-                probs_4D = F.avg_pool2d(
-                    probs_4D,
-                    kernel_size=p,
-                    stride=s,
-                    padding=self.kernel_padding)
+                x_4D = F.avg_pool2d(
+                    x_4D, kernel_size=p, stride=s, padding=self.kernel_padding)
             elif self.rmi_pool_way == 2:
-                shape = labels_4D.shape
+                shape = x_4D.shape
                 new_h, new_w = shape[2] // s, shape[3] // s
-                labels_4D = F.interpolate(
-                    labels_4D, size=(new_h, new_w), mode='nearest')
-                probs_4D = F.interpolate(
-                    probs_4D,
-                    size=(new_h, new_w),
-                    mode='bilinear',
-                    align_corners=True)
+                if is_label:
+                    x_4D = F.interpolate(
+                        x_4D, size=(new_h, new_w), mode='nearest')
+                else:
+                    x_4D = F.interpolate(
+                        x_4D,
+                        size=(new_h, new_w),
+                        mode='bilinear',
+                        align_corners=True)
             else:
                 raise NotImplementedError("Pool way of RMI is not defined!")
+        return x_4D
 
+    def label_vectors(self, labels_4D):
+        """
+        Get the centered label vectors and their covariance.
+        Args:
+                labels_4D   :   [N, C, H, W], dtype=float32, the one-hot labels
+        """
+        labels_4D = self.pool(labels_4D, is_label=True)
         label_shape = labels_4D.shape
         n, c = label_shape[0], label_shape[1]
 
-        la_vectors, pr_vectors = self.map_get_pairs(
-            labels_4D, probs_4D, radius=self.rmi_radius, is_combine=0)
-
+        la_vectors = self.map_get_vectors(labels_4D, radius=self.rmi_radius)
         la_vectors = paddle.reshape(la_vectors, [n, c, self.half_d, -1])
         la_vectors = paddle.cast(la_vectors, dtype='float64')
         la_vectors.stop_gradient = True
+        la_vectors = la_vectors - paddle.mean(la_vectors, axis=3, keepdim=True)
 
+        la_cov = paddle.matmul(la_vectors,
+                               paddle.transpose(la_vectors, [0, 1, 3, 2]))
+        return la_vectors, la_cov
+
+    def rmi_lower_bound(self, labels_4D, probs_4D, label_vectors=None):
+        """
+        calculate the lower bound of the region mutual information.
+        Args:
+                labels_4D   :   [N, C, H, W], dtype=float32
+                probs_4D    :   [N, C, H, W], dtype=float32
+                label_vectors : the output of `label_vectors`, computed from labels_4D if None
+        """
+        if label_vectors is None:
+            assert labels_4D.shape == probs_4D.shape, print(
+                'shapes', labels_4D.shape, probs_4D.shape)
+            label_vectors = self.label_vectors(labels_4D)
+        la_vectors, la_cov = label_vectors
+
+        probs_4D = self.pool(probs_4D, is_label=False)
+        prob_shape = probs_4D.shape
+        n, c = prob_shape[0], prob_shape[1]
+
+        pr_vectors = self.map_get_vectors(probs_4D, radius=self.rmi_radius)
         pr_vectors = paddle.reshape(pr_vectors, [n, c, self.half_d, -1])
         pr_vectors = paddle.cast(pr_vectors, dtype='float64')
 
         diag_matrix = paddle.unsqueeze(
             paddle.unsqueeze(
                 paddle.eye(self.half_d), axis=0), axis=0)
-        la_vectors = la_vectors - paddle.mean(la_vectors, axis=3, keepdim=True)
-
-        la_cov = paddle.matmul(la_vectors,
-                               paddle.transpose(la_vectors, [0, 1, 3, 2]))
         pr_vectors = pr_vectors - paddle.mean(pr_vectors, axis=3, keepdim=True)
         pr_cov = paddle.matmul(pr_vectors,
                                paddle.transpose(pr_vectors, [0, 1, 3, 2]))
@@ -226,33 +269,19 @@ class RMILoss(nn.Layer):
 
         return 2.0 * paddle.sum(chol, axis=-1)
 
-    def map_get_pairs(self, labels_4D, probs_4D, radius=3, is_combine=True):
+    def map_get_vectors(self, x_4D, radius=3):
         """
         Args:
-            labels_4D   :   labels, shape [N, C, H, W]
-            probs_4D    :   probabilities, shape [N, C, H, W]
+            x_4D        :   labels or probabilities, shape [N, C, H, W]
             radius      :   the square radius
         Return:
             tensor with shape [N, C, radius * radius, H - (radius - 1), W - (radius - 1)]
         """
-
-        label_shape = labels_4D.shape
-        h, w = label_shape[2], label_shape[3]
+        shape = x_4D.shape
+        h, w = shape[2], shape[3]
         new_h, new_w = h - (radius - 1), w - (radius - 1)
-        la_ns = []
-        pr_ns = []
+        x_ns = []
         for y in range(0, radius, 1):
             for x in range(0, radius, 1):
-                la_now = labels_4D[:, :, y:y + new_h, x:x + new_w]
-                pr_now = probs_4D[:, :, y:y + new_h, x:x + new_w]
-                la_ns.append(la_now)
-                pr_ns.append(pr_now)
-
-        if is_combine:
-            pair_ns = la_ns + pr_ns
-            p_vectors = paddle.stack(pair_ns, axis=2)
-            return p_vectors
-        else:
-            la_vectors = paddle.stack(la_ns, axis=2)
-            pr_vectors = paddle.stack(pr_ns, axis=2)
-            return la_vectors, pr_vectors
+                x_ns.append(x_4D[:, :, y:y + new_h, x:x + new_w])
+        return paddle.stack(x_ns, axis=2)
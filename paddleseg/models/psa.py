@@ -242,17 +242,35 @@ class MscaleOCR(nn.Layer):
         align_corners (bool, optional): An argument of F.interpolate. It should be set to False when the feature size is even,
             e.g. 1024x512, otherwise it is True, e.g. 769x769. Default: False.
         pretrained (str, optional): The path or url of pretrained model. Default: None.
+        eval_scales (list, optional): The scales fused at inference. Default: [0.5, 1.0, 2.0].
+        adaptive_eval (bool, optional): Whether to skip the largest of `eval_scales` for the images whose
+            attention at the second largest scale is already confident. Default: False.
+        attn_conf_thresh (float, optional): The attention value from which a pixel is confident. Default: 0.9.
+        attn_conf_ratio (float, optional): The ratio of confident pixels from which the largest scale is skipped.
+            Default: 0.9.
     """
 
     def __init__(self,
                  num_classes,
                  backbone,
                  backbone_indices=[0],
-                 preteained=None):
+                 preteained=None,
+                 eval_scales=[0.5, 1.0, 2.0],
+                 adaptive_eval=False,
+                 attn_conf_thresh=0.9,
+                 attn_conf_ratio=0.9):
         super(MscaleOCR, self).__init__()
         self.backbone = backbone
         self.pretrained = preteained
         self.backbone_indices = backbone_indices
+        if not eval_scales:
+            raise ValueError('`eval_scales` should not be empty.')
+        self.eval_scales = eval_scales
+        self.adaptive_eval = adaptive_eval
+        self.attn_conf_thresh = attn_conf_thresh
+        self.attn_conf_ratio = attn_conf_ratio
+        # The scales run by the last inference.
+        self.last_scales = None
         in_channels = [self.backbone.feat_channels[i] for i in backbone_indices]
         self.ocr = OCRHead(num_classes, in_channels)
         self.scale_attn = AttenHead(in_ch=512, out_ch=1)
@@ -270,6 +288,105 @@ class MscaleOCR(nn.Layer):
 
         return {'cls_out': cls_out, 'aux_out': aux_out, 'logit_attn': attn}
 
+    def _fwd_infer(self, x, size, with_attn=True):
+        """
+        The eval-time `_fwd`. The aux output is only used inside the OCR head,
+        so it is not upsampled, and the attention is skipped when not needed.
+        """
+        high_level_features = self.backbone(x)
+        cls_out, _, ocr_mid_feats = self.ocr(high_level_features)
+        cls_out = F.interpolate(cls_out, size=size, mode='bilinear')
+        attn = None
+        if with_attn:
+            attn = self.scale_attn(ocr_mid_feats)
+            attn = F.interpolate(attn, size=size, mode='bilinear')
+        return cls_out, attn
+
+    def nscale_inference(self, inputs, scales, adaptive=False):
+        """
+        The multi-scale fusion of `nscale_forward` for inference.
+
+        The scales run in ascending order and their predictions are fused at
+        the input resolution as they come:
+
+            pred = sum_i(prod_{j<i}(1 - attn_j) * attn_i * pred_i)
+
+        where the attention of the largest scale is taken as 1. Only `pred`
+        and the remaining weight are kept between scales, no aux output is
+        fused, and the attention of the largest scale is not computed.
+
+        The result equals `nscale_forward` up to float rounding (about 1e-7)
+        only when no scale but the largest one is above 1.0, as in the
+        default [0.5, 1.0, 2.0]. `nscale_forward` fuses the other scales above
+        1.0 at their own resolution, so e.g. [0.5, 1.0, 1.5, 2.0] differs by
+        up to about 2e-3 on logits of about 0.5, and a few pixels in 10000
+        may change their argmax.
+
+        In adaptive mode, if the attention of the second largest scale is
+        above `attn_conf_thresh` for at least `attn_conf_ratio` of the pixels
+        of every image, the largest scale is skipped and the second largest
+        one takes its place with an attention of 1.
+
+        Args:
+            inputs (Tensor): The input images.
+            scales (list): The scales to run.
+            adaptive (bool, optional): Whether to skip the largest scale for
+                confident inputs. Default: False.
+
+        Returns:
+            list: The fused logits, at the input resolution.
+        """
+        x_size = paddle.shape(inputs)[2:4]
+        scales = sorted(scales)
+        pred = None
+        remain = None
+        self.last_scales = []
+        for i, s in enumerate(scales):
+            is_top = i == len(scales) - 1
+            self.last_scales.append(s)
+            if s == 1.0:
+                x = inputs
+            else:
+                x = F.interpolate(inputs, scale_factor=s, mode='bilinear')
+            if s == 1.0 or (s == 2.0 and is_top):
+                # For the top 2x scale, upsampling the prediction to 2x and
+                # downsampling it back equals the direct interpolation.
+                cls_out, attn_out = self._fwd_infer(
+                    x, x_size, with_attn=not is_top)
+                if adaptive and i == len(scales) - 2 and self._is_confident(
+                        attn_out):
+                    is_top = True
+                if not is_top:
+                    cls_out = attn_out * cls_out
+            else:
+                # Weight at the scale resolution before resizing, as it is
+                # done in nscale_forward.
+                cls_out, attn_out = self._fwd_infer(
+                    x, paddle.shape(x)[2:4], with_attn=not is_top)
+                if adaptive and i == len(scales) - 2 and self._is_confident(
+                        attn_out):
+                    is_top = True
+                if not is_top:
+                    cls_out = attn_out * cls_out
+                    attn_out = F.interpolate(
+                        attn_out, size=x_size, mode='bilinear')
+                cls_out = F.interpolate(cls_out, size=x_size, mode='bilinear')
+
+            if pred is None:
+                pred = cls_out
+            else:
+                pred = pred + remain * cls_out
+            if is_top:
+                break
+            remain = 1 - attn_out if remain is None else remain * (
+                1 - attn_out)
+        return [pred]
+
+    def _is_confident(self, attn):
+        confident = (attn >= self.attn_conf_thresh).astype('float32')
+        ratio = confident.mean(axis=[1, 2, 3])
+        return float(ratio.min()) >= self.attn_conf_ratio
+
     def nscale_forward(self, inputs, scales):
         x_1x = inputs
         scales = sorted(scales, reverse=True)
@@ -347,6 +464,7 @@ class MscaleOCR(nn.Layer):
             utils.load_entire_model(self, self.pretrained)
 
     def forward(self, inputs):
-        if [0.5, 1.0, 2.0] and not self.training:
-            return self.nscale_forward(inputs, [0.5, 1.0, 2.0])
+        if not self.training:
+            return self.nscale_inference(
+                inputs, self.eval_scales, adaptive=self.adaptive_eval)
         return self.two_scale_forward(inputs)
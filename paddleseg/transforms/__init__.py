@@ -13,4 +13,5 @@
 # limitations under the License.
 
 from .transforms import *
+from .batch_transforms import *
 from . import functional
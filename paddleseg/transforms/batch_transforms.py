@@ -0,0 +1,311 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Augmentations applied to a whole mini-batch on the device during training.
+
+The random parameters are drawn per sample on the host and the images, labels
+and edges of the batch are transformed by tensor ops. The images are the
+float32 (N, C, H, W) output of the dataset transforms in [0, 255], i.e. the
+dataset transforms should not normalize them, and the labels and edges are
+(N, H, W) or (N, 1, H, W).
+"""
+
+import numpy as np
+import paddle
+import paddle.nn.functional as F
+
+from paddleseg.cvlibs import manager
+
+
+def _as_4d(x):
+    return x.unsqueeze(1) if len(x.shape) == 3 else x
+
+
+def _restore_dims(x, ref):
+    return x.squeeze(1) if len(ref.shape) == 3 else x
+
+
+@manager.TRANSFORMS.add_component
+class BatchCompose:
+    """
+    Do batched augmentations on the images, labels and edges of a mini-batch.
+
+    Args:
+        transforms (list): A list of batch transforms.
+
+    Raises:
+        TypeError: When 'transforms' is not a list.
+    """
+
+    def __init__(self, transforms):
+        if not isinstance(transforms, list):
+            raise TypeError('The transforms must be a list!')
+        self.transforms = transforms
+
+    def __call__(self, images, labels, edges=None):
+        """
+        Args:
+            images (Tensor): The images of shape (N, C, H, W).
+            labels (Tensor): The labels of shape (N, H, W) or (N, 1, H, W).
+            edges (Tensor, optional): The edge masks with the shape of labels. Default: None.
+
+        Returns:
+            (tuple). The transformed images, labels and edges.
+        """
+        for op in self.transforms:
+            images, labels, edges = op(images, labels, edges)
+        return images, labels, edges
+
+
+@manager.TRANSFORMS.add_component
+class BatchRandomHorizontalFlip:
+    """
+    Flip every image of a batch horizontally with a certain probability.
+
+    Args:
+        prob (float, optional): A probability of horizontally flipping. Default: 0.5.
+    """
+
+    def __init__(self, prob=0.5):
+        self.prob = prob
+
+    def __call__(self, images, labels, edges=None):
+        n = images.shape[0]
+        flip = np.random.uniform(0, 1, [n]) < self.prob
+
+        def _flip(x):
+            if not flip.any():
+                return x
+            # Only the selected samples are flipped and copied.
+            return paddle.concat([
+                paddle.flip(
+                    x[i:i + 1], axis=[-1]) if flip[i] else x[i:i + 1]
+                for i in range(n)
+            ])
+
+        images = _flip(images)
+        labels = _flip(labels)
+        if edges is not None:
+            edges = _flip(edges)
+        return images, labels, edges
+
+
+@manager.TRANSFORMS.add_component
+class BatchRandomScale:
+    """
+    Rescale every image of a batch by a random factor and translation, keeping
+    the image size. The image is cropped when the factor is larger than 1,
+    and padded when it is smaller than 1.
+
+    Args:
+        min_scale_factor (float, optional): The minimum scale. Default: 0.75.
+        max_scale_factor (float, optional): The maximum scale. Default: 1.25.
+        im_padding_value (float, optional): The padding value of image. Default: 127.5.
+        label_padding_value (int, optional): The padding value of label. Default: 255.
+
+    Raises:
+        ValueError: When min_scale_factor is larger than max_scale_factor or not positive.
+    """
+
+    def __init__(self,
+                 min_scale_factor=0.75,
+                 max_scale_factor=1.25,
+                 im_padding_value=127.5,
+                 label_padding_value=255):
+        if min_scale_factor <= 0 or min_scale_factor > max_scale_factor:
+            raise ValueError(
+                'min_scale_factor should be positive and not larger than '
+                'max_scale_factor, but they are {} and {}.'.format(
+                    min_scale_factor, max_scale_factor))
+        self.min_scale_factor = min_scale_factor
+        self.max_scale_factor = max_scale_factor
+        self.im_padding_value = im_padding_value
+        self.label_padding_value = label_padding_value
+
+    def __call__(self, images, labels, edges=None):
+        n = images.shape[0]
+        scale = np.random.uniform(self.min_scale_factor, self.max_scale_factor,
+                                  [n])
+        # The output samples [-1/s, 1/s] of the input around a random center
+        # which keeps the sampled area inside the input when zooming in.
+        shift = np.abs(1 - 1 / scale)
+        theta = np.zeros([n, 2, 3], dtype='float32')
+        theta[:, 0, 0] = 1 / scale
+        theta[:, 1, 1] = 1 / scale
+        theta[:, 0, 2] = np.random.uniform(-shift, shift)
+        theta[:, 1, 2] = np.random.uniform(-shift, shift)
+        theta = paddle.to_tensor(theta)
+
+        grid = F.affine_grid(theta, images.shape, align_corners=False)
+        images = F.grid_sample(
+            images - self.im_padding_value,
+            grid,
+            mode='bilinear',
+            padding_mode='zeros',
+            align_corners=False) + self.im_padding_value
+        labels = self._sample_label(labels, grid, self.label_padding_value)
+        if edges is not None:
+            edges = self._sample_label(edges, grid, 0)
+        return images, labels, edges
+
+    def _sample_label(self, label, grid, padding_value):
+        # The label is shifted by one, so that the zero padding of
+        # grid_sample marks the padded pixels.
+        x = paddle.cast(_as_4d(label), 'float32') + 1
+        x = F.grid_sample(
+            x, grid, mode='nearest', padding_mode='zeros', align_corners=False)
+        x = paddle.where(x > 0, x - 1, paddle.full_like(x, padding_value))
+        return _restore_dims(paddle.cast(x, label.dtype), label)
+
+
+@manager.TRANSFORMS.add_component
+class BatchRandomDistort:
+    """
+    Distort every image of a batch with random configurations as
+    `RandomDistort`, by one affine color transform per image.
+
+    The brightness, contrast and saturation are the same linear blends as
+    `ImageEnhance`, and the hue is rotated in the YIQ color space, which
+    approximates the HSV hue shift of `RandomDistort` by a linear transform.
+    The adjustments are applied in a random order drawn per batch.
+
+    Args:
+        brightness_range (float, optional): A range of brightness. Default: 0.5.
+        brightness_prob (float, optional): A probability of adjusting brightness. Default: 0.5.
+        contrast_range (float, optional): A range of contrast. Default: 0.5.
+        contrast_prob (float, optional): A probability of adjusting contrast. Default: 0.5.
+        saturation_range (float, optional): A range of saturation. Default: 0.5.
+        saturation_prob (float, optional): A probability of adjusting saturation. Default: 0.5.
+        hue_range (int, optional): A range of hue, in 1/256 of a full turn as `RandomDistort`. Default: 18.
+        hue_prob (float, optional): A probability of adjusting hue. Default: 0.5.
+    """
+
+    # The luma weights of `Image.convert('L')`.
+    LUMA = np.array([0.299, 0.587, 0.114])
+    RGB2YIQ = np.array([[0.299, 0.587, 0.114], [0.596, -0.274, -0.322],
+                        [0.211, -0.523, 0.312]])
+
+    def __init__(self,
+                 brightness_range=0.5,
+                 brightness_prob=0.5,
+                 contrast_range=0.5,
+                 contrast_prob=0.5,
+                 saturation_range=0.5,
+                 saturation_prob=0.5,
+                 hue_range=18,
+                 hue_prob=0.5):
+        self.brightness_range = brightness_range
+        self.brightness_prob = brightness_prob
+        self.contrast_range = contrast_range
+        self.contrast_prob = contrast_prob
+        self.saturation_range = saturation_range
+        self.saturation_prob = saturation_prob
+        self.hue_range = hue_range
+        self.hue_prob = hue_prob
+
+    def _op_matrix(self, name, delta):
+        """The color matrix of brightness, saturation or hue."""
+        if name == 'brightness':
+            return np.eye(3) * delta
+        elif name == 'saturation':
+            return np.eye(3) * delta + (1 - delta) * self.LUMA[np.newaxis, :]
+        else:
+            angle = delta / 256. * 2 * np.pi
+            rotation = np.array([[1, 0, 0], [0, np.cos(angle), -np.sin(angle)],
+                                 [0, np.sin(angle), np.cos(angle)]])
+            return np.linalg.inv(self.RGB2YIQ).dot(rotation).dot(self.RGB2YIQ)
+
+    def __call__(self, images, labels, edges=None):
+        n = images.shape[0]
+        ranges = {
+            'brightness': (1 - self.brightness_range,
+                           1 + self.brightness_range),
+            'contrast': (1 - self.contrast_range, 1 + self.contrast_range),
+            'saturation': (1 - self.saturation_range,
+                           1 + self.saturation_range),
+            'hue': (-self.hue_range, self.hue_range)
+        }
+        prob_dict = {
+            'brightness': self.brightness_prob,
+            'contrast': self.contrast_prob,
+            'saturation': self.saturation_prob,
+            'hue': self.hue_prob
+        }
+        ops = ['brightness', 'contrast', 'saturation', 'hue']
+        np.random.shuffle(ops)
+
+        # out = A x + T mean(x) + t. The contrast blends with the gray mean of
+        # the adjusted image, which is linear in the channel means of x.
+        A = np.tile(np.eye(3), [n, 1, 1])
+        T = np.zeros([n, 3, 3])
+        t = np.zeros([n, 3])
+        gray = np.tile(self.LUMA[np.newaxis, :], [3, 1])
+        for name in ops:
+            active = np.random.uniform(0, 1, [n]) < prob_dict[name]
+            deltas = np.random.uniform(*ranges[name], size=[n])
+            for i in np.nonzero(active)[0]:
+                c = deltas[i]
+                if name == 'contrast':
+                    A[i], T[i], t[i] = c * A[i], c * T[i] + (
+                        1 - c) * gray.dot(A[i] + T[i]), c * t[i] + (
+                            1 - c) * gray.dot(t[i])
+                else:
+                    M = self._op_matrix(name, c)
+                    A[i], T[i], t[i] = M.dot(A[i]), M.dot(T[i]), M.dot(t[i])
+
+        shape = images.shape
+        mean = images.reshape([n, shape[1], -1]).mean(axis=2, keepdim=True)
+        A = paddle.to_tensor(A.astype('float32'))
+        T = paddle.to_tensor(T.astype('float32'))
+        t = paddle.to_tensor(t.astype('float32')).unsqueeze(-1)
+        x = paddle.bmm(A, images.reshape([n, shape[1], -1]))
+        x = x + paddle.bmm(T, mean) + t
+        images = paddle.clip(x, 0, 255).reshape(shape)
+        return images, labels, edges
+
+
+@manager.TRANSFORMS.add_component
+class BatchNormalize:
+    """
+    Normalize the images of a batch.
+
+    Args:
+        mean (list, optional): The mean value of a data set. Default: [0.5, 0.5, 0.5].
+        std (list, optional): The standard deviation of a data set. Default: [0.5, 0.5, 0.5].
+
+    Raises:
+        ValueError: When mean/std is not list or any value in std is 0.
+    """
+
+    def __init__(self, mean=(0.5, 0.5, 0.5), std=(0.5, 0.5, 0.5)):
+        if not (isinstance(mean, (list, tuple)) and
+                isinstance(std, (list, tuple))):
+            raise ValueError(
+                "{}: input type is invalid. It should be list or tuple".format(
+                    self))
+        if np.prod(std) == 0:
+            raise ValueError('{}: std is invalid!'.format(self))
+        std = np.asarray(std, dtype='float32')
+        # (x / 255 - mean) / std = x * scale - bias
+        self.scale = (1 / (255. * std)).reshape([1, -1, 1, 1])
+        self.bias = (np.asarray(mean, dtype='float32') / std).reshape(
+            [1, -1, 1, 1])
+
+    def __call__(self, images, labels, edges=None):
+        # Expanding the per-channel factors is much faster than broadcasting
+        # them on some devices.
+        scale = paddle.to_tensor(self.scale).expand_as(images)
+        bias = paddle.to_tensor(self.bias).expand_as(images)
+        images = images * scale - bias
+        return images, labels, edges
@@ -15,7 +15,6 @@
 import cv2
 import numpy as np
 from PIL import Image, ImageEnhance
-from scipy.ndimage.morphology import distance_transform_edt
 
 
 def normalize(im, mean, std):
@@ -25,6 +24,38 @@ def normalize(im, mean, std):
     return im
 
 
+def normalize_to_chw(im, mean, std, scale=1 / 255.0):
+    """
+    Normalize an image of shape (H, W, C) and transpose it to (C, H, W) in one
+    pass per channel, writing into a float32 output buffer allocated once. A
+    grayscale image of shape (H, W) is regarded as (H, W, 1).
+
+    Args:
+        im (np.ndarray): The image of any dtype, e.g. uint8.
+        mean (list|tuple|np.ndarray): The mean of every channel.
+        std (list|tuple|np.ndarray): The standard deviation of every channel.
+        scale (float, optional): The scale applied before the normalization. Default: 1 / 255.0.
+
+    Returns:
+        np.ndarray: The float32 image of shape (C, H, W), (im * scale - mean) / std.
+    """
+    if im.ndim == 2:
+        im = im[..., np.newaxis]
+    mean = np.asarray(mean, dtype=np.float64).reshape([-1])
+    std = np.asarray(std, dtype=np.float64).reshape([-1])
+    out = np.empty((im.shape[2], im.shape[0], im.shape[1]), dtype=np.float32)
+    for c, plane in enumerate(cv2.split(im)):
+        cv2.addWeighted(
+            plane,
+            scale / std[c],
+            plane,
+            0,
+            -mean[c] / std[c],
+            dst=out[c],
+            dtype=cv2.CV_32F)
+    return out
+
+
 def resize(im, target_size=608, interp=cv2.INTER_LINEAR):
     if isinstance(target_size, list) or isinstance(target_size, tuple):
         w = target_size[0]
@@ -106,6 +137,67 @@ def sharpness(im, sharpness_lower, sharpness_upper):
     return im
 
 
+def color_affine(ops, mean_rgb):
+    """
+    Compose brightness, contrast and saturation adjustments into one affine
+    color transform, as the same `ImageEnhance` ops applied in order without
+    the intermediate clipping.
+
+    Args:
+        ops (list): The (name, delta) of the adjustments in order, name is one of
+            ('brightness', 'contrast', 'saturation').
+        mean_rgb (np.ndarray): The mean of every channel of the RGB image, used by contrast.
+
+    Returns:
+        np.ndarray: The 3x4 matrix [A|t] to apply by `cv2.transform`.
+    """
+    # The luma weights of `Image.convert('L')`.
+    luma = np.array([0.299, 0.587, 0.114])
+    matrix = np.eye(3)
+    offset = np.zeros(3)
+    for name, delta in ops:
+        if name == 'brightness':
+            op_matrix = np.eye(3) * delta
+            op_offset = np.zeros(3)
+        elif name == 'contrast':
+            gray_mean = luma.dot(matrix.dot(mean_rgb) + offset)
+            op_matrix = np.eye(3) * delta
+            op_offset = np.full(3, (1 - delta) * int(gray_mean + 0.5))
+        elif name == 'saturation':
+            op_matrix = np.eye(3) * delta + (1 - delta) * luma[np.newaxis, :]
+            op_offset = np.zeros(3)
+        else:
+            raise ValueError('Unknown color adjustment {}.'.format(name))
+        matrix = op_matrix.dot(matrix)
+        # PIL truncates the blended values, while cv2.transform rounds them.
+        offset = op_matrix.dot(offset) + op_offset - 0.5
+    return np.concatenate([matrix, offset[:, np.newaxis]], axis=1)
+
+
+def shift_hue(im, hue_delta):
+    """
+    Shift the hue of an uint8 RGB image by a lookup table on the HSV image, whose
+    hue is in [0, 255] as `Image.convert('HSV')`.
+    """
+    table = np.tile(np.arange(256)[:, np.newaxis], [1, 3])
+    table[:, 0] = np.mod(table[:, 0] + hue_delta, 256)
+    table = table.astype('uint8').reshape([1, 256, 3])
+    im = cv2.cvtColor(im, cv2.COLOR_RGB2HSV_FULL)
+    im = cv2.LUT(im, table)
+    return cv2.cvtColor(im, cv2.COLOR_HSV2RGB_FULL)
+
+
+def sharpen(im, sharpness_delta):
+    """
+    Blend an uint8 image with its smoothing as `ImageEnhance.Sharpness`.
+    """
+    kernel = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype='float32') / 13
+    smooth = cv2.filter2D(im, -1, kernel, borderType=cv2.BORDER_REPLICATE)
+    # PIL truncates the blended values, while cv2.addWeighted rounds them.
+    return cv2.addWeighted(im, sharpness_delta, smooth, 1 - sharpness_delta,
+                           -0.5)
+
+
 def rotate(im, rotate_lower, rotate_upper):
     rotate_delta = np.random.uniform(rotate_lower, rotate_upper)
     im = im.rotate(int(rotate_delta))
@@ -141,6 +233,9 @@ def onehot_to_binary_edge(mask, radius):
     """
     if radius < 1:
         raise ValueError('`radius` should be greater than or equal to 1')
+    # scipy takes long to import, so it is imported only when needed.
+    from scipy.ndimage import distance_transform_edt
+
     num_classes = mask.shape[0]
 
     edge = np.zeros(mask.shape[1:])
@@ -172,10 +267,27 @@ def mask_to_binary_edge(mask, radius, num_classes):
     Returns:
         np.ndarray: Edge mask with shape(H, W).
     """
+    if radius < 1:
+        raise ValueError('`radius` should be greater than or equal to 1')
     mask = mask.squeeze()
-    onehot = mask_to_onehot(mask, num_classes)
-    edge = onehot_to_binary_edge(onehot, radius)
-    return edge
+    # The labels out of [0, num_classes), e.g. ignore_index, and the pixels
+    # beyond the image border are one region, which is not a class.
+    mask = np.minimum(mask, num_classes)
+    if mask.dtype != np.uint8 or num_classes > 255:
+        mask = mask.astype(np.float32)
+    # A pixel is an edge, as in `onehot_to_binary_edge`, if a pixel of another
+    # region is within `radius`, i.e. the max and min over the disk differ.
+    r = int(radius)
+    y, x = np.mgrid[-r:r + 1, -r:r + 1]
+    kernel = (x**2 + y**2 <= radius**2).astype(np.uint8)
+    gradient = cv2.morphologyEx(
+        mask,
+        cv2.MORPH_GRADIENT,
+        kernel,
+        borderType=cv2.BORDER_CONSTANT,
+        borderValue=num_classes)
+    edge = (gradient > 0).astype(np.uint8)
+    return edge[np.newaxis, :, :]
 
 
 def add_margin(pil_img, top, right, bottom, left, margin_color):
@@ -32,17 +32,32 @@ class Compose:
     Args:
         transforms (list): A list contains data pre-processing or augmentation. Empty list means only reading images, no transformation.
         to_rgb (bool, optional): If converting image to RGB color space. Default: True.
+        keep_uint8 (bool, optional): If keeping the image read from file in uint8 through the transforms,
+            which saves the memory and time of the geometric transforms. The last `Normalize` is then
+            fused with the transposing to (C, H, W), and the output is float32 as usual. Default: False.
 
     Raises:
         TypeError: When 'transforms' is not a list.
         ValueError: when the length of 'transforms' is less than 1.
+        ValueError: When 'keep_uint8' is True and `Normalize` is not the last transform.
     """
 
-    def __init__(self, transforms, to_rgb=True):
+    def __init__(self, transforms, to_rgb=True, keep_uint8=False):
         if not isinstance(transforms, list):
             raise TypeError('The transforms must be a list!')
         self.transforms = transforms
         self.to_rgb = to_rgb
+        self.keep_uint8 = keep_uint8
+
+        self.normalize = None
+        if keep_uint8:
+            for i, op in enumerate(transforms):
+                if isinstance(op, Normalize):
+                    if i != len(transforms) - 1:
+                        raise ValueError(
+                            'Normalize should be the last transform when '
+                            '`keep_uint8` is True.')
+                    self.normalize = op
 
     def __call__(self, im, label=None):
         """
@@ -54,7 +69,9 @@ class Compose:
             (tuple). A tuple including image, image info, and label after transformation.
         """
         if isinstance(im, str):
-            im = cv2.imread(im).astype('float32')
+            im = cv2.imread(im)
+            if not self.keep_uint8:
+                im = im.astype('float32')
         if isinstance(label, str):
             label = np.asarray(Image.open(label))
         if im is None:
@@ -62,12 +79,26 @@ class Compose:
         if self.to_rgb:
             im = cv2.cvtColor(im, cv2.COLOR_BGR2RGB)
 
-        for op in self.transforms:
+        transforms = self.transforms
+        if self.normalize is not None:
+            transforms = transforms[:-1]
+        for op in transforms:
             outputs = op(im, label)
             im = outputs[0]
             if len(outputs) == 2:
                 label = outputs[1]
-        im = np.transpose(im, (2, 0, 1))
+
+        # A grayscale image is given a channel axis of its own.
+        if im.ndim == 2:
+            im = im[..., np.newaxis]
+        if self.normalize is not None:
+            im = functional.normalize_to_chw(im, self.normalize.mean,
+                                             self.normalize.std)
+        elif self.keep_uint8:
+            im = functional.normalize_to_chw(im, (0, ) * im.shape[2],
+                                             (1, ) * im.shape[2], 1.0)
+        else:
+            im = np.transpose(im, (2, 0, 1))
         return (im, label)
 
 
@@ -1185,6 +1216,84 @@ class RandomDistort:
             return (im, label)
 
 
+@manager.TRANSFORMS.add_component
+class FastRandomDistort(RandomDistort):
+    """
+    Distort an image with random configurations as `RandomDistort`, but on the
+    array by OpenCV instead of PIL.
+
+    The brightness, contrast and saturation are composed into one affine color
+    transform, and the hue is shifted by a lookup table, followed by the
+    sharpness. The adjustments and their probabilities are drawn as
+    `RandomDistort`, while the clipping between the adjustments is skipped.
+    An uint8 image is returned as uint8, otherwise as float32.
+
+    Args:
+        brightness_range (float, optional): A range of brightness. Default: 0.5.
+        brightness_prob (float, optional): A probability of adjusting brightness. Default: 0.5.
+        contrast_range (float, optional): A range of contrast. Default: 0.5.
+        contrast_prob (float, optional): A probability of adjusting contrast. Default: 0.5.
+        saturation_range (float, optional): A range of saturation. Default: 0.5.
+        saturation_prob (float, optional): A probability of adjusting saturation. Default: 0.5.
+        hue_range (int, optional): A range of hue. Default: 18.
+        hue_prob (float, optional): A probability of adjusting hue. Default: 0.5.
+        sharpness_range (float, optional): A range of sharpness. Default: 0.5.
+        sharpness_prob (float, optional): A probability of adjusting saturation. Default: 0.
+    """
+
+    def __call__(self, im, label=None):
+        """
+        Args:
+            im (np.ndarray): The Image data.
+            label (np.ndarray, optional): The label data. Default: None.
+
+        Returns:
+            (tuple). When label is None, it returns (im, ), otherwise it returns (im, label).
+        """
+
+        ranges = {
+            'brightness': (1 - self.brightness_range,
+                           1 + self.brightness_range),
+            'contrast': (1 - self.contrast_range, 1 + self.contrast_range),
+            'saturation': (1 - self.saturation_range,
+                           1 + self.saturation_range),
+            'hue': (-self.hue_range, self.hue_range),
+            'sharpness': (1 - self.sharpness_range, 1 + self.sharpness_range)
+        }
+        prob_dict = {
+            'brightness': self.brightness_prob,
+            'contrast': self.contrast_prob,
+            'saturation': self.saturation_prob,
+            'hue': self.hue_prob,
+            'sharpness': self.sharpness_prob
+        }
+        ops = ['brightness', 'contrast', 'saturation', 'hue', 'sharpness']
+        random.shuffle(ops)
+        deltas = []
+        for name in ops:
+            if np.random.uniform(0, 1) < prob_dict[name]:
+                deltas.append((name, np.random.uniform(*ranges[name])))
+
+        is_uint8 = im.dtype == np.uint8
+        im = im.astype('uint8', copy=False)
+        color_ops = [(name, delta) for name, delta in deltas
+                     if name in ('brightness', 'contrast', 'saturation')]
+        if color_ops:
+            mean_rgb = np.array(cv2.mean(im)[:3])
+            im = cv2.transform(im, functional.color_affine(color_ops, mean_rgb))
+        for name, delta in deltas:
+            if name == 'hue':
+                im = functional.shift_hue(im, delta)
+            elif name == 'sharpness':
+                im = functional.sharpen(im, delta)
+        if not is_uint8:
+            im = im.astype('float32')
+        if label is None:
+            return (im, )
+        else:
+            return (im, label)
+
+
 @manager.TRANSFORMS.add_component
 class RandomAffine:
     """
@@ -21,3 +21,4 @@ from .timer import TimeAverager, calculate_eta
 from . import visualize
 from .config_check import config_check
 from .ema import EMA
+from .checkpoint import AsyncCheckpointWriter
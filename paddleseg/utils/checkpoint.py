@@ -0,0 +1,188 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import os
+import queue
+import shutil
+import threading
+from collections import deque
+
+import numpy as np
+import paddle
+
+from paddleseg.utils import logger
+
+
+def snapshot_state_dict(state_dict):
+    """
+    Copy a state dict to the host memory, so that it can be written while the
+    training goes on.
+
+    Args:
+        state_dict (dict): The state dict of a model or an optimizer.
+
+    Returns:
+        dict: The state dict with the tensors copied to numpy arrays. The numpy arrays in
+            state_dict are not copied again.
+    """
+    snapshot = {}
+    for key, value in state_dict.items():
+        if isinstance(value, np.ndarray):
+            snapshot[key] = value
+        elif isinstance(value, paddle.Tensor):
+            snapshot[key] = value.numpy()
+        elif isinstance(value, dict):
+            snapshot[key] = snapshot_state_dict(value)
+        else:
+            snapshot[key] = copy.deepcopy(value)
+    return snapshot
+
+
+class AsyncCheckpointWriter(object):
+    """
+    Write the checkpoints of the training on a background thread.
+
+    `save` copies the state dicts to the host memory and returns, and the
+    worker thread writes them with `paddle.save`. Every checkpoint is written
+    to a temporary directory which is renamed to its final name when complete,
+    so a directory with the final name always holds a whole checkpoint, which
+    can be loaded by `utils.resume`. The old checkpoints are removed on the
+    worker thread too.
+
+    Args:
+        save_dir (str): The directory to save the checkpoints in.
+        keep_checkpoint_max (int, optional): Maximum number of checkpoints to keep. The best model
+            is not counted. Default: 5.
+        max_pending (int, optional): Maximum number of checkpoints waiting to be written. `save`
+            blocks when it is reached, which bounds the host memory of the snapshots. The saves
+            reusing a snapshot returned by `save` take no extra memory. Default: 1.
+
+    Examples:
+        .. code-block:: python
+
+            writer = AsyncCheckpointWriter('output', keep_checkpoint_max=5)
+            for iter in range(iters):
+                ...
+                if iter % save_interval == 0:
+                    writer.save('iter_{}'.format(iter), model, optimizer)
+            writer.close()
+    """
+
+    def __init__(self, save_dir, keep_checkpoint_max=5, max_pending=1):
+        if max_pending < 1:
+            raise ValueError('max_pending should be positive, but it is {}.'.
+                             format(max_pending))
+        self.save_dir = save_dir
+        self.keep_checkpoint_max = keep_checkpoint_max
+        self._saved = deque()
+        self._error = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def save(self, name, model, optimizer=None, rotate=True, ema_state=None):
+        """
+        Snapshot the model, the optimizer and the EMA weights, and queue them
+        to be written to `save_dir/name`.
+
+        Args:
+            name (str): The name of the checkpoint directory, e.g. 'iter_1000' or 'best_model'.
+            model (nn.Layer|dict): The model or its state dict, e.g. the one returned by a former `save`.
+            optimizer (paddle.optimizer.Optimizer, optional): The optimizer. Its state is not
+                saved if it is None. Default: None.
+            rotate (bool, optional): Whether the checkpoint is counted by `keep_checkpoint_max`
+                and removed when it gets old. Default: True.
+            ema_state (dict, optional): The state dict of the EMA weights, e.g. returned by
+                `EMA.state_dict`, which is written to model.pdema. Default: None.
+
+        Returns:
+            dict: The snapshot of the model state dict, which can be passed to another `save`
+                to write the same weights again without copying them.
+        """
+        self._check_error()
+        if isinstance(model, dict):
+            model_state = snapshot_state_dict(model)
+        else:
+            model_state = snapshot_state_dict(model.state_dict())
+        files = {'model.pdparams': model_state}
+        if optimizer is not None:
+            files['model.pdopt'] = snapshot_state_dict(optimizer.state_dict())
+        if ema_state is not None:
+            files['model.pdema'] = snapshot_state_dict(ema_state)
+        self._queue.put((name, files, rotate))
+        return model_state
+
+    def wait(self):
+        """
+        Block until all the queued checkpoints are written.
+        """
+        self._queue.join()
+        self._check_error()
+
+    def close(self):
+        """
+        Write the queued checkpoints and stop the worker thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._check_error()
+
+    def _check_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError('Failed to write the checkpoint.') from error
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                self._write(*task)
+            except Exception as e:
+                logger.error('Failed to write the checkpoint {}: {}'.format(
+                    task[0], e))
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, name, files, rotate):
+        final_dir = os.path.join(self.save_dir, name)
+        tmp_dir = os.path.join(self.save_dir, '.{}.tmp'.format(name))
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        for filename, state_dict in files.items():
+            paddle.save(state_dict, os.path.join(tmp_dir, filename))
+
+        # Move the old directory aside first, so that the checkpoint is
+        # replaced by two renames instead of a slow removal.
+        old_dir = None
+        if os.path.exists(final_dir):
+            old_dir = os.path.join(self.save_dir, '.{}.old'.format(name))
+            if os.path.exists(old_dir):
+                shutil.rmtree(old_dir)
+            os.rename(final_dir, old_dir)
+        os.rename(tmp_dir, final_dir)
+        if old_dir is not None:
+            shutil.rmtree(old_dir)
+
+        if rotate:
+            if final_dir in self._saved:
+                self._saved.remove(final_dir)
+            self._saved.append(final_dir)
+            while len(self._saved) > self.keep_checkpoint_max > 0:
+                shutil.rmtree(self._saved.popleft(), ignore_errors=True)
@@ -12,7 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import numpy as np
 import paddle
 
 
@@ -20,11 +19,18 @@ class EMA(object):
     """
     The implementation of Exponential Moving Average for the trainable parameters.
 
+    The EMA data are kept as tensors on the device of the parameters and
+    updated in place, so `step`, `apply` and `restore` do not copy the weights
+    to the host. The EMA data of float16 parameters are kept in float32.
+
     Args:
         model (nn.Layer): The model for applying EMA.
         decay (float, optional): Decay is used to calculate ema_variable by
             `ema_variable = decay * ema_variable + (1 - decay) * new_variable`.
             Default: 0.99.
+        update_interval (int, optional): Update the EMA data every update_interval calls of `step`.
+            The decay is raised to the power of update_interval, so that the average covers
+            about the same number of iters. Default: 1.
     
     Returns:
         None
@@ -53,34 +59,49 @@ class EMA(object):
 
     """
 
-    def __init__(self, model, decay=0.99):
+    def __init__(self, model, decay=0.99, update_interval=1):
         super().__init__()
 
         assert isinstance(model, paddle.nn.Layer), \
             "The model should be the instance of paddle.nn.Layer."
         assert decay >= 0 and decay <= 1.0, \
             "The decay = {} should in [0.0, 1.0]".format(decay)
+        assert update_interval >= 1, \
+            "The update_interval = {} should be positive".format(
+                update_interval)
 
         self._model = model
         self._decay = decay
+        self._update_interval = update_interval
+        self._num_steps = 0
         self._ema_data = {}
         self._backup_data = {}
 
-        for name, param in self._model.named_parameters():
-            if not param.stop_gradient:
-                self._ema_data[name] = param.numpy()
+        with paddle.no_grad():
+            for name, param in self._model.named_parameters():
+                if not param.stop_gradient:
+                    self._ema_data[name] = param.detach().astype('float32')
 
+    @paddle.no_grad()
     def step(self):
         """
         Calculate the EMA data for all trainable parameters.
         """
+        self._num_steps += 1
+        if self._num_steps % self._update_interval != 0:
+            return
+        # ema = decay * ema + (1 - decay) * param = lerp(ema, param, 1 - decay)
+        weight = 1.0 - self._decay**self._update_interval
         for name, param in self._model.named_parameters():
             if not param.stop_gradient:
                 assert name in self._ema_data, \
                     "The param ({}) isn't in the model".format(name)
-                self._ema_data[name] = self._decay * self._ema_data[name] \
-                    + (1.0 - self._decay) * param.numpy()
+                ema_data = self._ema_data[name]
+                if param.dtype != ema_data.dtype:
+                    param = param.astype(ema_data.dtype)
+                ema_data.lerp_(param, weight)
 
+    @paddle.no_grad()
     def apply(self):
         """
         Save the origin data and use the EMA data to replace the origin data.
@@ -89,9 +110,11 @@ class EMA(object):
             if not param.stop_gradient:
                 assert name in self._ema_data, \
                     "The param ({}) isn't in the model".format(name)
-                self._backup_data[name] = param.numpy()
-                param.set_value(self._ema_data[name])
+                self._backup_data[name] = param.detach().clone()
+                paddle.assign(
+                    self._ema_data[name].astype(param.dtype), output=param)
 
+    @paddle.no_grad()
     def restore(self):
         """
         Restore the origin data to the model.
@@ -100,5 +123,39 @@ class EMA(object):
             if not param.stop_gradient:
                 assert name in self._backup_data, \
                     "The param ({}) isn't in the model".format(name)
-                param.set_value(self._backup_data[name])
+                paddle.assign(self._backup_data[name], output=param)
         self._backup_data = {}
+
+    def state_dict(self):
+        """
+        Get the state dict of the model with the EMA data in place of the
+        trainable parameters, which can be saved as the model weights.
+
+        Returns:
+            dict: The state dict.
+        """
+        state_dict = self._model.state_dict()
+        for key, value in state_dict.items():
+            if key in self._ema_data:
+                state_dict[key] = self._ema_data[key].astype(value.dtype)
+        return state_dict
+
+    @paddle.no_grad()
+    def set_state_dict(self, state_dict, num_steps=0):
+        """
+        Load the EMA data from a state dict returned by `state_dict`, e.g. to
+        resume the training.
+
+        Args:
+            state_dict (dict): The state dict.
+            num_steps (int, optional): The number of `step` calls the EMA data cover, which
+                keeps the iters of the updates with update_interval. Default: 0.
+        """
+        for name, ema_data in self._ema_data.items():
+            if name not in state_dict:
+                raise ValueError(
+                    "The param ({}) isn't in the state dict".format(name))
+            paddle.assign(
+                paddle.to_tensor(state_dict[name]).astype(ema_data.dtype),
+                output=ema_data)
+        self._num_steps = num_steps
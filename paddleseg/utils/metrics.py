@@ -15,12 +15,15 @@
 import numpy as np
 import paddle
 import paddle.nn.functional as F
-import sklearn.metrics as skmetrics
 
 
-def calculate_area(pred, label, num_classes, ignore_index=255):
+def confusion_matrix(pred, label, num_classes, ignore_index=255):
     """
-    Calculate intersect, prediction and label area
+    Calculate the confusion matrix by a single bincount of `label * num_classes + pred`,
+    so the cost does not depend on the number of classes.
+
+    The pixels whose label is `ignore_index` or out of [0, num_classes) are excluded,
+    and so are the pixels whose prediction is out of [0, num_classes).
 
     Args:
         pred (Tensor): The prediction by model.
@@ -29,9 +32,8 @@ def calculate_area(pred, label, num_classes, ignore_index=255):
         ignore_index (int): Specifies a target value that is ignored. Default: 255.
 
     Returns:
-        Tensor: The intersection area of prediction and the ground on all class.
-        Tensor: The prediction area on all class.
-        Tensor: The ground truth area on all class
+        Tensor: The confusion matrix with shape (num_classes, num_classes) and dtype int64,
+            whose rows are the ground truth and columns are the prediction.
     """
     if len(pred.shape) == 4:
         pred = paddle.squeeze(pred, axis=1)
@@ -41,26 +43,159 @@ def calculate_area(pred, label, num_classes, ignore_index=255):
         raise ValueError('Shape of `pred` and `label should be equal, '
                          'but there are {} and {}.'.format(pred.shape,
                                                            label.shape))
-    pred_area = []
-    label_area = []
-    intersect_area = []
-    mask = label != ignore_index
-
-    for i in range(num_classes):
-        pred_i = paddle.logical_and(pred == i, mask)
-        label_i = label == i
-        intersect_i = paddle.logical_and(pred_i, label_i)
-        pred_area.append(paddle.sum(paddle.cast(pred_i, "int32")))
-        label_area.append(paddle.sum(paddle.cast(label_i, "int32")))
-        intersect_area.append(paddle.sum(paddle.cast(intersect_i, "int32")))
-
-    pred_area = paddle.concat(pred_area)
-    label_area = paddle.concat(label_area)
-    intersect_area = paddle.concat(intersect_area)
+    pred = paddle.cast(pred, 'int64').flatten()
+    label = paddle.cast(label, 'int64').flatten()
+    valid = (label >= 0) & (label < num_classes) & (label != ignore_index) & (
+        pred >= 0) & (pred < num_classes)
+    # The excluded pixels are counted in an extra bin, which keeps the size
+    # of the bincount fixed.
+    num_bins = num_classes * num_classes
+    index = paddle.where(valid, label * num_classes + pred,
+                         paddle.full_like(label, num_bins))
+    conf_mat = paddle.bincount(index, minlength=num_bins + 1)
+    return conf_mat[:num_bins].reshape([num_classes, num_classes])
+
+
+def confusion_matrix_to_area(conf_mat):
+    """
+    Get the intersect, prediction and label area from a confusion matrix.
 
+    Args:
+        conf_mat (Tensor): The confusion matrix, whose rows are the ground truth and columns are the prediction.
+
+    Returns:
+        Tensor: The intersection area of prediction and the ground on all class.
+        Tensor: The prediction area on all class.
+        Tensor: The ground truth area on all class
+    """
+    intersect_area = paddle.diag(conf_mat)
+    pred_area = paddle.sum(conf_mat, axis=0)
+    label_area = paddle.sum(conf_mat, axis=1)
     return intersect_area, pred_area, label_area
 
 
+def calculate_area(pred, label, num_classes, ignore_index=255):
+    """
+    Calculate intersect, prediction and label area
+
+    The areas are taken from `confusion_matrix`, so the pixels whose label is
+    out of [0, num_classes) are not counted in the prediction area.
+
+    Args:
+        pred (Tensor): The prediction by model.
+        label (Tensor): The ground truth of image.
+        num_classes (int): The unique number of target classes.
+        ignore_index (int): Specifies a target value that is ignored. Default: 255.
+
+    Returns:
+        Tensor: The intersection area of prediction and the ground on all class.
+        Tensor: The prediction area on all class.
+        Tensor: The ground truth area on all class
+    """
+    conf_mat = confusion_matrix(pred, label, num_classes, ignore_index)
+    return confusion_matrix_to_area(conf_mat)
+
+
+def auc_roc_histogram(logits,
+                      label,
+                      num_classes,
+                      num_bins=1000,
+                      ignore_index=255):
+    """
+    Count the scores of every class in fixed bins, separately for the pixels
+    belonging to the class (positive) and the others (negative). The histograms
+    of several images or ranks are simply summed, so AUC-ROC can be computed in
+    a streaming way by `auc_roc_from_histogram` with constant memory.
+
+    Args:
+        logits (Tensor): The probabilities of every class, e.g. the softmax of the logits, of shape (N, C, H, W).
+        label (Tensor): The ground truth of image, of shape (N, 1, H, W) or (N, H, W).
+        num_classes (int): The unique number of target classes.
+        num_bins (int, optional): The number of bins dividing [0, 1]. Default: 1000.
+        ignore_index (int, optional): Specifies a target value that is ignored. Default: 255.
+
+    Returns:
+        Tensor: The histograms with shape (2, num_classes, num_bins) and dtype int64,
+            the first one counts the negative and the second one the positive scores.
+    """
+    if len(logits.shape) != 4:
+        raise ValueError(
+            'The shape of logits is not 4 dimension as (N, C, H, W), it is {}'.
+            format(logits.shape))
+    if len(label.shape) == 4:
+        label = paddle.squeeze(label, axis=1)
+    if logits.shape[1] != num_classes:
+        raise ValueError('The channels of logits should be {}, but it is {}.'.
+                         format(num_classes, logits.shape[1]))
+
+    label = paddle.cast(label, 'int32').unsqueeze(1)
+    valid = (label >= 0) & (label < num_classes) & (label != ignore_index)
+    classes = paddle.arange(num_classes, dtype='int32').reshape(
+        [1, num_classes, 1, 1])
+    positive = paddle.cast(label == classes, 'int32')
+    bins = paddle.cast(
+        paddle.clip(
+            paddle.cast(logits, 'float32') * num_bins, 0, num_bins - 1),
+        'int32')
+    # index = positive * C * B + class * B + bin, the ignored pixels are
+    # counted in an extra bin, which keeps the size of the bincount fixed.
+    size = num_classes * num_bins
+    index = positive * size + classes * num_bins + bins
+    index = paddle.where(
+        valid.expand_as(index), index, paddle.full_like(index, 2 * size))
+    hist = paddle.bincount(index.flatten(), minlength=2 * size + 1)
+    return paddle.cast(hist[:2 * size], 'int64').reshape(
+        [2, num_classes, num_bins])
+
+
+def auc_roc_from_histogram(hist):
+    """
+    Calculate area under the roc curve from the score histograms of
+    `auc_roc_histogram`.
+
+    The scores in the same bin are regarded as ties, so the result differs from
+    the exact AUC-ROC by at most half of the fraction of positive-negative pairs
+    sharing a bin. With the default 1000 bins, the difference from sklearn is
+    below 1e-4 for up to 5 classes, and up to about 5e-4 for 19 classes, whose
+    softmax scores crowd in the lowest bins. Use more bins for a tighter result.
+    As `sklearn.metrics.roc_auc_score(multi_class='ovr')`, the result is the
+    mean of the one-vs-rest AUC of the classes, and only the AUC of class 1 is
+    used for two classes. The classes without positive or negative pixels are
+    skipped.
+
+    Args:
+        hist (Tensor|np.ndarray): The histograms with shape (2, num_classes, num_bins).
+
+    Returns:
+        auc_roc(float): The area under roc curve
+    """
+    if isinstance(hist, paddle.Tensor):
+        hist = hist.numpy()
+    hist = hist.astype('float64')
+    neg, pos = hist[0], hist[1]
+    num_classes = hist.shape[1]
+
+    # The cumulative counts from the highest score bin, i.e. the roc points.
+    tp = np.cumsum(pos[:, ::-1], axis=1)
+    fp = np.cumsum(neg[:, ::-1], axis=1)
+    tp = np.concatenate([np.zeros([num_classes, 1]), tp], axis=1)
+    fp = np.concatenate([np.zeros([num_classes, 1]), fp], axis=1)
+    num_pos, num_neg = tp[:, -1], fp[:, -1]
+    area = np.sum(
+        (fp[:, 1:] - fp[:, :-1]) * (tp[:, 1:] + tp[:, :-1]) / 2, axis=1)
+
+    classes = [1] if num_classes == 2 else range(num_classes)
+    aucs = [
+        area[i] / (num_pos[i] * num_neg[i]) for i in classes
+        if num_pos[i] > 0 and num_neg[i] > 0
+    ]
+    if len(aucs) == 0:
+        raise ValueError(
+            'AUC-ROC is not defined as no class has both positive and '
+            'negative pixels.')
+    return float(np.mean(aucs))
+
+
 def auc_roc(logits, label, num_classes, ignore_index=None):
     """
     Calculate area under the roc curve
@@ -87,6 +222,9 @@ def auc_roc(logits, label, num_classes, ignore_index=None):
             'The shape of logits is not 4 dimension as (N, C, H, W), it is {}'.
             format(logits.shape))
 
+    # sklearn takes long to import, so it is imported only when needed.
+    import sklearn.metrics as skmetrics
+
     N, C, H, W = logits.shape
     logits = np.transpose(logits, (1, 0, 2, 3))
     logits = logits.reshape([C, N * H * W]).transpose([1, 0])
@@ -0,0 +1,81 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# The models which fuse several scales inside at inference.
+MULTI_SCALE_MODELS = ['MscaleOCR']
+
+
+def add_model_scales_args(parser):
+    """
+    Add the arguments of the scales fused inside the model, e.g. MscaleOCR.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser of the script.
+    """
+    parser.add_argument(
+        '--model_scales',
+        dest='model_scales',
+        nargs='+',
+        help='The scales fused inside the model at inference, e.g. 0.5 1.0 2.0',
+        type=float,
+        default=None)
+    parser.add_argument(
+        '--adaptive_scale',
+        dest='adaptive_scale',
+        help='Whether to skip the largest model scale for the images whose attention is confident',
+        action='store_true')
+    parser.add_argument(
+        '--attn_conf_thresh',
+        dest='attn_conf_thresh',
+        help='The attention value from which a pixel is confident in adaptive scale mode',
+        type=float,
+        default=None)
+    parser.add_argument(
+        '--attn_conf_ratio',
+        dest='attn_conf_ratio',
+        help='The ratio of confident pixels from which the largest scale is skipped in adaptive scale mode',
+        type=float,
+        default=None)
+
+
+def set_model_scales(cfg, args):
+    """
+    Write the arguments added by `add_model_scales_args` to the model config.
+
+    Args:
+        cfg (paddleseg.cvlibs.Config): The config.
+        args (argparse.Namespace): The parsed arguments.
+
+    Raises:
+        ValueError: When an argument is set but the model does not fuse scales inside.
+    """
+    updates = {}
+    if args.model_scales:
+        updates['eval_scales'] = args.model_scales
+    if args.adaptive_scale:
+        updates['adaptive_eval'] = True
+    if args.attn_conf_thresh is not None:
+        updates['attn_conf_thresh'] = args.attn_conf_thresh
+    if args.attn_conf_ratio is not None:
+        updates['attn_conf_ratio'] = args.attn_conf_ratio
+    if not updates:
+        return
+
+    model_type = cfg.dic.get('model', {}).get('type')
+    if model_type not in MULTI_SCALE_MODELS:
+        raise ValueError(
+            '--model_scales, --adaptive_scale, --attn_conf_thresh and --attn_conf_ratio '
+            'are supported by {} only, but the model is {}.'.format(
+                MULTI_SCALE_MODELS, model_type))
+    cfg.dic['model'].update(updates)
@@ -24,8 +24,8 @@ class TimeAverager(object):
         self._total_time = 0
         self._total_samples = 0
 
-    def record(self, usetime, num_samples=None):
-        self._cnt += 1
+    def record(self, usetime, num_samples=None, num_steps=1):
+        self._cnt += num_steps
         self._total_time += usetime
         if num_samples:
             self._total_samples += num_samples
@@ -13,7 +13,6 @@
 # limitations under the License.
 
 import contextlib
-import filelock
 import os
 import tempfile
 import numpy as np
@@ -59,6 +58,8 @@ def download_pretrained_model(pretrained_model):
     else:
         savename = savename.split('.')[0]
 
+    import filelock
+
     with generate_tempdir() as _dir:
         with filelock.FileLock(os.path.join(seg_env.TMP_HOME, savename)):
             pretrained_model = download_file_and_uncompress(
@@ -70,6 +71,29 @@ def download_pretrained_model(pretrained_model):
     return pretrained_model
 
 
+def fuse_psa_weights(model_state_dict, para_state_dict):
+    """
+    Fold the PSA_s weights of the unfused layout in para_state_dict, if the
+    model is built with the fused PSA_s blocks, i.e.
+    `HRNETV2PSA(fused_attention=True)`. Otherwise para_state_dict is returned
+    as it is.
+
+    Args:
+        model_state_dict (dict): The state dict of the model to load the weights.
+        para_state_dict (dict): The loaded state dict.
+
+    Returns:
+        dict: The state dict to load.
+    """
+    if not any(k.endswith('conv_qv.weight') for k in model_state_dict):
+        return para_state_dict
+    if not any(k.endswith('conv_q_right.weight') for k in para_state_dict):
+        return para_state_dict
+    from paddleseg.models.backbones.hrnetv2psa import fuse_psa_state_dict
+    logger.info('Fuse the PSA_s weights of the unfused layout.')
+    return fuse_psa_state_dict(para_state_dict)
+
+
 def load_pretrained_model(model, pretrained_model):
     if pretrained_model is not None:
         logger.info('Loading pretrained model from {}'.format(pretrained_model))
@@ -81,6 +105,8 @@ def load_pretrained_model(model, pretrained_model):
             para_state_dict = paddle.load(pretrained_model)
 
             model_state_dict = model.state_dict()
+            para_state_dict = fuse_psa_weights(model_state_dict,
+                                               para_state_dict)
             keys = model_state_dict.keys()
             num_params_loaded = 0
             for k in keys:
@@ -116,6 +142,8 @@ def resume(model, optimizer, resume_model):
             resume_model = os.path.normpath(resume_model)
             ckpt_path = os.path.join(resume_model, 'model.pdparams')
             para_state_dict = paddle.load(ckpt_path)
+            para_state_dict = fuse_psa_weights(model.state_dict(),
+                                               para_state_dict)
             ckpt_path = os.path.join(resume_model, 'model.pdopt')
             opti_state_dict = paddle.load(ckpt_path)
             model.set_state_dict(para_state_dict)
@@ -132,6 +160,25 @@ def resume(model, optimizer, resume_model):
         logger.info('No model needed to resume.')
 
 
+def resume_ema(ema, resume_model, num_steps):
+    """
+    Load the EMA weights saved in the checkpoint to resume, i.e. model.pdema.
+    The EMA restarts from the weights of the model if they are not saved.
+
+    Args:
+        ema (paddleseg.utils.EMA): The EMA of the model.
+        resume_model (str): The directory of the checkpoint.
+        num_steps (int): The iter of the checkpoint.
+    """
+    ema_path = os.path.join(os.path.normpath(resume_model), 'model.pdema')
+    if not os.path.exists(ema_path):
+        logger.warning(
+            'There are no EMA weights in {}, so the EMA restarts from the resumed weights.'.
+            format(resume_model))
+        return
+    ema.set_state_dict(paddle.load(ema_path), num_steps=num_steps)
+
+
 def worker_init_fn(worker_id):
     np.random.seed(random.randint(0, 100000))
 
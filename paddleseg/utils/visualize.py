@@ -24,7 +24,7 @@ def visualize(image, result, color_map, save_dir=None, weight=0.6):
     Convert predict result to color image, and save added image.
 
     Args:
-        image (str): The path of origin image.
+        image (str|np.ndarray): The path of origin image, or the origin image decoded in BGR.
         result (np.ndarray): The predict result of image.
         color_map (list): The color used to save the prediction results.
         save_dir (str): The directory for saving visual image. Default: None.
@@ -33,6 +33,8 @@ def visualize(image, result, color_map, save_dir=None, weight=0.6):
     Returns:
         vis_result (np.ndarray): If `save_dir` is None, return the visualized result.
     """
+    if save_dir is not None and not isinstance(image, str):
+        raise ValueError('The image should be a path to be saved in save_dir.')
 
     color_map = [color_map[i:i + 3] for i in range(0, len(color_map), 3)]
     color_map = np.array(color_map).astype("uint8")
@@ -42,7 +44,7 @@ def visualize(image, result, color_map, save_dir=None, weight=0.6):
     c3 = cv2.LUT(result, color_map[:, 2])
     pseudo_img = np.dstack((c3, c2, c1))
 
-    im = cv2.imread(image)
+    im = cv2.imread(image) if isinstance(image, str) else image
     vis_result = cv2.addWeighted(im, weight, pseudo_img, 1 - weight, 0)
 
     if save_dir is not None:
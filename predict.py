@@ -19,6 +19,7 @@ import paddle
 
 from paddleseg.cvlibs import manager, Config
 from paddleseg.utils import get_sys_env, logger, get_image_list
+from paddleseg.utils.model_scales import add_model_scales_args, set_model_scales
 from paddleseg.core import predict
 from paddleseg.transforms import Compose
 
@@ -92,6 +93,19 @@ def parse_args():
         help='The stride of sliding window, the first is width and the second is height.',
         type=int,
         default=None)
+    parser.add_argument(
+        '--slide_batch_size',
+        dest='slide_batch_size',
+        help='The number of sliding windows inferred together',
+        type=int,
+        default=1)
+    parser.add_argument(
+        '--slide_blend',
+        dest='slide_blend',
+        help='The blending mode of sliding windows, which can be uniform, gaussian, linear',
+        choices=['uniform', 'gaussian', 'linear'],
+        type=str,
+        default='uniform')
 
     # custom color map
     parser.add_argument(
@@ -102,6 +116,25 @@ def parse_args():
         type=int,
         default=None)
 
+    # outputs
+    parser.add_argument(
+        '--save_mode',
+        dest='save_mode',
+        help='What to save. all: the pseudo color results and the images added with them, '
+        'pseudo_color: the pseudo color results only, label: the label maps as grayscale png only.',
+        choices=['all', 'pseudo_color', 'label'],
+        type=str,
+        default='all')
+    parser.add_argument(
+        '--num_writers',
+        dest='num_writers',
+        help='The number of threads to encode and save the results.',
+        type=int,
+        default=4)
+
+    # multi-scale inference of the model, e.g. MscaleOCR
+    add_model_scales_args(parser)
+
     # set device
     parser.add_argument(
         '--device',
@@ -132,10 +165,15 @@ def get_test_config(cfg, args):
         test_config['is_slide'] = args.is_slide
         test_config['crop_size'] = args.crop_size
         test_config['stride'] = args.stride
+        test_config['slide_batch_size'] = args.slide_batch_size
+        test_config['slide_blend'] = args.slide_blend
 
     if args.custom_color:
         test_config['custom_color'] = args.custom_color
 
+    test_config['save_mode'] = args.save_mode
+    test_config['num_writers'] = args.num_writers
+
     return test_config
 
 
@@ -157,6 +195,7 @@ def main(args):
         raise RuntimeError('No configuration file specified.')
 
     cfg = Config(args.cfg)
+    set_model_scales(cfg, args)
 
     msg = '\n---------------Config Information---------------\n'
     msg += str(cfg)
@@ -0,0 +1,124 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compare the latency and the output statistics of RandomDistort, which works
+on PIL images, and FastRandomDistort, which works on the arrays.
+
+Both transforms are run with the same random seed, so they draw the same
+adjustments and the outputs can be compared pixel by pixel.
+
+Usage:
+    python tools/benchmark_distort.py --image data/cityscapes/leftImg8bit/val/frankfurt/frankfurt_000000_000294_leftImg8bit.png
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import cv2
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, '../')))
+
+from paddleseg.transforms import RandomDistort, FastRandomDistort
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='RandomDistort benchmark')
+    parser.add_argument(
+        "--image",
+        help="The image to distort. A random smooth image is used if not set.",
+        type=str,
+        default=None)
+    parser.add_argument(
+        "--input_size",
+        nargs=2,
+        help="The size of the random image, (h, w).",
+        type=int,
+        default=[1024, 2048])
+    parser.add_argument(
+        "--prob",
+        help="The probability of every adjustment.",
+        type=float,
+        default=0.5)
+    parser.add_argument(
+        "--repeats", help="The timed iters.", type=int, default=20)
+    return parser.parse_args()
+
+
+def load_image(args):
+    if args.image is not None:
+        im = cv2.imread(args.image)
+        if im is None:
+            raise ValueError('Can\'t read The image file {}!'.format(
+                args.image))
+    else:
+        h, w = args.input_size
+        rng = np.random.RandomState(0)
+        im = cv2.resize(
+            rng.randint(0, 256, (h // 16, w // 16, 3)).astype('uint8'),
+            (w, h))
+    return cv2.cvtColor(im, cv2.COLOR_BGR2RGB).astype('float32')
+
+
+def run(op, im, repeats):
+    outputs = []
+    start = time.time()
+    for i in range(repeats):
+        random.seed(i)
+        np.random.seed(i)
+        outputs.append(op(im)[0])
+    return (time.time() - start) / repeats, outputs
+
+
+def main(args):
+    im = load_image(args)
+    kwargs = dict(
+        brightness_prob=args.prob,
+        contrast_prob=args.prob,
+        saturation_prob=args.prob,
+        hue_prob=args.prob,
+        sharpness_prob=args.prob)
+    pil_cost, pil_outputs = run(RandomDistort(**kwargs), im, args.repeats)
+    fast_cost, fast_outputs = run(FastRandomDistort(**kwargs), im, args.repeats)
+    fast_u8_cost, _ = run(
+        FastRandomDistort(**kwargs), im.astype('uint8'), args.repeats)
+
+    pil_outputs = np.stack(pil_outputs)
+    fast_outputs = np.stack(fast_outputs)
+    diff = np.abs(pil_outputs - fast_outputs)
+    print('image: {}x{}, prob: {}, repeats: {}'.format(
+        im.shape[0], im.shape[1], args.prob, args.repeats))
+    print('{:>24} {:>12}'.format('transform', 'latency(ms)'))
+    print('{:>24} {:>12.2f}'.format('RandomDistort', pil_cost * 1000))
+    print('{:>24} {:>12.2f}'.format('FastRandomDistort', fast_cost * 1000))
+    print('{:>24} {:>12.2f}'.format('FastRandomDistort(uint8)',
+                                    fast_u8_cost * 1000))
+    print('speedup: {:.2f}x'.format(pil_cost / fast_cost))
+    print('channel mean  RandomDistort: {}, FastRandomDistort: {}'.format(
+        np.round(pil_outputs.mean(axis=(0, 1, 2)), 2),
+        np.round(fast_outputs.mean(axis=(0, 1, 2)), 2)))
+    print('channel std   RandomDistort: {}, FastRandomDistort: {}'.format(
+        np.round(pil_outputs.std(axis=(0, 1, 2)), 2),
+        np.round(fast_outputs.std(axis=(0, 1, 2)), 2)))
+    print('pixel difference  mean: {:.2f}, p99: {:.2f}'.format(
+        diff.mean(), np.percentile(diff, 99)))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
@@ -0,0 +1,127 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measure the time of `import paddleseg` in new interpreters, and the time to
+look up a model afterwards, which imports its modules on demand. The time of
+importing all the components, as `import paddleseg` used to do, is measured
+for comparison.
+
+Usage:
+    python tools/benchmark_import.py --model MscaleOCR --repeats 5 --importtime 15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(__dir__, '../'))
+
+# Every stage runs after the former ones in the same interpreter, and its
+# time is measured alone.
+STAGES = {
+    'import paddle': 'import paddle',
+    'import paddleseg': 'import paddleseg',
+    'lookup model': 'from paddleseg.cvlibs import manager; manager.MODELS[{model!r}]',
+    'import all components':
+    'from paddleseg.cvlibs import manager\n'
+    'for com in [manager.MODELS, manager.BACKBONES, manager.LOSSES, '
+    'manager.DATASETS, manager.TRANSFORMS]:\n'
+    '    com.components_dict',
+}
+
+CHILD = """
+import json, sys, time
+times = {{}}
+for name, code in {stages!r}:
+    start = time.perf_counter()
+    exec(code)
+    times[name] = time.perf_counter() - start
+times['modules'] = len(sys.modules)
+print(json.dumps(times))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Import time benchmark')
+    parser.add_argument(
+        "--model",
+        help="The model to look up after importing paddleseg.",
+        type=str,
+        default='MscaleOCR')
+    parser.add_argument(
+        "--repeats",
+        help="The number of new interpreters to measure.",
+        type=int,
+        default=5)
+    parser.add_argument(
+        "--importtime",
+        help="Print the modules taking the most time to import paddleseg by `python -X importtime`.",
+        type=int,
+        default=0)
+    return parser.parse_args()
+
+
+def run_child(code):
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        check=True).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def print_importtime(top):
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import paddleseg'],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True).stderr.decode()
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    print('\nThe modules taking the most time to import paddleseg:')
+    for cumulative, name in rows[:top]:
+        print('{:>10.1f}ms  {}'.format(cumulative / 1000, name))
+
+
+def main(args):
+    stages = [(name, code.format(model=args.model))
+              for name, code in STAGES.items()]
+    code = CHILD.format(stages=stages)
+    results = [run_child(code) for _ in range(args.repeats)]
+
+    print('{:<24}{:>12}{:>12}'.format('stage', 'median(s)', 'min(s)'))
+    for name, _ in stages:
+        times = [r[name] for r in results]
+        print('{:<24}{:>12.3f}{:>12.3f}'.format(name, np.median(times),
+                                                min(times)))
+    print('modules loaded at the end: {}'.format(results[0]['modules']))
+
+    if args.importtime > 0:
+        print_importtime(args.importtime)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
@@ -0,0 +1,183 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measure the per-image latency and the peak memory of the multi-scale
+inference of MscaleOCR + HRNETV2PSA.
+
+`legacy` is `MscaleOCR.nscale_forward`, `engine` is
+`MscaleOCR.nscale_inference` and `adaptive` is `MscaleOCR.nscale_inference`
+skipping the largest scale for confident images. Every mode runs in its own process so that the
+peak memory is not shared. The peak memory is the allocated GPU memory, or the
+resident memory of the process when running on CPU.
+
+Usage:
+    python tools/benchmark_mscale.py --input_size 1024 2048 --scales 0.5 1.0 2.0
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import paddle
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, '../')))
+
+MODES = ['legacy', 'engine', 'adaptive']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='MscaleOCR benchmark')
+    parser.add_argument(
+        "--input_size",
+        nargs=2,
+        help="The input image size, (h, w).",
+        type=int,
+        default=[1024, 2048])
+    parser.add_argument(
+        "--scales",
+        nargs='+',
+        help="The inference scales.",
+        type=float,
+        default=[0.5, 1.0, 2.0])
+    parser.add_argument(
+        "--num_classes", help="The number of classes.", type=int, default=19)
+    parser.add_argument(
+        "--modes",
+        nargs='+',
+        help="The inference modes to compare.",
+        choices=MODES,
+        default=MODES)
+    parser.add_argument(
+        "--attn_conf_thresh",
+        help="The attention value from which a pixel is confident.",
+        type=float,
+        default=0.9)
+    parser.add_argument(
+        "--attn_conf_ratio",
+        help="The ratio of confident pixels to skip the largest scale.",
+        type=float,
+        default=0.9)
+    parser.add_argument(
+        "--model_path",
+        help="The trained model to load. Random weights are used if not set.",
+        type=str,
+        default=None)
+    parser.add_argument(
+        "--warmup", help="The warmup iters.", type=int, default=2)
+    parser.add_argument(
+        "--repeats", help="The timed iters.", type=int, default=10)
+    parser.add_argument(
+        '--device',
+        help='Device place to be set, which can be GPU, CPU',
+        default='gpu',
+        type=str)
+    parser.add_argument(
+        '--worker', help=argparse.SUPPRESS, default=None, type=str)
+    return parser.parse_args()
+
+
+def run_worker(args):
+    """Run the inference of one mode and print the result as json."""
+    from paddleseg.models.backbones.hrnetv2psa import HRNETV2PSA
+    from paddleseg.models.psa import MscaleOCR
+
+    paddle.set_device(args.device)
+    use_gpu = 'gpu' in paddle.get_device()
+    paddle.seed(0)
+    model = MscaleOCR(
+        args.num_classes,
+        HRNETV2PSA(),
+        preteained=args.model_path,
+        attn_conf_thresh=args.attn_conf_thresh,
+        attn_conf_ratio=args.attn_conf_ratio)
+    model.eval()
+    if args.worker == 'legacy':
+        infer = model.nscale_forward
+    elif args.worker == 'adaptive':
+        infer = lambda x, scales: model.nscale_inference(x, scales, adaptive=True)
+    else:
+        infer = model.nscale_inference
+
+    h, w = args.input_size
+    images = paddle.randn([1, 3, h, w])
+    with paddle.no_grad():
+        for _ in range(args.warmup):
+            infer(images, args.scales)
+        if use_gpu:
+            paddle.device.cuda.synchronize()
+        costs = []
+        for _ in range(args.repeats):
+            start = time.time()
+            pred = infer(images, args.scales)[0]
+            if use_gpu:
+                paddle.device.cuda.synchronize()
+            costs.append(time.time() - start)
+        pred = pred.numpy()
+
+    if use_gpu:
+        peak = paddle.device.cuda.max_memory_allocated()
+    else:
+        # The peak resident memory of the process, in KB on Linux.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    # The predictions of the modes are compared through a checksum.
+    print(
+        json.dumps({
+            'latency': float(np.mean(costs)),
+            'peak_memory': peak,
+            'label_sum': int(pred.argmax(1).sum()),
+            'scales_run': model.last_scales
+        }))
+
+
+def main(args):
+    h, w = args.input_size
+    print('input_size: {}x{}, scales: {}'.format(h, w, args.scales))
+    print('{:>8} {:>16} {:>12} {:>12}  {}'.format(
+        'mode', 'peak_memory(MB)', 'latency(s)', 'label_sum', 'scales_run'))
+    for mode in args.modes:
+        cmd = [
+            sys.executable, os.path.abspath(__file__), '--worker', mode,
+            '--input_size', str(h), str(w), '--num_classes',
+            str(args.num_classes), '--warmup', str(args.warmup), '--repeats',
+            str(args.repeats), '--device', args.device, '--attn_conf_thresh',
+            str(args.attn_conf_thresh), '--attn_conf_ratio',
+            str(args.attn_conf_ratio), '--scales'
+        ] + [str(s) for s in args.scales]
+        if args.model_path:
+            cmd += ['--model_path', args.model_path]
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE)
+        lines = proc.stdout.decode().strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            print('{:>8} {:>16} {:>12} {:>12}'.format(mode, 'failed', 'failed',
+                                                      '-'))
+            continue
+        result = json.loads(lines[-1])
+        scales_run = result['scales_run'] if mode != 'legacy' else args.scales
+        print('{:>8} {:>16.1f} {:>12.3f} {:>12}  {}'.format(
+            mode, result['peak_memory'] / 1024**2, result['latency'],
+            result['label_sum'], scales_run))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.worker is not None:
+        run_worker(args)
+    else:
+        main(args)
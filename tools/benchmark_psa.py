@@ -0,0 +1,154 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark the per-block latency of the PSA_s attention used in HRNETV2PSA.
+
+The shape-symbolic PSA_s is compared with the previous implementation, which
+fetched the feature shapes to the host by `paddle.shape(x).numpy()`, and with
+the fused inference layout from `PSA_s.fuse()`. Every branch resolution of
+HRNet-W48 is measured for the given input size.
+
+Usage:
+    python tools/benchmark_psa.py --input_size 1024 2048 --device gpu
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import paddle
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, '../')))
+
+from paddleseg.models.backbones.hrnetv2psa import PSA_s
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='PSA_s benchmark')
+    parser.add_argument(
+        "--input_size",
+        nargs=2,
+        help="The input image size, (h, w).",
+        type=int,
+        default=[1024, 2048])
+    parser.add_argument(
+        "--batch_size", help="The batch size.", type=int, default=1)
+    parser.add_argument(
+        "--channels",
+        nargs='+',
+        help="The channels of every HRNet branch.",
+        type=int,
+        default=[48, 96, 192, 384])
+    parser.add_argument(
+        "--warmup", help="The warmup iters.", type=int, default=10)
+    parser.add_argument(
+        "--repeats", help="The timed iters.", type=int, default=50)
+    parser.add_argument(
+        '--device',
+        help='Device place to be set, which can be GPU, CPU',
+        default='gpu',
+        type=str)
+    return parser.parse_args()
+
+
+class LegacyPSA_s(PSA_s):
+    """PSA_s as implemented before, with host shape reads in the forward."""
+
+    def spatial_pool(self, x):
+        input_x = self.conv_v_right(x)
+        batch, channel, height, width = paddle.shape(input_x).numpy()
+        input_x = input_x.reshape((batch, channel, height * width))
+        context_mask = self.conv_q_right(x)
+        context_mask = context_mask.reshape((batch, 1, height * width))
+        context_mask = self.softmax_right(context_mask)
+        context = paddle.matmul(input_x, context_mask.transpose((0, 2, 1)))
+        context = context.unsqueeze(-1)
+        context = self.conv_up(context)
+        mask_ch = self.sigmoid(context)
+        return x * mask_ch
+
+    def channel_pool(self, x):
+        g_x = self.conv_q_left(x)
+        batch, channel, height, width = paddle.shape(g_x).numpy()
+        avg_x = self.avg_pool(g_x)
+        batch, channel, avg_x_h, avg_x_w = paddle.shape(avg_x).numpy()
+        avg_x = avg_x.reshape((batch, channel, avg_x_h * avg_x_w))
+        avg_x = paddle.reshape(avg_x, [batch, avg_x_h * avg_x_w, channel])
+        theta_x = self.conv_v_left(x).reshape(
+            (batch, self.inter_planes, height * width))
+        context = paddle.matmul(avg_x, theta_x)
+        context = self.softmax_left(context)
+        context = context.reshape((batch, 1, height, width))
+        mask_sp = self.sigmoid(context)
+        return x * mask_sp
+
+
+def synchronize():
+    if paddle.is_compiled_with_cuda() and 'gpu' in paddle.get_device():
+        paddle.device.cuda.synchronize()
+
+
+def timeit(layer, x, warmup, repeats):
+    with paddle.no_grad():
+        for _ in range(warmup):
+            layer(x)
+        synchronize()
+        start = time.time()
+        for _ in range(repeats):
+            layer(x)
+        synchronize()
+    return (time.time() - start) * 1000 / repeats
+
+
+def main(args):
+    paddle.set_device(args.device)
+    h, w = args.input_size
+    print('{:>8} {:>12} {:>12} {:>12} {:>8} {:>10} {:>12} {:>8} {:>10}'.format(
+        'channels', 'feat_size', 'before(ms)', 'after(ms)', 'speedup',
+        'identical', 'fused(ms)', 'speedup', 'max_diff'))
+    for i, c in enumerate(args.channels):
+        stride = 4 * 2**i
+        shape = [args.batch_size, c, h // stride, w // stride]
+        x = paddle.randn(shape)
+
+        after = PSA_s(c, c)
+        before = LegacyPSA_s(c, c)
+        before.set_state_dict(after.state_dict())
+        fused = PSA_s(c, c)
+        fused.set_state_dict(after.state_dict())
+        fused.fuse()
+        after.eval()
+        before.eval()
+        fused.eval()
+
+        with paddle.no_grad():
+            ref = after(x).numpy()
+            identical = np.array_equal(before(x).numpy(), ref)
+            max_diff = np.abs(fused(x).numpy() - ref).max()
+        before_ms = timeit(before, x, args.warmup, args.repeats)
+        after_ms = timeit(after, x, args.warmup, args.repeats)
+        fused_ms = timeit(fused, x, args.warmup, args.repeats)
+        print('{:>8} {:>12} {:>12.3f} {:>12.3f} {:>7.2f}x {:>10} {:>12.3f} '
+              '{:>7.2f}x {:>10.2e}'.format(c, '{}x{}'.format(
+                  shape[2], shape[3]), before_ms, after_ms, before_ms /
+                                           after_ms, str(identical), fused_ms,
+                                           after_ms / fused_ms, max_diff))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
@@ -0,0 +1,157 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measure the peak memory and the step time of a MscaleOCR + HRNETV2PSA training
+step for different `recompute_stages` settings of the backbone.
+
+Every setting runs in its own process so that the peak memory is not shared.
+The peak memory is the allocated GPU memory, or the resident memory of the
+process when running on CPU.
+
+Usage:
+    python tools/benchmark_recompute.py --crop_size 1024 512 --batch_size 2 \
+        --settings none 4 3,4 2,3,4 1,2,3,4
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import paddle
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, '../')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Recompute benchmark')
+    parser.add_argument(
+        "--crop_size",
+        nargs=2,
+        help="The crop size of the training images, (w, h).",
+        type=int,
+        default=[1024, 512])
+    parser.add_argument(
+        "--batch_size", help="The batch size.", type=int, default=1)
+    parser.add_argument(
+        "--num_classes", help="The number of classes.", type=int, default=19)
+    parser.add_argument(
+        "--settings",
+        nargs='+',
+        help="The recompute stages to compare, separated by comma, "
+        "or `none` for no recompute.",
+        type=str,
+        default=['none', '4', '3,4', '2,3,4', '1,2,3,4'])
+    parser.add_argument(
+        "--warmup", help="The warmup iters.", type=int, default=3)
+    parser.add_argument(
+        "--repeats", help="The timed iters.", type=int, default=10)
+    parser.add_argument(
+        '--device',
+        help='Device place to be set, which can be GPU, CPU',
+        default='gpu',
+        type=str)
+    parser.add_argument(
+        '--worker', help=argparse.SUPPRESS, default=None, type=str)
+    return parser.parse_args()
+
+
+def parse_setting(setting):
+    if setting.lower() == 'none':
+        return []
+    return [int(s) for s in setting.split(',')]
+
+
+def run_worker(args):
+    """Run the training steps of one setting and print the result as json."""
+    from paddleseg.models.backbones.hrnetv2psa import HRNETV2PSA
+    from paddleseg.models.losses import CrossEntropyLoss
+    from paddleseg.models.psa import MscaleOCR
+
+    paddle.set_device(args.device)
+    use_gpu = 'gpu' in paddle.get_device()
+    backbone = HRNETV2PSA(recompute_stages=parse_setting(args.worker))
+    model = MscaleOCR(args.num_classes, backbone)
+    model.train()
+    loss_fn = CrossEntropyLoss()
+    optimizer = paddle.optimizer.SGD(
+        learning_rate=1e-4, parameters=model.parameters())
+
+    w, h = args.crop_size
+    images = paddle.randn([args.batch_size, 3, h, w])
+    labels = paddle.randint(
+        0, args.num_classes, [args.batch_size, h, w], dtype='int64')
+
+    def step():
+        logits_list = model(images)
+        loss = sum(loss_fn(logits, labels) for logits in logits_list)
+        loss.backward()
+        optimizer.step()
+        model.clear_gradients()
+        return loss
+
+    for _ in range(args.warmup):
+        step()
+    if use_gpu:
+        paddle.device.cuda.synchronize()
+    costs = []
+    for _ in range(args.repeats):
+        start = time.time()
+        step()
+        if use_gpu:
+            paddle.device.cuda.synchronize()
+        costs.append(time.time() - start)
+
+    if use_gpu:
+        peak = paddle.device.cuda.max_memory_allocated()
+    else:
+        # The peak resident memory of the process, in KB on Linux.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps({'step_time': float(np.mean(costs)), 'peak_memory': peak}))
+
+
+def main(args):
+    w, h = args.crop_size
+    print('crop_size: {}x{}, batch_size: {}'.format(w, h, args.batch_size))
+    print('{:>12} {:>16} {:>14}'.format('recompute', 'peak_memory(MB)',
+                                         'step_time(s)'))
+    for setting in args.settings:
+        cmd = [
+            sys.executable, os.path.abspath(__file__), '--worker', setting,
+            '--crop_size', str(w), str(h), '--batch_size', str(args.batch_size),
+            '--num_classes', str(args.num_classes), '--warmup',
+            str(args.warmup), '--repeats', str(args.repeats), '--device',
+            args.device
+        ]
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE)
+        lines = proc.stdout.decode().strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            print('{:>12} {:>16} {:>14}'.format(setting, 'failed', 'failed'))
+            continue
+        result = json.loads(lines[-1])
+        print('{:>12} {:>16.1f} {:>14.3f}'.format(
+            setting, result['peak_memory'] / 1024**2, result['step_time']))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.worker is not None:
+        run_worker(args)
+    else:
+        main(args)
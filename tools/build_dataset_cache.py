@@ -0,0 +1,111 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Decode the images and labels of the datasets in a config into a memory-mapped
+cache. Set `cache_dir` of the datasets in the config to read from it, e.g.
+
+    train_dataset:
+      type: Cityscapes
+      dataset_root: data/cityscapes
+      cache_dir: data/cityscapes_cache
+      ...
+
+Only the changed or new samples are decoded when the cache already exists.
+
+Usage:
+    python tools/build_dataset_cache.py \
+        --config configs/psa/psa_cityscapes_1024x2048_520k.yml \
+        --cache_dir data/cityscapes_cache
+"""
+
+import argparse
+import os
+import sys
+import time
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, '../')))
+
+from paddleseg.cvlibs import Config
+from paddleseg.datasets.cache import build_dataset_cache
+from paddleseg.utils import logger
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Build dataset cache')
+    parser.add_argument(
+        "--config", dest="cfg", help="The config file.", default=None, type=str)
+    parser.add_argument(
+        '--cache_dir',
+        dest='cache_dir',
+        help='The directory to write the cache. The `cache_dir` of the datasets in the config is used if not set.',
+        type=str,
+        default=None)
+    parser.add_argument(
+        '--datasets',
+        dest='datasets',
+        nargs='+',
+        help='The datasets of the config to cache.',
+        choices=['train_dataset', 'val_dataset'],
+        default=['train_dataset', 'val_dataset'])
+    parser.add_argument(
+        '--shard_size',
+        dest='shard_size',
+        help='The max size of a shard file in MB.',
+        type=int,
+        default=2048)
+    parser.add_argument(
+        '--rebuild',
+        dest='rebuild',
+        help='Whether to drop the existing cache and decode all samples.',
+        action='store_true')
+    return parser.parse_args()
+
+
+def main(args):
+    if not args.cfg:
+        raise RuntimeError('No configuration file specified.')
+    cfg = Config(args.cfg)
+
+    rebuild = args.rebuild
+    for name in args.datasets:
+        dataset_cfg = cfg.dic.get(name)
+        if not dataset_cfg:
+            continue
+        # The dataset is built without the cache to get its source files.
+        cache_dir = dataset_cfg.pop('cache_dir', None)
+        cache_dir = args.cache_dir or cache_dir
+        if cache_dir is None:
+            raise ValueError(
+                'The cache directory of {} is not set, please set --cache_dir.'.
+                format(name))
+        dataset = getattr(cfg, name)
+
+        start = time.time()
+        num_decoded = build_dataset_cache(
+            dataset.file_list,
+            cache_dir,
+            shard_size=args.shard_size * 1024**2,
+            rebuild=rebuild)
+        logger.info(
+            '{}: {} of {} samples are decoded into {} in {:.1f}s.'.format(
+                name, num_decoded,
+                len(dataset.file_list), cache_dir, time.time() - start))
+        # The datasets share the same cache directory.
+        rebuild = rebuild and args.cache_dir is None
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
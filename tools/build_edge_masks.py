@@ -0,0 +1,121 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Precompute the binary edge masks of the labels of the train dataset in a
+config. Set `edge_dir` of the dataset to load them instead of computing the
+edges of every sample, e.g.
+
+    train_dataset:
+      type: Cityscapes
+      dataset_root: data/cityscapes
+      edge: True
+      edge_dir: data/cityscapes_edges
+      ...
+
+The edge masks are written as png files with the relative paths of the labels
+to `dataset_root`. The masks of the labels changed since are rebuilt.
+
+Usage:
+    python tools/build_edge_masks.py \
+        --config configs/psa/psa_cityscapes_1024x2048_520k.yml \
+        --edge_dir data/cityscapes_edges
+"""
+
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, '../')))
+
+from paddleseg.cvlibs import Config
+from paddleseg.transforms import functional
+from paddleseg.utils import logger
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Build edge masks')
+    parser.add_argument(
+        "--config", dest="cfg", help="The config file.", default=None, type=str)
+    parser.add_argument(
+        '--edge_dir',
+        dest='edge_dir',
+        help='The directory to save the edge masks. The `edge_dir` of the train dataset in the config is used if not set.',
+        type=str,
+        default=None)
+    parser.add_argument(
+        '--radius',
+        dest='radius',
+        help='The radius of edge.',
+        type=float,
+        default=2)
+    parser.add_argument(
+        '--num_workers',
+        dest='num_workers',
+        help='The number of processes.',
+        type=int,
+        default=4)
+    return parser.parse_args()
+
+
+def build_edge_mask(task):
+    label_path, edge_path, radius, num_classes = task
+    if os.path.exists(edge_path) and os.path.getmtime(
+            edge_path) >= os.path.getmtime(label_path):
+        return False
+    label = np.asarray(Image.open(label_path))
+    edge = functional.mask_to_binary_edge(label, radius, num_classes)
+    edge_dir = os.path.dirname(edge_path)
+    if not os.path.exists(edge_dir):
+        os.makedirs(edge_dir, exist_ok=True)
+    Image.fromarray(edge[0]).save(edge_path)
+    return True
+
+
+def main(args):
+    if not args.cfg:
+        raise RuntimeError('No configuration file specified.')
+    cfg = Config(args.cfg)
+    dataset_cfg = cfg.dic.get('train_dataset')
+    if not dataset_cfg:
+        raise RuntimeError(
+            'The training dataset is not specified in the configuration file.')
+    edge_dir = dataset_cfg.pop('edge_dir', None)
+    edge_dir = args.edge_dir or edge_dir
+    if edge_dir is None:
+        raise ValueError(
+            'The edge directory is not set, please set --edge_dir.')
+    dataset = cfg.train_dataset
+
+    tasks = []
+    for _, label_path in dataset.file_list:
+        edge_path = os.path.join(
+            edge_dir, os.path.relpath(label_path, dataset.dataset_root))
+        tasks.append((label_path, edge_path, args.radius, dataset.num_classes))
+
+    start = time.time()
+    with Pool(args.num_workers) as pool:
+        num_built = sum(pool.map(build_edge_mask, tasks, chunksize=16))
+    logger.info('{} of {} edge masks are built into {} in {:.1f}s.'.format(
+        num_built, len(tasks), edge_dir, time.time() - start))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
@@ -0,0 +1,75 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Convert a checkpoint with PSA_s blocks into the fused layout, so that it can be
+loaded by a model whose backbone is built with `HRNETV2PSA(fused_attention=True)`.
+
+Usage:
+    python tools/fuse_psa_weights.py \
+        --model_path output/best_model/model.pdparams \
+        --save_path output/best_model/model_fused.pdparams
+"""
+
+import argparse
+import os
+import sys
+
+import paddle
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, '../')))
+
+from paddleseg.models.backbones.hrnetv2psa import fuse_psa_state_dict
+from paddleseg.utils import logger
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fuse PSA_s weights')
+    parser.add_argument(
+        '--model_path',
+        dest='model_path',
+        help='The path of the .pdparams file to convert',
+        type=str,
+        required=True)
+    parser.add_argument(
+        '--save_path',
+        dest='save_path',
+        help='The path to save the converted .pdparams file',
+        type=str,
+        required=True)
+    return parser.parse_args()
+
+
+def main(args):
+    if not os.path.exists(args.model_path):
+        raise ValueError('The model path is not Found: {}'.format(
+            args.model_path))
+    state_dict = paddle.load(args.model_path)
+    fused_dict = fuse_psa_state_dict(state_dict)
+    num_blocks = sum(1 for k in fused_dict if k.endswith('conv_qv.weight'))
+    if num_blocks == 0:
+        logger.warning('No unfused PSA_s block is found in {}'.format(
+            args.model_path))
+
+    save_dir = os.path.dirname(args.save_path)
+    if save_dir and not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+    paddle.save(fused_dict, args.save_path)
+    logger.info('{} PSA_s blocks are fused, the weights are saved in {}'.format(
+        num_blocks, args.save_path))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
@@ -20,7 +20,7 @@ import numpy as np
 
 from paddleseg.cvlibs import manager, Config
 from paddleseg.utils import get_sys_env, logger, config_check
-from paddleseg.core import train
+from paddleseg.core import train, AsyncEvaluator
 
 
 def parse_args():
@@ -81,6 +81,17 @@ def parse_args():
         dest='do_eval',
         help='Eval while training',
         action='store_true')
+    parser.add_argument(
+        '--async_eval',
+        dest='async_eval',
+        help='Whether to eval in a separate process while the training goes on, when do_eval is set',
+        action='store_true')
+    parser.add_argument(
+        '--eval_device',
+        dest='eval_device',
+        help='The device of the separate evaluation process, e.g. cpu, gpu:1. The training device is used if not set.',
+        default=None,
+        type=str)
     parser.add_argument(
         '--log_iters',
         dest='log_iters',
@@ -92,6 +103,23 @@ def parse_args():
         dest='use_vdl',
         help='Whether to record the data to VisualDL during training',
         action='store_true')
+    parser.add_argument(
+        '--sync_free_logging',
+        dest='sync_free_logging',
+        help='Whether to accumulate the losses on the device and read them back only every log_iters',
+        action='store_true')
+    parser.add_argument(
+        '--ema_decay',
+        dest='ema_decay',
+        help='The decay of the moving average of the weights used for evaluation. EMA is not used if not set.',
+        type=float,
+        default=None)
+    parser.add_argument(
+        '--ema_update_interval',
+        dest='ema_update_interval',
+        help='How many iters to update the moving average of the weights once',
+        type=int,
+        default=1)
     parser.add_argument(
         '--seed',
         dest='seed',
@@ -199,6 +227,21 @@ def main(args):
 
     config_check(cfg, train_dataset=train_dataset, val_dataset=val_dataset)
 
+    evaluator = None
+    if args.do_eval and args.async_eval:
+        # Only the first rank evaluates, in a process of its own.
+        if paddle.distributed.ParallelEnv().local_rank == 0:
+            evaluator = AsyncEvaluator(
+                args.cfg,
+                args.save_dir,
+                device=args.eval_device or place,
+                config_dic=cfg.dic,
+                num_workers=1 if args.num_workers > 0 else 0,
+                precision=args.precision,
+                amp_level=args.amp_level,
+                **cfg.test_config)
+        val_dataset = None
+
     if place == 'gpu' and paddle.distributed.ParallelEnv().nranks > 1:
         # convert bn to sync_bn
         cfg._model = paddle.nn.SyncBatchNorm.convert_sync_batchnorm(cfg.model)
@@ -222,7 +265,12 @@ def main(args):
         precision=args.precision,
         amp_level=args.amp_level,
         profiler_options=args.profiler_options,
-        to_static_training=cfg.to_static_training)
+        to_static_training=cfg.to_static_training,
+        batch_transforms=cfg.batch_transforms,
+        sync_free_logging=args.sync_free_logging,
+        ema_decay=args.ema_decay,
+        ema_update_interval=args.ema_update_interval,
+        evaluator=evaluator)
 
 
 if __name__ == '__main__':
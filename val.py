@@ -20,6 +20,7 @@ import paddle
 from paddleseg.cvlibs import manager, Config
 from paddleseg.core import evaluate
 from paddleseg.utils import get_sys_env, logger, config_check, utils
+from paddleseg.utils.model_scales import add_model_scales_args, set_model_scales
 
 
 def get_test_config(cfg, args):
@@ -35,6 +36,11 @@ def get_test_config(cfg, args):
         test_config['is_slide'] = args.is_slide
         test_config['crop_size'] = args.crop_size
         test_config['stride'] = args.stride
+        test_config['slide_batch_size'] = args.slide_batch_size
+        test_config['slide_blend'] = args.slide_blend
+
+    if args.batch_size is not None:
+        test_config['batch_size'] = args.batch_size
 
     return test_config
 
@@ -102,6 +108,22 @@ def parse_args():
         help='The stride of sliding window, the first is width and the second is height.',
         type=int,
         default=None)
+    parser.add_argument(
+        '--slide_batch_size',
+        dest='slide_batch_size',
+        help='The number of sliding windows inferred together',
+        type=int,
+        default=1)
+    parser.add_argument(
+        '--slide_blend',
+        dest='slide_blend',
+        help='The blending mode of sliding windows, which can be uniform, gaussian, linear',
+        choices=['uniform', 'gaussian', 'linear'],
+        type=str,
+        default='uniform')
+
+    # multi-scale inference of the model, e.g. MscaleOCR
+    add_model_scales_args(parser)
 
     parser.add_argument(
         '--data_format',
@@ -110,12 +132,18 @@ def parse_args():
         type=str,
         default='NCHW')
 
+    parser.add_argument(
+        '--batch_size',
+        dest='batch_size',
+        help='The maximum number of images of the same size inferred together',
+        type=int,
+        default=None)
+
     parser.add_argument(
         '--auc_roc',
-        dest='add auc_roc metric',
+        dest='auc_roc',
         help='Whether to use auc_roc metric',
-        type=bool,
-        default=False)
+        action='store_true')
 
     parser.add_argument(
         '--device',
@@ -155,6 +183,7 @@ def main(args):
         loss_len = len(cfg.dic['loss']['types'])
         for i in range(loss_len):
             cfg.dic['loss']['types'][i]['data_format'] = args.data_format
+    set_model_scales(cfg, args)
 
     val_dataset = cfg.val_dataset
     if val_dataset is None:
@@ -177,6 +206,8 @@ def main(args):
         logger.info('Loaded trained params of model successfully')
 
     test_config = get_test_config(cfg, args)
+    if args.auc_roc:
+        test_config['auc_roc'] = args.auc_roc
     config_check(cfg, val_dataset=val_dataset)
 
     evaluate(model, val_dataset, num_workers=args.num_workers, **test_config)